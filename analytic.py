@@ -0,0 +1,143 @@
+import math
+
+import numpy as np
+
+from main import EmergencySimulator
+from replications import replication_seeds
+
+ANALYTIC_METRICS = ("doc_util", "avg_non_live_threatening_waiting_time_min", "avg_life_threatening_waiting_time_min")
+
+
+def uniform_moments(low, high):
+    """Mean and second moment of a uniform integer in [low, high], the way VariateProvider.randint draws it."""
+    low, high = np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64)
+    mean = (low + high) / 2
+    variance = ((high - low + 1) ** 2 - 1) / 12
+    return mean, variance + mean ** 2
+
+
+def travel_moments(districts):
+    """
+    Mean and second moment of the travel time in seconds to an emergency, from the HQ and from the
+    district of the previous emergency, with districts drawn by population as in the simulation.
+    """
+    average = np.round(districts.travel_seconds)
+    mean, second = uniform_moments(np.round(average * 0.9), np.round(average * 1.1))
+    weights = districts.populations / districts.populations.sum()
+    from_hq = (mean[districts.hq] @ weights, second[districts.hq] @ weights)
+    from_previous = (weights @ mean @ weights, weights @ second @ weights)
+    return from_hq, from_previous
+
+
+def estimate(districts=None, mean_interarrival=50 * 60, life_threatening_probability=0.25, care_time_bounds=None,
+             iterations=50):
+    """
+    Instant estimates of the single doctor model of EmergencySimulator from a non-preemptive priority
+    M/G/1 queue. A job is the travel to an emergency plus its care, and the doctor is in use for all of it.
+    The travel starts at the previous emergency if the doctor was busy, which an arrival finds with a
+    probability of the utilisation, and at the HQ otherwise; the two are solved together by fixed-point iteration.
+    The waits are those the simulation reports: until the care starts, i.e. in the queue plus the travel.
+
+    Only life-threatening emergencies interrupting a travel to another one is left out, so the waits of
+    life-threatening emergencies are slightly overestimated and the others slightly underestimated.
+
+    :param districts: DistrictModel, by default the one of EmergencySimulator.
+    :param mean_interarrival: Mean seconds between two emergencies.
+    :param life_threatening_probability: Share of life-threatening emergencies.
+    :param care_time_bounds: Care time bounds in seconds by priority, by default EmergencySimulator.care_time_bounds.
+    :param iterations: Cap on the fixed-point iterations.
+    :return: Dict with "doc_util", the waiting times in minutes under the keys of the simulation results,
+             whether the queue is "stable" and the fixed-point "iterations" it took. An unstable queue has a
+             utilisation of 1 and infinite waits.
+    """
+    if districts is None:
+        districts = EmergencySimulator(seed=0).districts
+    if care_time_bounds is None:
+        care_time_bounds = EmergencySimulator.care_time_bounds
+    arrival_rate = 1 / mean_interarrival
+    rates = {1: arrival_rate * life_threatening_probability, 0: arrival_rate * (1 - life_threatening_probability)}
+    care = {prio: uniform_moments(*care_time_bounds[prio]) for prio in rates}
+    (hq_mean, hq_second), (previous_mean, previous_second) = travel_moments(districts)
+
+    utilisation = 0.0
+    for iteration in range(1, iterations + 1):
+        busy = min(utilisation, 1.0)
+        travel_mean = (1 - busy) * hq_mean + busy * previous_mean
+        travel_second = (1 - busy) * hq_second + busy * previous_second
+        service = {prio: float(travel_mean + care[prio][0]) for prio in rates}
+        new_utilisation = sum(rates[prio] * service[prio] for prio in rates)
+        if abs(new_utilisation - utilisation) < 1e-12:
+            break
+        utilisation = new_utilisation
+    utilisation = new_utilisation
+
+    if utilisation >= 1:
+        return {"doc_util": 1.0, "avg_non_live_threatening_waiting_time_min": math.inf,
+                "avg_life_threatening_waiting_time_min": math.inf, "stable": False, "iterations": iteration}
+
+    # Mean residual work of the job in service, seen by an arriving emergency
+    residual = sum(rates[prio] * (travel_second + 2 * travel_mean * care[prio][0] + care[prio][1]) for prio in rates) / 2
+    life_utilisation = rates[1] * service[1]
+    life_wait = residual / (1 - life_utilisation)
+    other_wait = residual / ((1 - life_utilisation) * (1 - utilisation))
+    return {
+        "doc_util": float(utilisation),
+        "avg_non_live_threatening_waiting_time_min": float(other_wait + travel_mean) / 60,
+        "avg_life_threatening_waiting_time_min": float(life_wait + travel_mean) / 60,
+        "stable": True,
+        "iterations": iteration,
+    }
+
+
+def simulator_parameters(simulator):
+    """The parameters of `estimate` that describe `simulator`."""
+    return {
+        "districts": simulator.districts,
+        "mean_interarrival": simulator.variates.mean_interarrival,
+        "life_threatening_probability": simulator.variates.life_threatening_probability,
+        "care_time_bounds": simulator.care_time_bounds,
+    }
+
+
+def compare(hours=1000, replications=10, master_seed=0, **parameters):
+    """
+    The estimates next to the means of simulated replications with the same parameters, and the relative
+    error of every estimate, so a sweep knows how far to trust the estimates when it prunes configurations.
+
+    :param hours: Simulated hours per replication.
+    :param replications: Number of replications.
+    :param master_seed: Seed from which the seeds of all replications are derived.
+    :param parameters: Parameters of `estimate`, e.g. mean_interarrival=40 * 60.
+    :return: Dict with the "analytic" and "simulated" values and the relative "error" of every metric.
+    """
+    analytic = estimate(**parameters)
+    simulated = {metric: [] for metric in ANALYTIC_METRICS}
+    for seed in replication_seeds(master_seed, replications):
+        simulator = EmergencySimulator(seed=seed, districts=parameters.get("districts"))
+        simulator.variates.mean_interarrival = parameters.get("mean_interarrival", simulator.variates.mean_interarrival)
+        simulator.variates.life_threatening_probability = parameters.get(
+            "life_threatening_probability", simulator.variates.life_threatening_probability)
+        if parameters.get("care_time_bounds") is not None:
+            simulator.care_time_bounds = parameters["care_time_bounds"]
+        result = simulator.simulate(hours)
+        simulated["doc_util"].append(result["doc_util"])
+        simulated["avg_non_live_threatening_waiting_time_min"].append(result["avg_non_live_threatening_waiting_time_min"])
+        life_threatening = result["waiting_times"]["life_threatening"]
+        simulated["avg_life_threatening_waiting_time_min"].append(
+            life_threatening.stats.mean / 60 if life_threatening else 0)
+    simulated = {metric: float(np.mean(values)) for metric, values in simulated.items()}
+    return {
+        "analytic": analytic,
+        "simulated": simulated,
+        "error": {metric: (analytic[metric] - simulated[metric]) / simulated[metric] if simulated[metric] else math.nan
+                  for metric in ANALYTIC_METRICS},
+    }
+
+
+if __name__ == "__main__":
+    for minutes in [50, 40, 30]:
+        comparison = compare(mean_interarrival=minutes * 60)
+        print(f"One emergency every {minutes} minutes:")
+        for metric in ANALYTIC_METRICS:
+            print(f"  {metric}: {comparison['analytic'][metric]:.3f} analytic, "
+                  f"{comparison['simulated'][metric]:.3f} simulated ({comparison['error'][metric]:+.1%})")
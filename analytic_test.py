@@ -0,0 +1,49 @@
+import math
+import unittest
+from unittest import mock
+import numpy as np
+from main import EmergencySimulator, Emergency
+from analytic import uniform_moments, estimate, compare, simulator_parameters
+
+
+class AnalyticTests(unittest.TestCase):
+
+    def test_uniform_moments(self):
+        values = np.arange(600, 1201)
+        mean, second = uniform_moments(600, 1200)
+        self.assertAlmostEqual(float(mean), values.mean())
+        self.assertAlmostEqual(float(second), (values.astype(float) ** 2).mean())
+
+    def test_estimate_is_instant(self):
+        # Closed-form apart from a few fixed-point iterations, nothing is simulated
+        with mock.patch.object(EmergencySimulator, "step", side_effect=AssertionError("simulated")):
+            for minutes in [50, 40, 30]:
+                self.assertLessEqual(estimate(mean_interarrival=minutes * 60)["iterations"], 20)
+
+    def test_close_to_simulation(self):
+        comparison = compare(hours=2000, replications=5)
+        self.assertTrue(comparison["analytic"]["stable"])
+        self.assertLess(abs(comparison["error"]["doc_util"]), 0.05)
+        self.assertLess(abs(comparison["error"]["avg_non_live_threatening_waiting_time_min"]), 0.25)
+        self.assertLess(abs(comparison["error"]["avg_life_threatening_waiting_time_min"]), 0.25)
+
+    def test_overloaded(self):
+        result = estimate(mean_interarrival=20 * 60)
+        self.assertFalse(result["stable"])
+        self.assertEqual(result["avg_non_live_threatening_waiting_time_min"], math.inf)
+
+    def test_parameters_of_simulator(self):
+        simulator = EmergencySimulator(seed=0)
+        simulator.care_time_bounds = {1: (60, 60), 0: (30, 30)}
+        self.assertEqual(simulator.get_em_care_time(Emergency(district=0, start_time=0, prio=1)), 60)
+        self.assertEqual(estimate(**simulator_parameters(simulator)), estimate(care_time_bounds={1: (60, 60), 0: (30, 30)}))
+        self.assertLess(estimate(**simulator_parameters(simulator))["doc_util"], estimate()["doc_util"])
+
+    def test_more_emergencies_wait_longer(self):
+        waits = [estimate(mean_interarrival=minutes * 60)["avg_non_live_threatening_waiting_time_min"]
+                 for minutes in [80, 60, 45]]
+        self.assertEqual(waits, sorted(waits))
+
+
+if __name__ == "__main__":
+    unittest.main()
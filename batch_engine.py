@@ -0,0 +1,354 @@
+"""
+Vectorized replications of the single-doctor EmergencySimulator, see BatchEmergencySimulator.
+
+EmergencySimulator spends about three steps per emergency, most of them only to count down to the next
+arrival. The batch engine draws the arrivals of every replication up front and then advances all
+replications by one whole dispatch cycle per step: the drive to an emergency, unless a life-threatening
+call takes over, the care, and the drive back to HQ and the wait there when the queues are empty. A step
+is a fixed number of numpy calls on arrays of one entry per replication, so its cost hardly depends on
+the number of replications. Measured for 1000 simulated hours per replication against running
+EmergencySimulator once per seed:
+
+    replications    speedup
+             100        11x
+            1000        26x
+
+Run `python benchmark.py run --filter batch` for the figures on another machine.
+"""
+import math
+
+import numpy as np
+
+from main import EmergencySimulator
+from variates import VariateProvider
+
+
+class BatchVariates:
+    """
+    The variate streams of one VariateProvider per replication. Every draw continues the streams of
+    the replications, so replication i sees exactly the variates EmergencySimulator(seed=seeds[i]) sees.
+    """
+
+    def __init__(self, seeds, weights):
+        self.providers = [VariateProvider(seed, weights) for seed in seeds]
+
+    def draw(self, name, size):
+        """The next `size` variates of stream `name` of every replication, as a (replications, size) array."""
+        return np.stack([provider.block(name, size) for provider in self.providers])
+
+
+class BatchEmergencySimulator:
+    """
+    Runs many replications of the single-doctor EmergencySimulator together.
+    Every step advances all replications by one dispatch cycle of the doctor. Replication i draws from
+    the same variate streams as EmergencySimulator(seed=seeds[i]) and therefore produces exactly the same
+    metrics.
+
+    Arrays that hold something of every arrival are flat, with the arrivals of replication i at
+    [i * width, (i + 1) * width), and arrival times are shifted by i * shift so that they are sorted
+    over all replications.
+    """
+
+    def __init__(self, seeds, districts=None):
+        self.seeds = list(seeds)
+        if districts is None:
+            districts = EmergencySimulator.default_districts()
+        self.districts = districts
+        self.variates = BatchVariates(self.seeds, districts.populations)
+        travel_seconds = districts.travel_seconds
+        self.travel_seconds = travel_seconds.ravel()
+        # Bounds of the travel time by the rounded average travel time, as start_new_travel rounds them
+        averages = np.arange(int(np.rint(travel_seconds.max())) + 2)
+        self.travel_low = np.rint(averages * 0.9)
+        self.travel_span = np.rint(averages * 1.1) - self.travel_low + 1
+        self.average_travel = np.rint(self.travel_seconds).astype(np.int64)
+
+    def draw_arrivals(self, until):
+        """
+        Draws the arrivals of every replication until all of them have one after `until`.
+        Sets the flat arrival arrays, with an arrival at a time after all others closing every replication.
+        """
+        num_reps = len(self.seeds)
+        variates = self.variates
+        mean = min(provider.mean_interarrival for provider in variates.providers)
+        gaps, life_threatening, districts = [], [], []
+        count = 0
+        total = np.zeros(num_reps, dtype=np.int64)
+        last = total
+        while last.min() <= until:
+            expected = (until - last.min()) / mean
+            size = int(expected + 4 * math.sqrt(expected)) + 16
+            gaps.append(variates.draw("arrival", size))
+            life_threatening.append(variates.draw("priority", size))
+            districts.append(variates.draw("district", size))
+            count += size
+            # The first emergency arrives at 0, so the last gap is not part of any arrival time yet
+            total = total + gaps[-1].sum(axis=1)
+            last = total - gaps[-1][:, -1]
+        gaps = np.concatenate(gaps, axis=1)
+
+        width = count + 1
+        # Whole seconds, which floats hold exactly
+        times = np.zeros((num_reps, width))
+        np.cumsum(gaps[:, :-1], axis=1, out=times[:, 1:count])
+        shift = times[:, count - 1].max() + 2
+        times[:, count] = shift - 1
+        rows = np.arange(num_reps)
+        times += (rows * shift)[:, None]
+        self.width = width
+        self.shift = int(shift)
+        self.arrival_time = arrival_time = times.ravel()
+        # The step of EmergencySimulator that ends at t processes the arrivals before t and the first one
+        # at t. Adding the rank among the arrivals at the same time, as a fraction, to the search key of an
+        # arrival makes that search_key <= t.
+        ties = np.flatnonzero(arrival_time[1:] == arrival_time[:-1]) + 1
+        rank = np.ones(len(ties))
+        positions = ties.tolist()
+        for i in range(1, len(positions)):
+            if positions[i] == positions[i - 1] + 1:
+                rank[i] += rank[i - 1]
+        scale = 2.0 ** math.ceil(math.log2(rank.max(initial=0) + 1))
+        self.search_key = arrival_time.copy()
+        self.search_key[ties] += rank / scale
+
+        # The closing arrival is not life-threatening, in district 0, and never served
+        closing = np.zeros((num_reps, 1), dtype=np.int64)
+        life = np.concatenate(life_threatening + [closing.astype(bool)], axis=1)
+        self.life_threatening = life.ravel()
+        self.district = np.concatenate(districts + [closing], axis=1).ravel()
+
+        # The queues: the life-threatening arrivals of every replication in order, then those that are not,
+        # both padded with the closing arrival, so that a replication serves the next one of either kind
+        # by moving its pointer into them
+        queues = np.empty((2, num_reps, width), dtype=np.int64)
+        queues[:] = (rows * width + width - 1)[:, None]
+        for queue, kind in zip(queues.reshape(2, -1), [life, ~life]):
+            counts = kind.sum(axis=1)
+            arrivals = np.flatnonzero(kind)
+            # Arrival k of the kind over all replications goes to place k - (those of earlier replications)
+            offsets = np.repeat(rows * width - (np.cumsum(counts) - counts), counts)
+            queue[np.arange(len(arrivals)) + offsets] = arrivals
+        self.queues = queues.ravel()
+
+    def draw_uniforms(self, name, size):
+        """Draws `size` uniforms of stream `name` per replication, as a flat array."""
+        return self.variates.draw(name, size).ravel()
+
+    def simulate(self, total_time_hours=1):
+        """Runs every replication for `total_time_hours` and returns one result dict per replication."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.run(total_time_hours)
+
+    def run(self, total_time_hours):
+        # The step times of the simulator are whole seconds, so t < max_time is t < ceil(max_time)
+        max_time = math.ceil(total_time_hours * 3600)
+        num_reps = len(self.seeds)
+        districts = self.districts
+        num_districts = len(districts)
+        hq = districts.hq
+        (life_low, life_high), (other_low, other_high) = (EmergencySimulator.care_time_bounds[prio] for prio in (1, 0))
+        # Every arrival processed after max_time is drawn: a dispatch cycle that starts before it
+        # ends at the latest after two drives and the longest care
+        longest_drive = int(self.travel_low[-1] + self.travel_span[-1])
+        self.draw_arrivals(max_time + 2 * longest_drive + life_high)
+        width = self.width
+        arrival_time = self.arrival_time
+        search_key = self.search_key
+        district = self.district
+        life_threatening = self.life_threatening
+        # Whether an arrival is life-threatening, then whether it is not, so that one lookup gives both
+        kinds = np.concatenate([life_threatening, ~life_threatening])
+        kind_offsets = np.array([[0], [len(life_threatening)]])
+        queues = self.queues
+        travel_seconds = self.travel_seconds
+        travel_low = self.travel_low
+        travel_span = self.travel_span
+        average_travel = self.average_travel
+
+        # Every dispatch cycle draws one travel time, or two when the doctor drives back to HQ first, and
+        # either serves an arrival or goes back to a non-life-threatening one after a life-threatening
+        # arrival took over. Every arrival is served once and takes over at most once, so two travel
+        # times per arrival and one per life-threatening arrival will do. There is one care time per arrival.
+        travels_per_row = 2 * width + int(life_threatening.reshape(num_reps, width).sum(axis=1).max())
+        # randint caps low + int(u * (high - low + 1)) at high, which only the largest uniform below 1 can
+        # exceed. Any uniform from 1 - 2 ** -52 on gives high for every bound, so capping the uniforms
+        # there saves capping every travel time.
+        travel = np.minimum(self.draw_uniforms("travel", travels_per_row), 1 - 2 ** -52)
+        uniforms = self.draw_uniforms("care", width)
+        # Care times of both priorities per draw, the one of priority p of draw k at 2 * k + p
+        care = np.empty(2 * len(uniforms))
+        care[0::2] = np.minimum(other_low + (uniforms * (other_high - other_low + 1)).astype(np.int64), other_high)
+        care[1::2] = np.minimum(life_low + (uniforms * (life_high - life_low + 1)).astype(np.int64), life_high)
+
+        # Constants as 0-d arrays, which numpy combines with arrays faster than Python numbers
+        hq_row = np.array(hq * num_districts)
+        hq_rows = np.full(num_reps, hq * num_districts)
+        num_dist = np.array(num_districts)
+        zero = np.array(0.0)
+        one = np.array(1.0)
+        half = np.array(0.5)
+        int_one = np.array(1)
+        int_two = np.array(2)
+
+        rows = np.arange(num_reps)
+        first = rows * width
+        shift = (rows * self.shift).astype(np.float64)
+        end = shift + max_time
+        # The first emergency arrives at 0 and the doctor sets off to it from HQ
+        prio = life_threatening[first]
+        pointers = np.stack([first + prio, num_reps * width + first + ~prio])
+        avg = average_travel[hq_row + district[first]]
+        travel_pos = rows * travels_per_row
+        travel_time = travel_low[avg] + np.floor(travel[travel_pos] * travel_span[avg])
+        travel_pos += 1
+        care_pos = rows * 2 * width
+        dispatch = shift.copy()
+        em_time = shift.copy()
+        em_row = district[first] * num_districts
+        start_row = hq_rows.copy()
+        free = np.zeros(num_reps)
+        driving = np.zeros(num_reps)
+        wait_mean = np.zeros(num_reps)
+        # A float count saves converting it in every division
+        wait_count = np.zeros(num_reps)
+
+        total_time = np.zeros(num_reps)
+        doctor_used = np.zeros(num_reps)
+        doctor_center = np.zeros(num_reps)
+        waiting_mean = np.zeros(num_reps)
+        waiting_count = np.zeros(num_reps)
+
+        # A step is all about the call overhead of numpy. np.putmask into an array of the step picks
+        # between two arrays in a third of the time np.where takes, and calling the implementations of
+        # np.putmask and np.count_nonzero skips the __array_function__ dispatch, which takes a third of
+        # that again on arrays this small.
+        putmask = getattr(np.putmask, "_implementation", np.putmask)
+        count_nonzero = getattr(np.count_nonzero, "_implementation", np.count_nonzero)
+        while len(rows):
+            on_scene = dispatch + travel_time
+            # The next unserved emergency of either kind
+            queued = queues[pointers]
+            queued_key = search_key[queued]
+            life = queued[0]
+            # A life-threatening arrival before the doctor is on scene takes over a non-life-threatening emergency
+            preempt = (queued_key[0] <= on_scene) > prio
+            care_done = on_scene + care[care_pos + prio]
+            no_wait = preempt | prio
+            new_wait_count = wait_count + ~no_wait
+            wait_step = (on_scene - em_time - wait_mean) / new_wait_count
+            putmask(wait_step, no_wait, 0.0)
+            new_wait_mean = wait_mean + wait_step
+            arrived = queued_key <= care_done
+            # A preempting arrival is there before the care would be done too
+            any_arrived = arrived[0] | arrived[1]
+            next_em = any_arrived > preempt
+            to_hq = ~any_arrived
+            # The life-threatening emergency first, or else the one that arrives first
+            em = np.minimum(life, queued[1])
+            putmask(em, arrived[0], life)
+            em_dist = district[em]
+            next_time = arrival_time[em]
+            # The doctor is free from the end of the care until the next emergency arrives
+            free_step = np.maximum(next_time - care_done, zero)
+
+            # The drive to the next emergency or back to HQ after the care
+            target = em_dist.copy()
+            putmask(target, to_hq, hq)
+            avg = average_travel[start_row + target]
+            first_travel = travel_low[avg] + np.floor(travel[travel_pos] * travel_span[avg])
+            # The preempted drive takes the place of the one to HQ, so that at_hq is where either ends
+            putmask(first_travel, preempt, travel_time)
+            putmask(care_done, preempt, dispatch)
+            at_hq = care_done + first_travel
+            # The doctor waits at HQ, unless the next emergency comes in during the drive back
+            idle = next_time > at_hq
+            # The drive from HQ, or from the middle of the preempted drive or the one to HQ
+            ratio_traveled = one - (at_hq - next_time) / first_travel
+            putmask(ratio_traveled, idle | next_em, 1.0)
+            from_row = em_row.copy()
+            putmask(from_row, preempt, start_row)
+            putmask(from_row, idle, hq_row)
+            to_row = hq_rows[:len(rows)].copy()
+            putmask(to_row, preempt, em_row)
+            avg = np.rint(travel_seconds[from_row + em_dist] * ratio_traveled
+                          + travel_seconds[to_row + em_dist] * (one - ratio_traveled)).astype(np.int64)
+            second_pos = travel_pos + to_hq
+            second_travel = travel_low[avg] + np.floor(travel[second_pos] * travel_span[avg])
+            travel_pos = second_pos + int_one
+            # The next emergency once the care is done, and the care of a preempted one is not started
+            next_dispatch = np.maximum(next_time, care_done)
+
+            done = next_dispatch >= end
+            finished = count_nonzero(done)
+            if finished:
+                stop = self.stop_time(done, end, on_scene, care_done, at_hq, next_dispatch, preempt, idle)
+                done_rows = rows[done]
+                total_time[done_rows] = stop - shift[done]
+                busy_until = np.where(preempt[done], next_time[done], care_done[done])
+                doctor_used[done_rows] = np.minimum(busy_until, stop) - shift[done] - free[done]
+                doctor_center[done_rows] = free[done] - driving[done] + np.where(idle[done], np.maximum(
+                    np.minimum(next_time[done], stop) - at_hq[done], 0), 0)
+                # The doctor only reached the last emergency if that was before the end
+                reached = on_scene[done] < end[done]
+                waiting_mean[done_rows] = np.where(reached, new_wait_mean[done], wait_mean[done])
+                waiting_count[done_rows] = np.where(reached, new_wait_count[done], wait_count[done])
+
+            free += free_step
+            # The free doctor is at HQ unless driving back there
+            driving += np.minimum(free_step, first_travel)
+            wait_mean = new_wait_mean
+            wait_count = new_wait_count
+            travel_time = second_travel
+            putmask(travel_time, next_em, first_travel)
+            # Where the new drive counts as starting from, for a later change of course
+            putmask(from_row, ratio_traveled > half, to_row)
+            putmask(from_row, next_em, em_row)
+            start_row = from_row
+            # The queue the next emergency comes from moves on
+            served = kinds[em + kind_offsets]
+            pointers += served
+            prio = served[0]
+            pointers[1] -= preempt
+            care_pos += int_two * ~preempt
+            em_row = em_dist * num_dist
+            em_time = next_time
+            dispatch = next_dispatch
+
+            if finished:
+                keep = ~done
+                rows, shift, end, pointers = rows[keep], shift[keep], end[keep], pointers[:, keep]
+                (dispatch, travel_time, em_time, em_row, start_row, prio, travel_pos, care_pos, free, driving,
+                 wait_mean, wait_count) = (values[keep] for values in (
+                    dispatch, travel_time, em_time, em_row, start_row, prio, travel_pos, care_pos, free, driving,
+                    wait_mean, wait_count))
+
+        doc_util = doctor_used / total_time
+        doc_center = doctor_center / total_time
+        avg_waiting_time = np.where(waiting_count > 0, waiting_mean / 60, 0)
+        return [
+            {
+                "doc_util": float(doc_util[i]),
+                "doc_center": float(doc_center[i]),
+                "avg_non_live_threatening_waiting_time_min": float(avg_waiting_time[i]),
+            }
+            for i in range(num_reps)
+        ]
+
+    def stop_time(self, done, end, on_scene, care_done, at_hq, next_dispatch, preempt, idle):
+        """
+        The time the replications in `done` stop at, the end of the first step of EmergencySimulator
+        from the end of the run on. Steps end at arrivals and wherever the doctor's state changes.
+        """
+        end = end[done]
+        first_arrival = self.arrival_time[self.arrival_time.searchsorted(end)]
+        state_changes = [
+            np.where(preempt, np.inf, on_scene),
+            np.where(preempt, np.inf, care_done),
+            np.where(idle, at_hq, np.inf),
+            next_dispatch,
+        ]
+        stop = first_arrival
+        for changes in state_changes:
+            changes = changes[done]
+            stop = np.minimum(stop, np.where(changes >= end, changes, np.inf))
+        return stop
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from main import EmergencySimulator
+from batch_engine import BatchEmergencySimulator, BatchVariates
+from variates import VariateProvider
+from replications import replication_seeds, run_batch_replications, run_replications
+
+
+class BatchEngineTests(unittest.TestCase):
+
+    def test_batch_variates_match_providers(self):
+        seeds = [0, 1, 2 ** 40 + 3]
+        variates = BatchVariates(seeds, EmergencySimulator.populations)
+        providers = [VariateProvider(seed, EmergencySimulator.populations) for seed in seeds]
+        # Every draw continues the streams where the last one ended
+        for size in [5, 1, 3000]:
+            arrivals = variates.draw("arrival", size)
+            care = variates.draw("care", size)
+            self.assertEqual(arrivals.shape, (len(seeds), size))
+            for rep, provider in enumerate(providers):
+                self.assertEqual(arrivals[rep].tolist(), [provider.time_to_next_emergency() for _ in range(size)])
+                self.assertEqual([min(600 + int(u * 601), 1200) for u in care[rep].tolist()],
+                                 [provider.randint("care", 600, 1200) for _ in range(size)])
+
+    def test_closing_arrival_ends_the_queues(self):
+        simulator = BatchEmergencySimulator([3, 4])
+        simulator.draw_arrivals(20000)
+        width = simulator.width
+        queues = simulator.queues.reshape(2, 2, width)
+        life = simulator.life_threatening.reshape(2, width)
+        for rep in range(2):
+            closing = rep * width + width - 1
+            for queue, kind in zip(queues[:, rep], [life[rep], ~life[rep]]):
+                arrivals = (np.flatnonzero(kind) + rep * width).tolist()
+                self.assertEqual(queue.tolist(), arrivals + [closing] * (width - len(arrivals)))
+        self.assertTrue((np.diff(simulator.search_key) > 0).all(), "Search keys are not strictly increasing.")
+
+    def test_matches_scalar_simulator(self):
+        seeds = replication_seeds(11, 40)
+        for hours in [1, 24, 200]:
+            batch = BatchEmergencySimulator(seeds).simulate(hours)
+            for seed, result in zip(seeds, batch):
+                expected = EmergencySimulator(seed=seed).simulate(hours)
+                for key, value in result.items():
+                    self.assertEqual(value, expected[key], f"{key} differs for seed {seed} after {hours} hours.")
+
+    def test_batch_replications_match_replications(self):
+        self.assertEqual(run_batch_replications(7, hours=30, master_seed=2, batch_size=3),
+                         [{key: result[key] for key in ["doc_util", "doc_center",
+                                                        "avg_non_live_threatening_waiting_time_min"]}
+                          for result in run_replications(EmergencySimulator, 7, hours=30, master_seed=2, workers=1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
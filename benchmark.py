@@ -0,0 +1,244 @@
+"""
+Benchmarks of the simulators.
+
+    python benchmark.py run --output benchmark.json
+    python benchmark.py compare baseline.json benchmark.json --threshold 0.1
+
+Every case reports the engine steps ("events") it processed, events per second, nanoseconds per event,
+the peak of traced Python allocations and the peak RSS of the process that ran it. compare flags every case
+that got slower per event or needs more memory than the baseline by more than the threshold.
+
+An event of a batch case is an iteration of the EmergencySimulator loop in one of its replications, counted
+in EmergencySimulator runs with the same seeds, so their ns/event compare directly with the emergency cases.
+run also times those runs one after the other and reports the speedup of the batch engine over them, both
+timings including setting up the simulators.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_engine import BatchEmergencySimulator
+from main import EmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator, STRATEGIES
+
+BENCHMARK_FORMAT_VERSION = 1
+
+
+class CountingEmergencySimulator(EmergencySimulator):
+    """Counts the iterations of the simulation loop, each one processes one event."""
+
+    events = 0
+
+    def wait_secs(self, secs):
+        self.events += 1
+        super().wait_secs(secs)
+
+
+class CountingExtendedEmergencySimulator(ExtendedEmergencySimulator):
+    """Counts the seconds processed by the engine, the event engine only processes seconds with an event."""
+
+    events = 0
+
+    def run_tick(self):
+        self.events += 1
+        return super().run_tick()
+
+
+def benchmark_cases(quick=False):
+    """
+    The benchmark cases as {name: case}. The horizons and loads give the scaling curves, a load of 2
+    means emergencies arrive twice as often. quick=True gives a small version for smoke tests.
+    """
+    horizons = [2, 8] if quick else [24, 240, 2400]
+    loads = [1, 2] if quick else [0.5, 1, 2, 4]
+    hours = 2 if quick else 240
+    cases = {}
+    for horizon in horizons:
+        cases[f"emergency/hours={horizon}"] = {"simulator": "emergency", "hours": horizon}
+    for load in loads:
+        cases[f"emergency/load={load}"] = {"simulator": "emergency", "hours": hours, "load": load}
+    for strategy in STRATEGIES:
+        # The cost per event should not grow with the fleet, compare vehicles=6 and vehicles=200
+        for num_vehicles, num_hqs in [(1, 1), (2, 2), (6, 3), (200, 3)]:
+            cases[f"extended/{strategy}/vehicles={num_vehicles}/hqs={num_hqs}"] = {
+                "simulator": "extended", "hours": hours, "strategy": strategy,
+                "num_vehicles": num_vehicles, "num_hqs": num_hqs,
+            }
+    for load in loads:
+        cases[f"extended/fifo/load={load}"] = {"simulator": "extended", "hours": hours, "strategy": "fifo",
+                                               "num_vehicles": 2, "num_hqs": 2, "load": load}
+    # One vehicle can not keep up with a load of 4, the cost per dispatch should not grow with the queue
+    for load in loads:
+        cases[f"extended/nearest/vehicles=1/load={load}"] = {"simulator": "extended", "hours": hours,
+                                                             "strategy": "nearest", "num_vehicles": 1, "num_hqs": 1,
+                                                             "load": load}
+    # The batch engine has to be at least 10x faster than EmergencySimulator on 100 replications of 1000 hours
+    num_replications, batch_hours = (10, 2) if quick else (100, 1000)
+    cases[f"batch/replications={num_replications}/hours={batch_hours}"] = {
+        "simulator": "batch", "hours": batch_hours, "replications": num_replications}
+    for mode in ["events", "sampled"]:
+        cases[f"trace/{mode}"] = {"simulator": "emergency", "hours": hours, "trace": mode}
+    return cases
+
+
+def make_simulator(case, counting=False, seed=0):
+    if case["simulator"] == "batch":
+        simulator = BatchEmergencySimulator(range(seed, seed + case["replications"]))
+        for provider in simulator.variates.providers:
+            provider.mean_interarrival /= case.get("load", 1)
+        return simulator
+    if case["simulator"] == "emergency":
+        simulator_class = CountingEmergencySimulator if counting else EmergencySimulator
+        simulator = simulator_class(seed=seed, trace=case.get("trace", "off"))
+    else:
+        simulator_class = CountingExtendedEmergencySimulator if counting else ExtendedEmergencySimulator
+        simulator = simulator_class(num_hqs=case["num_hqs"], num_vehicles=case["num_vehicles"],
+                                    strategy=case["strategy"], seed=seed)
+    # Nothing is drawn before the first step, so the arrival rate can still be changed
+    simulator.variates.mean_interarrival /= case.get("load", 1)
+    return simulator
+
+
+def scalar_runs(case):
+    """The EmergencySimulator runs that do what a batch case does, as (case, seed) pairs."""
+    scalar = {"simulator": "emergency", "hours": case["hours"], "load": case.get("load", 1)}
+    return [(scalar, seed) for seed in range(case["replications"])]
+
+
+def time_scalar_runs(case):
+    """Seconds the EmergencySimulator runs of a batch case take one after the other, setup included."""
+    start = time.perf_counter()
+    for scalar, seed in scalar_runs(case):
+        make_simulator(scalar, seed=seed).simulate(scalar["hours"])
+    return time.perf_counter() - start
+
+
+def run_case(case, repeats=3):
+    """Runs one case and returns its measurements."""
+    batch = case["simulator"] == "batch"
+    # The events are counted in separate runs, so the counting does not show up in the timings
+    if batch:
+        counters = [make_simulator(scalar, counting=True, seed=seed) for scalar, seed in scalar_runs(case)]
+    else:
+        counters = [make_simulator(case, counting=True)]
+    for counter in counters:
+        counter.simulate(case["hours"])
+    events = sum(counter.events for counter in counters)
+
+    timings = []
+    for _ in range(repeats):
+        if batch:
+            # Setting up the replications is part of the work, as in time_scalar_runs
+            start = time.perf_counter()
+            make_simulator(case).simulate(case["hours"])
+        else:
+            simulator = make_simulator(case)
+            start = time.perf_counter()
+            simulator.simulate(case["hours"])
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    make_simulator(case).simulate(case["hours"])
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = min(timings)
+    result = {
+        "case": case,
+        "events": events,
+        "seconds": seconds,
+        "events_per_sec": events / seconds,
+        "ns_per_event": seconds / max(events, 1) * 1e9,
+        "peak_traced_bytes": peak_traced,
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+    }
+    if batch:
+        result["scalar_seconds"] = min(time_scalar_runs(case) for _ in range(repeats))
+        result["speedup"] = result["scalar_seconds"] / seconds
+    return result
+
+
+def run_benchmarks(cases, repeats=3, isolate=True):
+    """
+    Runs every case and returns the results as a dict that can be stored as json.
+    With isolate=True every case runs in a fresh process, so its peak RSS is not inflated by earlier cases.
+    """
+    results = {}
+    for name, case in cases.items():
+        if isolate:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[name] = pool.submit(run_case, case, repeats).result()
+        else:
+            results[name] = run_case(case, repeats)
+        print(f"{name:<50} {results[name]['events_per_sec']:>12.0f} events/s "
+              f"{results[name]['ns_per_event']:>10.0f} ns/event", file=sys.stderr)
+        if "speedup" in results[name]:
+            print(f"{name:<50} {results[name]['speedup']:>12.1f}x as fast as EmergencySimulator "
+                  f"({results[name]['scalar_seconds']:.2f}s)", file=sys.stderr)
+    return {
+        "version": BENCHMARK_FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Returns the regressions of `current` against `baseline` as a list of (case, metric, baseline, current).
+    A case regressed if it needs more than `threshold` (relative) more time per event or memory.
+    """
+    regressions = []
+    for name, result in current["cases"].items():
+        if name not in baseline["cases"]:
+            continue
+        for metric in ["ns_per_event", "peak_traced_bytes", "peak_rss_bytes"]:
+            before = baseline["cases"][name][metric]
+            after = result[metric]
+            if after > before * (1 + threshold):
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--output", default="benchmark.json", help="json file for the results")
+    run.add_argument("--repeats", type=int, default=3, help="timed runs per case, the fastest one counts")
+    run.add_argument("--quick", action="store_true", help="small horizons, for smoke tests")
+    run.add_argument("--filter", default="", help="only run the cases whose name contains this")
+    check = commands.add_parser("compare", help="compare results with a baseline")
+    check.add_argument("baseline")
+    check.add_argument("current")
+    check.add_argument("--threshold", type=float, default=0.1, help="tolerated relative slowdown")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        cases = {name: case for name, case in benchmark_cases(args.quick).items() if args.filter in name}
+        with open(args.output, "w") as file:
+            json.dump(run_benchmarks(cases, args.repeats), file, indent=2)
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.threshold)
+    for name, metric, before, after in regressions:
+        print(f"REGRESSION {name} {metric}: {before:.6g} -> {after:.6g} ({after / before - 1:+.1%})")
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import copy
+import unittest
+from benchmark import benchmark_cases, compare, run_benchmarks
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cases = benchmark_cases(quick=True)
+        cls.cases = {name: cases[name] for name in ["emergency/hours=2", "extended/nearest/vehicles=2/hqs=2",
+                                                    "trace/events"]}
+        cls.results = run_benchmarks(cls.cases, repeats=1, isolate=False)
+
+    def test_reports_every_case(self):
+        self.assertEqual(set(self.results["cases"]), set(self.cases))
+        for name, result in self.results["cases"].items():
+            self.assertGreater(result["events"], 0, f"No events counted for {name}.")
+            self.assertGreater(result["events_per_sec"], 0)
+            self.assertAlmostEqual(result["ns_per_event"] * result["events_per_sec"], 1e9, delta=1)
+            self.assertGreater(result["peak_traced_bytes"], 0)
+
+    def test_load_scales_arrivals(self):
+        cases = benchmark_cases(quick=True)
+        results = run_benchmarks({name: cases[name] for name in ["emergency/load=1", "emergency/load=2"]},
+                                 repeats=1, isolate=False)["cases"]
+        self.assertGreater(results["emergency/load=2"]["events"], results["emergency/load=1"]["events"])
+
+    def test_batch_speedup(self):
+        cases = benchmark_cases(quick=True)
+        name = "batch/replications=10/hours=2"
+        batch = run_benchmarks({name: cases[name]}, repeats=1, isolate=False)["cases"][name]
+        self.assertGreater(batch["events"], 0)
+        self.assertGreater(batch["scalar_seconds"], 0)
+        self.assertAlmostEqual(batch["speedup"], batch["scalar_seconds"] / batch["seconds"])
+        self.assertNotIn("speedup", self.results["cases"]["emergency/hours=2"])
+
+    def test_compare_flags_regressions(self):
+        self.assertEqual(compare(self.results, self.results), [], "Identical results flagged as regression.")
+        slower = copy.deepcopy(self.results)
+        slower["cases"]["trace/events"]["ns_per_event"] *= 1.5
+        regressions = compare(self.results, slower, threshold=0.1)
+        self.assertEqual([(name, metric) for name, metric, _, _ in regressions], [("trace/events", "ns_per_event")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,261 @@
+"""
+Replay of recorded emergency calls instead of synthetic arrivals.
+
+A call log is a CSV file with a header row and one call per row, sorted by time:
+
+    time,district,priority,care_time
+    2024-01-01T00:03:12,4,0,840
+    2024-01-01T00:41:55,7,1,
+
+time is a number of seconds or an ISO 8601 date and time, district the index of the district in the
+DistrictModel, priority 1 for life-threatening calls and 0 otherwise. care_time in seconds is optional, as
+a column or per call, calls without one get a care time drawn as in the synthetic model.
+
+The log is parsed in chunks of `chunk_rows` calls as the simulation asks for them, so it is never held in
+memory as a whole. `convert` turns it into a .npy file once, which is memory-mapped and read in chunks
+without any parsing:
+
+    convert("calls.csv", "calls.npy")
+    log = CallLog("calls.npy")
+    result = EmergencySimulator(call_log=log).simulate(log.duration() / 3600)
+
+Simulated time 0 is the time of the first call.
+"""
+import itertools
+import os
+
+import numpy as np
+
+from variates import VariateProvider, STREAMS
+
+# One call in binary form, a care_time of -1 means none was recorded
+CALL_DTYPE = np.dtype([("time", np.int64), ("district", np.int32), ("prio", np.int8), ("care_time", np.int32)])
+
+CHUNK_ROWS = 65536
+
+COLUMNS = ("time", "district", "priority")
+OPTIONAL_COLUMNS = ("care_time",)
+
+# Streams taken from the log, the others are still drawn
+LOGGED_STREAMS = ("arrival", "priority", "district", "recorded_care")
+DRAWN_STREAMS = tuple(name for name in STREAMS if name not in LOGGED_STREAMS)
+
+# Time to the next call after the last one. Simulate at most log.duration() seconds, as a longer run would
+# spend all of this time idle.
+NO_MORE_CALLS = 2 ** 62
+
+
+class CallLog:
+    """
+    A call log on disk, a CSV file or a .npy file of CALL_DTYPE records written by `convert`.
+    Only the path is kept, every `chunks` opens the file anew, so a CallLog can be passed to worker processes.
+    """
+
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        self.path = os.fspath(path)
+        self.chunk_rows = chunk_rows
+        self.binary = self.path.endswith(".npy")
+
+    def __repr__(self):
+        # Size and modification time stand in for the content, so cached results of an edited log are not reused
+        status = os.stat(self.path)
+        return f"CallLog({self.path!r}, {status.st_size} bytes, modified {status.st_mtime_ns})"
+
+    def chunks(self, start=0):
+        """The calls from call number `start` on, as arrays of CALL_DTYPE of at most chunk_rows calls."""
+        return self.read_binary(start) if self.binary else self.read_csv(start)
+
+    def read_binary(self, start):
+        calls = np.load(self.path, mmap_mode="r")
+        if calls.dtype != CALL_DTYPE:
+            raise ValueError(f"{self.path} is not a converted call log")
+        for begin in range(start, len(calls), self.chunk_rows):
+            yield calls[begin:begin + self.chunk_rows]
+
+    def read_csv(self, start):
+        with open(self.path) as file:
+            parser = CsvParser(next(file, ""))
+            # The rows before `start` are skipped unparsed, calls left over by blank lines among them are dropped below
+            start -= sum(map(bool, map(str.strip, itertools.islice(file, start))))
+            while True:
+                lines = list(itertools.islice(file, self.chunk_rows))
+                if not lines:
+                    return
+                chunk = parser.parse(lines)
+                if start:
+                    skipped = min(start, len(chunk))
+                    chunk = chunk[skipped:]
+                    start -= skipped
+                if len(chunk):
+                    yield chunk
+
+    def duration(self):
+        """
+        Seconds a replay has to run to include every call: from the first call to one second past the last,
+        as a simulation stops before the second it ends on. Read from the first and last rows only.
+        """
+        if self.binary:
+            times = np.load(self.path, mmap_mode="r")["time"]
+            return int(times[-1] - times[0]) + 1 if len(times) else 0
+        with open(self.path, "rb") as file:
+            parser = CsvParser(file.readline().decode())
+            first = file.readline().decode()
+            # The last row is within the last few kilobytes of the file
+            file.seek(max(file.seek(0, os.SEEK_END) - 4096, 0))
+            last = [line for line in file.read().decode(errors="replace").splitlines() if line.strip()][-1]
+        if not first.strip():
+            return 0
+        times = parser.parse([first, last])["time"]
+        return int(times[-1] - times[0]) + 1
+
+
+class CsvParser:
+    """Parses chunks of lines of a call log with the given header row into arrays of CALL_DTYPE."""
+
+    def __init__(self, header):
+        names = [name.strip().lower() for name in header.split(",")]
+        missing = [name for name in COLUMNS if name not in names]
+        if missing:
+            raise ValueError(f"The call log has no {', '.join(missing)} column")
+        self.columns = [names.index(name) for name in COLUMNS + OPTIONAL_COLUMNS if name in names]
+        self.has_care_time = len(self.columns) > len(COLUMNS)
+        self.iso_times = None
+
+    def parse(self, lines):
+        time_column = self.columns[0]
+        if self.iso_times is None:
+            first = next(line for line in lines if line.strip())
+            self.iso_times = not is_number(first.split(",")[time_column])
+        numeric_columns = self.columns[1:] if self.iso_times else self.columns
+        try:
+            values = np.loadtxt(lines, delimiter=",", usecols=numeric_columns, dtype=np.float64, ndmin=2)
+        except ValueError:
+            # Some calls have no care time, slower but fills them in
+            values = np.genfromtxt(lines, delimiter=",", usecols=numeric_columns, dtype=np.float64,
+                                   filling_values=-1, ndmin=2)
+        if np.isnan(values).any():
+            raise ValueError("The call log has calls with missing or invalid values")
+
+        chunk = np.empty(len(values), dtype=CALL_DTYPE)
+        if self.iso_times:
+            times = np.loadtxt(lines, delimiter=",", usecols=time_column, dtype=str, ndmin=1)
+            chunk["time"] = times.astype("datetime64[s]").astype(np.int64)
+        else:
+            chunk["time"] = np.rint(values[:, 0])
+            values = values[:, 1:]
+        chunk["district"] = values[:, 0]
+        chunk["prio"] = values[:, 1]
+        chunk["care_time"] = np.rint(values[:, 2]) if self.has_care_time else -1
+        return chunk
+
+
+def is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def convert(csv_path, output, chunk_rows=CHUNK_ROWS):
+    """
+    Converts a CSV call log into a .npy file of CALL_DTYPE records, chunk by chunk.
+
+    :return: The number of calls.
+    """
+    records_path = output + f".{os.getpid()}.records"
+    temporary = output + f".{os.getpid()}.tmp"
+    count = 0
+    with open(records_path, "wb") as records:
+        for chunk in CallLog(csv_path, chunk_rows).chunks():
+            chunk.tofile(records)
+            count += len(chunk)
+    # The records are written before their number is known, the .npy header is put in front of them afterwards
+    header = np.lib.format.header_data_from_array_1_0(np.empty(0, dtype=CALL_DTYPE))
+    header["shape"] = (count,)
+    with open(temporary, "wb") as file, open(records_path, "rb") as records:
+        np.lib.format.write_array_header_1_0(file, header)
+        while block := records.read(2 ** 24):
+            file.write(block)
+    os.remove(records_path)
+    os.replace(temporary, output)
+    return count
+
+
+class CallLogVariates(VariateProvider):
+    """
+    A VariateProvider whose arrival, priority and district streams are the calls of a CallLog, together with
+    a stream of their recorded care times. The chunks of the log fill the buffers of these streams like the
+    blocks of drawn variates do, so the simulators read calls exactly like synthetic arrivals.
+    Travel, care and queue variates are still drawn from `seed`.
+    """
+
+    def __init__(self, log, seed, weights, **kwargs):
+        super().__init__(seed, weights, **kwargs)
+        self.log = log if isinstance(log, CallLog) else CallLog(log)
+        self.num_districts = len(weights)
+        self.buffers["recorded_care"] = []
+        self.positions["recorded_care"] = 0
+        # Columns of loaded chunks not yet in the buffers. The arrival stream is one call behind, the time to
+        # the next call is only known once that call is loaded.
+        self.pending = {name: [] for name in LOGGED_STREAMS}
+        self.previous_time = None
+        self.calls_read = 0
+        self.calls = self.log.chunks()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state["calls"]
+        return state
+
+    def __setstate__(self, state):
+        # Continues after the calls read so far
+        self.__dict__.update(state)
+        self.calls = self.log.chunks(self.calls_read)
+
+    def block(self, name, size=None):
+        if name not in LOGGED_STREAMS:
+            return super().block(name, size)
+        pending = self.pending[name]
+        while not pending:
+            if not self.load_chunk():
+                if name == "arrival":
+                    return np.array([NO_MORE_CALLS])
+                raise ValueError(f"No calls left in {self.log.path}")
+        return pending.pop(0)
+
+    def load_chunk(self):
+        chunk = next(self.calls, None)
+        if chunk is None:
+            return False
+        times = chunk["time"].astype(np.int64)
+        districts = chunk["district"]
+        prios = chunk["prio"]
+        if districts.min() < 0 or districts.max() >= self.num_districts:
+            raise ValueError(f"Calls in {self.log.path} are in districts that do not exist")
+        if prios.min() < 0 or prios.max() > 1:
+            raise ValueError(f"Calls in {self.log.path} have priorities other than 0 and 1")
+        gaps = np.diff(times) if self.previous_time is None else np.diff(times, prepend=self.previous_time)
+        if len(gaps) and gaps.min() < 0:
+            raise ValueError(f"The calls in {self.log.path} are not sorted by time")
+
+        self.previous_time = int(times[-1])
+        self.calls_read += len(chunk)
+        if len(gaps):
+            self.pending["arrival"].append(gaps)
+        self.pending["priority"].append(prios == 1)
+        self.pending["district"].append(districts)
+        self.pending["recorded_care"].append(chunk["care_time"])
+        return True
+
+    def recorded_care_time(self):
+        care_time = self.next("recorded_care")
+        return care_time if care_time >= 0 else None
+
+    def reseeded(self, seed, weights):
+        # The calls continue where they are, only the drawn streams start over from `seed`
+        self.generators = VariateProvider(seed, weights).generators
+        for name in DRAWN_STREAMS:
+            self.buffers[name] = []
+            self.positions[name] = 0
+        return self
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from main import EmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator
+from call_log import CallLog, CallLogVariates, CsvParser, convert, CALL_DTYPE
+from events import ARRIVAL, ON_SCENE, CARE_DONE, where
+
+
+class CallLogCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(3)
+        self.times = 1_000_000 + np.cumsum(rng.integers(0, 4000, 500))
+        self.districts = rng.integers(0, 10, 500)
+        self.prios = (rng.random(500) < 0.25).astype(int)
+        self.care_times = rng.integers(300, 3000, 500)
+        self.path = self.write("calls.csv", "time,district,priority,care_time",
+                               zip(self.times, self.districts, self.prios, self.care_times))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, header, rows):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write(header + "\n")
+            for row in rows:
+                file.write((",".join(str(value) for value in row) if row else "") + "\n")
+        return path
+
+    def read(self, log):
+        return np.concatenate(list(log.chunks()))
+
+
+class CallLogTests(CallLogCase):
+
+    def test_chunks(self):
+        calls = self.read(CallLog(self.path, chunk_rows=64))
+        self.assertEqual(calls.dtype, CALL_DTYPE)
+        np.testing.assert_array_equal(calls["time"], self.times)
+        np.testing.assert_array_equal(calls["district"], self.districts)
+        np.testing.assert_array_equal(calls["prio"], self.prios)
+        np.testing.assert_array_equal(calls["care_time"], self.care_times)
+        self.assertTrue(all(len(chunk) <= 64 for chunk in CallLog(self.path, chunk_rows=64).chunks()))
+
+    def test_chunks_from_a_call(self):
+        parse = CsvParser.parse
+        parsed = []
+        with mock.patch.object(CsvParser, "parse", lambda parser, lines: parsed.append(len(lines)) or parse(parser, lines)):
+            calls = np.concatenate(list(CallLog(self.path, chunk_rows=64).chunks(start=100)))
+        np.testing.assert_array_equal(calls["time"], self.times[100:])
+        self.assertEqual(sum(parsed), 400, "The calls before the start were parsed.")
+        output = os.path.join(self.directory.name, "calls.npy")
+        convert(self.path, output)
+        calls = np.concatenate(list(CallLog(output, chunk_rows=64).chunks(start=100)))
+        np.testing.assert_array_equal(calls["time"], self.times[100:])
+
+    def test_chunks_from_a_call_with_blank_lines(self):
+        path = self.write("blank.csv", "time,district,priority", [(0, 1, 0), "", (60, 2, 1), "", (90, 3, 0)])
+        for start, times in [(1, [60, 90]), (2, [90]), (3, [])]:
+            chunks = list(CallLog(path).chunks(start=start))
+            self.assertEqual([time for chunk in chunks for time in chunk["time"]], times)
+
+    def test_convert(self):
+        output = os.path.join(self.directory.name, "calls.npy")
+        self.assertEqual(convert(self.path, output, chunk_rows=64), 500)
+        np.testing.assert_array_equal(self.read(CallLog(output, chunk_rows=100)), self.read(CallLog(self.path)))
+        self.assertEqual(np.load(output, mmap_mode="r").shape, (500,))
+        self.assertEqual(CallLog(output).duration(), CallLog(self.path).duration())
+        self.assertEqual(CallLog(output).duration(), self.times[-1] - self.times[0] + 1)
+
+    def test_iso_times_and_missing_care_times(self):
+        path = self.write("iso.csv", "district,time,priority,care_time",
+                          [(3, "2024-01-01T00:00:00", 1, 900), (4, "2024-01-01T00:10:05", 0, ""),
+                           (5, "2024-01-02 00:00:00", 0, 120)])
+        calls = self.read(CallLog(path))
+        np.testing.assert_array_equal(calls["time"] - calls["time"][0], [0, 605, 86400])
+        np.testing.assert_array_equal(calls["district"], [3, 4, 5])
+        np.testing.assert_array_equal(calls["care_time"], [900, -1, 120])
+        self.assertEqual(CallLog(path).duration(), 86401)
+
+    def test_without_care_times(self):
+        path = self.write("short.csv", "time,district,priority", [(0, 1, 0), (60, 2, 1)])
+        np.testing.assert_array_equal(self.read(CallLog(path))["care_time"], [-1, -1])
+
+    def test_missing_column(self):
+        path = self.write("bad.csv", "time,priority", [(0, 1)])
+        with self.assertRaises(ValueError):
+            self.read(CallLog(path))
+
+    def test_invalid_calls(self):
+        for name, rows in [("unsorted.csv", [(60, 1, 0), (0, 2, 0)]), ("district.csv", [(0, 10, 0)]),
+                           ("priority.csv", [(0, 1, 2)])]:
+            variates = CallLogVariates(self.write(name, "time,district,priority", rows), 1, np.ones(10))
+            with self.assertRaises(ValueError):
+                for _ in range(2):
+                    variates.time_to_next_emergency()
+                    variates.district()
+
+
+class ReplayTests(CallLogCase):
+
+    def assert_arrivals_replayed(self, events):
+        arrivals = list(where(events, kinds=[ARRIVAL]))
+        self.assertEqual([event.time for event in arrivals], list(self.times - self.times[0]))
+        self.assertEqual([event.district for event in arrivals], list(self.districts))
+        self.assertEqual([event.prio for event in arrivals], list(self.prios))
+
+    def test_single_doctor_replay(self):
+        log = CallLog(self.path, chunk_rows=64)
+        simulator = EmergencySimulator(seed=1, call_log=log)
+        events = list(simulator.simulate_iter(log.duration() / 3600))
+        self.assert_arrivals_replayed(events)
+        # The recorded care times are used instead of drawn ones
+        self.assertEqual(simulator.variates.positions["care"], 0)
+        care_times = dict(zip(self.times - self.times[0], self.care_times))
+        on_scene = {}
+        for event in where(events, kinds=[ON_SCENE, CARE_DONE]):
+            if event.kind == ON_SCENE:
+                on_scene[event.start_time] = event.time
+            else:
+                self.assertEqual(event.time - on_scene[event.start_time], care_times[event.start_time])
+
+    def test_fleet_replay(self):
+        log = CallLog(self.path, chunk_rows=64)
+        simulator = ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, seed=1, call_log=log)
+        self.assert_arrivals_replayed(list(simulator.simulate_iter(log.duration() / 3600)))
+
+    def test_every_call_arrives_within_the_duration(self):
+        log = CallLog(self.write("three.csv", "time,district,priority", [(100, 1, 0), (700, 2, 1), (4000, 3, 0)]))
+        for simulator in [EmergencySimulator(seed=1, call_log=log),
+                          ExtendedEmergencySimulator(num_vehicles=2, seed=1, call_log=log)]:
+            arrivals = list(where(simulator.simulate_iter(log.duration() / 3600), kinds=[ARRIVAL]))
+            self.assertEqual([event.time for event in arrivals], [0, 600, 3900])
+
+    def test_snapshot_continues_the_log(self):
+        simulator = EmergencySimulator(seed=1, call_log=CallLog(self.path, chunk_rows=64))
+        simulator.simulate(50)
+        restored = EmergencySimulator.restore(simulator.snapshot())
+        self.assertEqual(restored.simulate(300), simulator.simulate(300))
+
+    def test_reseed_keeps_the_calls(self):
+        log = CallLog(self.path, chunk_rows=64)
+        simulator = EmergencySimulator(seed=1, call_log=log)
+        simulator.simulate(50)
+        reseeded = EmergencySimulator.restore(simulator.snapshot(), seed=2)
+        reseeded_from = simulator.total_time_passed
+        events = list(reseeded.simulate_iter(log.duration() / 3600 + 1))
+        arrivals = [event.time for event in where(events, kinds=[ARRIVAL])]
+        self.assertEqual(arrivals, [time for time in self.times - self.times[0] if time >= reseeded_from])
+
+
+if __name__ == "__main__":
+    unittest.main()
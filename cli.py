@@ -0,0 +1,200 @@
+"""
+Command line entry point of the simulations.
+
+    python cli.py run --hours 1000 --seed 7
+    python cli.py run --simulator extended --num-hqs 3 --num-vehicles 6 --strategy nearest --hours 10
+    python cli.py replicate --hours 1000 --relative doc_util=0.01 --relative avg_non_live_threatening_waiting_time_min=0.05
+    python cli.py sweep --hqs 1 2 3 5 --num-vehicles 2 --hours 10 --plot
+    python cli.py plot playback --hours 100
+    python cli.py plot playback --hours 100 --export frames/
+    python cli.py convert-log calls.csv calls.npy
+    python cli.py run --simulator extended --num-vehicles 4 --call-log calls.npy
+
+Simulation modules are imported by the commands that run them, and plotting and dataframe libraries only
+by the commands that plot, so simulation-only commands and their worker processes start without them.
+"""
+import argparse
+import json
+import sys
+
+SIMULATORS = ("emergency", "extended")
+# task4_and_5.STRATEGIES, repeated so that parsing the arguments does not import the simulators
+STRATEGIES = ("fifo", "nearest", "high_priority_first")
+PLOTS = ("playback", "time-series", "emergencies")
+
+
+def simulator_arguments(parser):
+    parser.add_argument("--simulator", choices=SIMULATORS, default="emergency",
+                        help="single doctor (emergency) or fleet (extended) model")
+    parser.add_argument("--hours", type=float, default=None,
+                        help="simulated hours per run, by default 1000 or the duration of the call log")
+    parser.add_argument("--num-hqs", type=int, default=1, help="HQs of the extended simulator")
+    parser.add_argument("--num-vehicles", type=int, default=1, help="vehicles of the extended simulator")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="fifo", help="dispatch strategy of the extended simulator")
+    parser.add_argument("--call-log", default=None, help="replay the calls of a CSV or converted .npy call log")
+
+
+def simulator_setup(args):
+    """The simulator class and its keyword arguments for the --simulator options, fills in the default --hours."""
+    simulator_kwargs = {}
+    hours = 1000
+    if args.call_log:
+        from call_log import CallLog
+        simulator_kwargs["call_log"] = CallLog(args.call_log)
+        hours = simulator_kwargs["call_log"].duration() / 3600
+    if args.hours is None:
+        args.hours = hours
+    if args.simulator == "emergency":
+        from main import EmergencySimulator
+        return EmergencySimulator, simulator_kwargs
+    from task4_and_5 import ExtendedEmergencySimulator
+    simulator_kwargs.update(num_hqs=args.num_hqs, num_vehicles=args.num_vehicles, strategy=args.strategy)
+    return ExtendedEmergencySimulator, simulator_kwargs
+
+
+def targets(values):
+    """Parses metric=value targets."""
+    parsed = {}
+    for value in values or []:
+        metric, _, target = value.partition("=")
+        parsed[metric] = float(target)
+    return parsed
+
+
+def scalar_metrics(result):
+    return {name: value for name, value in result.items() if isinstance(value, (int, float))}
+
+
+def run(args):
+    simulator_class, simulator_kwargs = simulator_setup(args)
+    if args.steady_state and args.simulator != "emergency":
+        raise SystemExit("Steady-state analysis is only available for the single doctor model")
+    simulator = simulator_class(seed=args.seed, **simulator_kwargs)
+    if args.steady_state:
+        result = simulator.simulate(args.hours, steady_state=True)
+        if result["steady_state_reason"] is not None:
+            print(f"No steady-state analysis: {result['steady_state_reason']}", file=sys.stderr)
+    else:
+        result = simulator.simulate(args.hours)
+    print(json.dumps(scalar_metrics(result), indent=2))
+
+
+def replicate(args):
+    from replications import confidence_half_width, run_replications, run_until_precise
+    from result_cache import ResultCache
+
+    simulator_class, simulator_kwargs = simulator_setup(args)
+    cache = ResultCache(args.cache) if args.cache else None
+    absolute, relative = targets(args.absolute), targets(args.relative)
+    if absolute or relative:
+        outcome = run_until_precise(simulator_class, args.hours, absolute=absolute, relative=relative,
+                                    master_seed=args.master_seed, max_replications=args.replications,
+                                    workers=args.workers, cache=cache, **simulator_kwargs)
+        results = outcome["results"]
+        if not outcome["converged"]:
+            print(f"Targets not reached within {args.replications} replications", file=sys.stderr)
+    else:
+        results = run_replications(simulator_class, args.replications, args.hours, master_seed=args.master_seed,
+                                   workers=args.workers, cache=cache, **simulator_kwargs)
+    print(f"{len(results)} replications")
+    for name in scalar_metrics(results[0]):
+        values = [result[name] for result in results]
+        mean = sum(values) / len(values)
+        print(f"{name}: {mean:.6g} ± {confidence_half_width(values):.3g}")
+
+
+def sweep(args):
+    from result_cache import ResultCache
+    from task4_and_5 import run_hq_sweep
+
+    cache = ResultCache(args.cache, max_bytes=500 * 2 ** 20)
+    replications = run_hq_sweep(args.hqs, args.strategies, args.num_vehicles, args.hours, args.replications,
+                                cache, master_seed=args.master_seed, workers=args.workers)
+    if args.plot:
+        from visualisation import advanced_simulation_results
+        advanced_simulation_results(args.strategies, args.hqs, cache, replications, args.hours, args.num_vehicles,
+                                    master_seed=args.master_seed, workers=args.workers)
+
+
+def plot(args):
+    if args.trace:
+        trace = args.trace
+    else:
+        from main import EmergencySimulator
+        trace = EmergencySimulator(seed=args.seed, trace="events").simulate(args.hours)["trace"]
+    if args.export:
+        if args.kind == "emergencies":
+            raise SystemExit("Only animations can be exported")
+        kind = "time_series" if args.kind == "time-series" else "districts"
+        from visualisation import export_animation
+        export_animation(trace, args.export, kind=kind, seconds_per_frame=args.seconds_per_frame,
+                         workers=args.workers)
+        return
+
+    import visualisation
+    if args.kind == "time-series":
+        visualisation.dynamic_time_series(trace)
+    elif args.kind == "emergencies":
+        visualisation.visualize_emergency_counts(trace)
+    else:
+        visualisation.dynamic_visualization(trace)
+
+
+def convert_log(args):
+    from call_log import convert
+    print(f"{convert(args.csv, args.output)} calls")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    single = commands.add_parser("run", help="run one simulation and print its metrics")
+    simulator_arguments(single)
+    single.add_argument("--seed", type=int, default=123)
+    single.add_argument("--steady-state", action="store_true", help="drop the warm-up (single doctor model)")
+
+    replicated = commands.add_parser("replicate", help="run replications and print means with 95%% intervals")
+    simulator_arguments(replicated)
+    replicated.add_argument("--replications", type=int, default=100,
+                            help="replications to run, the cap when targets are given")
+    replicated.add_argument("--absolute", action="append", metavar="METRIC=HALF_WIDTH",
+                            help="replicate until the interval of the metric is this narrow")
+    replicated.add_argument("--relative", action="append", metavar="METRIC=FRACTION",
+                            help="replicate until the interval of the metric is this narrow relative to its mean")
+    replicated.add_argument("--master-seed", type=int, default=0)
+    replicated.add_argument("--workers", type=int, default=None, help="worker processes, 1 runs in-process")
+    replicated.add_argument("--cache", default=None, help="directory of a result cache")
+
+    swept = commands.add_parser("sweep", help="compare numbers of HQs and strategies of the extended simulator")
+    swept.add_argument("--hqs", type=int, nargs="+", default=list(range(1, 10)))
+    swept.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    swept.add_argument("--num-vehicles", type=int, default=2)
+    swept.add_argument("--hours", type=float, default=10)
+    swept.add_argument("--replications", type=int, default=1000, help="cap on the replications per configuration")
+    swept.add_argument("--master-seed", type=int, default=0)
+    swept.add_argument("--workers", type=int, default=None, help="worker processes, 1 runs in-process")
+    swept.add_argument("--cache", default=".result_cache", help="directory of the result cache")
+    swept.add_argument("--plot", action="store_true", help="plot the results")
+
+    plotted = commands.add_parser("plot", help="plot or export a traced run of the single doctor model")
+    plotted.add_argument("kind", choices=PLOTS)
+    plotted.add_argument("--trace", default=None, help="trace file to plot instead of a new run")
+    plotted.add_argument("--hours", type=float, default=100)
+    plotted.add_argument("--seed", type=int, default=123)
+    plotted.add_argument("--export", default=None, metavar="OUTPUT",
+                         help="render to a directory of frames or a video file instead of a window")
+    plotted.add_argument("--seconds-per-frame", type=float, default=60, help="simulated seconds per exported frame")
+    plotted.add_argument("--workers", type=int, default=None, help="worker processes of the export")
+
+    converted = commands.add_parser("convert-log", help="convert a CSV call log to a .npy file for faster replays")
+    converted.add_argument("csv")
+    converted.add_argument("output")
+    args = parser.parse_args(argv)
+
+    {"run": run, "replicate": replicate, "sweep": sweep, "plot": plot, "convert-log": convert_log}[args.command](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
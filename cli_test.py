@@ -0,0 +1,85 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import cli
+
+HEAVY_MODULES = ("matplotlib", "seaborn", "pandas", "networkx")
+
+
+def run_cli(*argv):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        cli.main(list(argv))
+    return output.getvalue()
+
+
+class CliTests(unittest.TestCase):
+
+    def test_run(self):
+        result = json.loads(run_cli("run", "--hours", "50", "--seed", "3"))
+        self.assertGreater(result["doc_util"], 0)
+        result = json.loads(run_cli("run", "--simulator", "extended", "--num-vehicles", "2", "--hours", "5"))
+        self.assertIn("avg_travel_time", result)
+
+    def test_replicate(self):
+        output = run_cli("replicate", "--hours", "20", "--replications", "4", "--workers", "1")
+        self.assertIn("4 replications", output)
+        self.assertIn("doc_util: ", output)
+        output = run_cli("replicate", "--hours", "200", "--relative", "doc_util=0.5", "--workers", "1")
+        self.assertIn("10 replications", output, "The run should stop at the first check.")
+
+    def test_call_log(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path, npy_path = os.path.join(directory, "calls.csv"), os.path.join(directory, "calls.npy")
+            with open(csv_path, "w") as file:
+                file.write("time,district,priority\n")
+                file.writelines(f"{minute * 60},{minute % 10},{minute % 4 == 0:d}\n" for minute in range(0, 6000, 40))
+            self.assertIn("150 calls", run_cli("convert-log", csv_path, npy_path))
+            for path in [csv_path, npy_path]:
+                result = json.loads(run_cli("run", "--call-log", path, "--seed", "3"))
+                self.assertGreater(result["doc_util"], 0)
+            output = run_cli("replicate", "--simulator", "extended", "--num-vehicles", "2", "--call-log", npy_path,
+                             "--replications", "3", "--workers", "2")
+            self.assertIn("3 replications", output)
+
+    def test_sweep(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = run_cli("sweep", "--hqs", "1", "2", "--strategies", "fifo", "--replications", "10",
+                             "--hours", "5", "--workers", "1", "--cache", directory)
+            self.assertIn("2 headquarters, fifo: 10 simulations", output)
+            self.assertGreater(len(os.listdir(directory)), 0)
+
+    def test_unknown_strategy(self):
+        from task4_and_5 import STRATEGIES
+        self.assertEqual(cli.STRATEGIES, STRATEGIES)
+        for argv in [["run", "--simulator", "extended", "--strategy", "nearst"],
+                     ["sweep", "--hqs", "1", "--strategies", "fifo", "nearst"]]:
+            with contextlib.redirect_stderr(io.StringIO()) as error, self.assertRaises(SystemExit):
+                cli.main(argv)
+            self.assertIn("invalid choice: 'nearst'", error.getvalue())
+
+    def test_simulation_commands_do_not_import_plotting(self):
+        script = ("import sys, cli; cli.main(['replicate', '--hours', '5', '--replications', '2', '--workers', '2']);"
+                  f"print([name for name in {HEAVY_MODULES!r} if name in sys.modules])")
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(cli.__file__))).stdout
+        self.assertEqual(output.strip().splitlines()[-1], "[]")
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            frames = os.path.join(directory, "frames")
+            script = ("import matplotlib; matplotlib.use('Agg'); import cli; "
+                      f"cli.main(['plot', 'playback', '--hours', '3', '--export', {frames!r}, "
+                      "'--seconds-per-frame', '3600', '--workers', '1'])")
+            subprocess.run([sys.executable, "-c", script], check=True, capture_output=True,
+                           cwd=os.path.dirname(os.path.abspath(cli.__file__)))
+            self.assertGreater(len(os.listdir(frames)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
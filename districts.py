@@ -0,0 +1,162 @@
+import hashlib
+import heapq
+import json
+import math
+import os
+
+import numpy as np
+
+# Default directory for the cached travel time matrices of road graphs
+DISTRICT_CACHE = ".district_cache"
+
+
+class DistrictModel:
+    """
+    The districts of a city: their populations, the expected travel time in minutes between every pair
+    of districts and the district the single doctor of EmergencySimulator returns to.
+
+    Only the populations, travel minutes, HQ and names are pickled, the travel seconds are derived again.
+    """
+
+    def __init__(self, populations, travel_minutes, hq=0, names=None):
+        self.populations = np.asarray(populations, dtype=np.float64)
+        self.travel_minutes = np.asarray(travel_minutes, dtype=np.float64)
+        num_districts = len(self.populations)
+        if self.travel_minutes.shape != (num_districts, num_districts):
+            raise ValueError(f"Expected a {num_districts}x{num_districts} travel time matrix, "
+                             f"got {self.travel_minutes.shape}")
+        if not np.all(np.isfinite(self.travel_minutes)):
+            raise ValueError("Some districts cannot be reached from others")
+        if not np.all(self.travel_minutes > 0):
+            raise ValueError("Travel times must be positive, the simulators divide by them")
+        if not 0 <= hq < num_districts:
+            raise ValueError(f"HQ district {hq} does not exist")
+        self.hq = hq
+        self.names = list(names) if names is not None else [str(i + 1) for i in range(num_districts)]
+        self.travel_seconds = self.travel_minutes * 60
+
+    def __getstate__(self):
+        return {"populations": self.populations, "travel_minutes": self.travel_minutes, "hq": self.hq,
+                "names": self.names}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.travel_seconds = self.travel_minutes * 60
+
+    def __len__(self):
+        return len(self.populations)
+
+    def __repr__(self):
+        # Identifies the model by content, so results cached for one model are found again for an equal one
+        digest = hashlib.sha256()
+        for array in (self.populations, self.travel_minutes):
+            digest.update(array.tobytes())
+        digest.update(json.dumps([self.hq, self.names]).encode())
+        return f"DistrictModel({len(self)} districts, {digest.hexdigest()[:16]})"
+
+    @classmethod
+    def from_graph(cls, populations, roads, within_minutes=None, hq=0, names=None, directed=False,
+                   cache_dir=DISTRICT_CACHE):
+        """
+        Districts connected by a sparse road graph. The travel time between two districts is the length of the
+        shortest path, and within_minutes the travel time inside each district (1 if not given).
+
+        :param roads: (from, to, minutes) of every road.
+        :param cache_dir: Directory the all-pairs matrix is cached in, keyed by the hash of the graph. None to not cache.
+        """
+        num_districts = len(populations)
+        within = np.ones(num_districts) if within_minutes is None else np.asarray(within_minutes, dtype=np.float64)
+        travel_minutes = shortest_path_matrix(num_districts, roads, directed, cache_dir)
+        travel_minutes[np.diag_indices(num_districts)] = within
+        return cls(populations, travel_minutes, hq=hq, names=names)
+
+    @classmethod
+    def load(cls, path, cache_dir=DISTRICT_CACHE):
+        """
+        Loads districts from a json file of the form
+            {"districts": [{"name": "A", "population": 10000, "within_minutes": 3}, ...],
+             "roads": [[0, 1, 6.5], ...], "directed": false, "hq": 0}
+        """
+        with open(path) as file:
+            data = json.load(file)
+        districts = data["districts"]
+        return cls.from_graph(
+            [district["population"] for district in districts],
+            data["roads"],
+            within_minutes=[district.get("within_minutes", 1) for district in districts],
+            hq=data.get("hq", 0),
+            names=[district.get("name", str(i + 1)) for i, district in enumerate(districts)],
+            directed=data.get("directed", False),
+            cache_dir=cache_dir,
+        )
+
+
+def graph_hash(num_districts, roads, directed):
+    description = json.dumps({
+        "districts": num_districts,
+        "roads": sorted([int(a), int(b), float(minutes)] for a, b, minutes in roads),
+        "directed": bool(directed),
+    })
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def shortest_path_matrix(num_districts, roads, directed=False, cache_dir=DISTRICT_CACHE):
+    """
+    All-pairs shortest path lengths of a road graph, read from the cache if it was computed before.
+    Dijkstra from every district, so the cost grows with the number of roads rather than with num_districts**3.
+    """
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, graph_hash(num_districts, roads, directed) + ".npy")
+        if os.path.exists(path):
+            return np.load(path)
+
+    try:
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import shortest_path
+    except ImportError:
+        distances = dijkstra_all_pairs(num_districts, roads, directed)
+    else:
+        # Parallel roads are kept at their shortest, the sparse matrix would add them up
+        shortest = {}
+        for a, b, minutes in roads:
+            shortest[a, b] = min(shortest.get((a, b), math.inf), minutes)
+        rows, columns, minutes = zip(*((a, b, m) for (a, b), m in shortest.items())) if shortest else ((), (), ())
+        graph = csr_matrix((minutes, (rows, columns)), shape=(num_districts, num_districts))
+        distances = shortest_path(graph, method="D", directed=directed)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = path + f".{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.save(file, distances)
+        os.replace(temporary, path)
+    return distances
+
+
+def dijkstra_all_pairs(num_districts, roads, directed=False):
+    """Shortest path lengths from every district with a binary heap, used when scipy is not installed."""
+    neighbours = [{} for _ in range(num_districts)]
+    for a, b, minutes in roads:
+        a, b, minutes = int(a), int(b), float(minutes)
+        neighbours[a][b] = min(neighbours[a].get(b, math.inf), minutes)
+        if not directed:
+            neighbours[b][a] = min(neighbours[b].get(a, math.inf), minutes)
+    adjacency = [list(edges.items()) for edges in neighbours]
+
+    distances = np.full((num_districts, num_districts), np.inf)
+    for source in range(num_districts):
+        row = [math.inf] * num_districts
+        row[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            distance, district = heapq.heappop(heap)
+            if distance > row[district]:
+                continue
+            for neighbour, minutes in adjacency[district]:
+                candidate = distance + minutes
+                if candidate < row[neighbour]:
+                    row[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+        distances[source] = row
+    return distances
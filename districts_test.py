@@ -0,0 +1,150 @@
+import json
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from main import EmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator
+from batch_engine import BatchEmergencySimulator
+from districts import DistrictModel, dijkstra_all_pairs, shortest_path_matrix
+
+
+def ring_city(num_districts, seed=0):
+    """Districts on a ring road with a few random shortcuts."""
+    rng = np.random.default_rng(seed)
+    roads = [(i, (i + 1) % num_districts, float(rng.integers(2, 8))) for i in range(num_districts)]
+    roads += [(int(a), int(b), float(rng.integers(5, 20))) for a, b in rng.integers(0, num_districts, (num_districts, 2))]
+    populations = rng.integers(1000, 50000, num_districts)
+    return populations, roads
+
+
+class DistrictModelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_shortest_paths(self):
+        roads = [(0, 1, 4), (1, 2, 3), (0, 2, 10), (2, 3, 1)]
+        distances = shortest_path_matrix(4, roads, cache_dir=None)
+        np.testing.assert_array_equal(distances[0], [0, 4, 7, 8])
+        np.testing.assert_array_equal(distances, distances.T)
+        directed = shortest_path_matrix(4, roads, directed=True, cache_dir=None)
+        self.assertEqual(directed[3, 0], np.inf)
+
+    def test_dijkstra_matches_floyd_warshall(self):
+        rng = np.random.default_rng(4)
+        num_districts = 60
+        roads = [(int(a), int(b), float(minutes)) for a, b, minutes in
+                 zip(rng.integers(0, num_districts, 200), rng.integers(0, num_districts, 200), rng.uniform(1, 9, 200))]
+        roads += [(a, b, minutes + 1) for a, b, minutes in roads[:20]]  # Parallel, longer roads
+        for directed in [False, True]:
+            expected = np.full((num_districts, num_districts), np.inf)
+            np.fill_diagonal(expected, 0)
+            for a, b, minutes in roads:
+                expected[a, b] = min(expected[a, b], minutes)
+                if not directed:
+                    expected[b, a] = min(expected[b, a], minutes)
+            for k in range(num_districts):
+                np.minimum(expected, expected[:, k, None] + expected[None, k, :], out=expected)
+            np.testing.assert_allclose(dijkstra_all_pairs(num_districts, roads, directed), expected)
+            np.testing.assert_allclose(shortest_path_matrix(num_districts, roads, directed, cache_dir=None), expected)
+
+    def test_matrix_is_cached_by_graph(self):
+        populations, roads = ring_city(50)
+        first = DistrictModel.from_graph(populations, roads, cache_dir=self.directory.name)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        second = DistrictModel.from_graph(populations, list(reversed(roads)), cache_dir=self.directory.name)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1, "Same graph was cached twice.")
+        np.testing.assert_array_equal(first.travel_minutes, second.travel_minutes)
+        DistrictModel.from_graph(populations, roads[:-1], cache_dir=self.directory.name)
+        self.assertEqual(len(os.listdir(self.directory.name)), 2, "A different graph hit the cache.")
+
+    def test_load_from_file(self):
+        path = os.path.join(self.directory.name, "city.json")
+        with open(path, "w") as file:
+            json.dump({"districts": [{"name": "North", "population": 100, "within_minutes": 2},
+                                     {"name": "Centre", "population": 300, "within_minutes": 3},
+                                     {"name": "South", "population": 200}],
+                       "roads": [[0, 1, 5], [1, 2, 7]], "hq": 1}, file)
+        districts = DistrictModel.load(path, cache_dir=None)
+        self.assertEqual(districts.names, ["North", "Centre", "South"])
+        self.assertEqual(districts.hq, 1)
+        np.testing.assert_array_equal(districts.travel_minutes, [[2, 5, 12], [5, 3, 7], [12, 7, 1]])
+
+    def test_unreachable_districts(self):
+        with self.assertRaises(ValueError):
+            DistrictModel.from_graph([1, 1, 1], [(0, 1, 3)], cache_dir=None)
+
+    def test_zero_travel_time(self):
+        with self.assertRaises(ValueError):
+            DistrictModel([1, 1], [[0, 3], [3, 2]])
+
+    def test_default_model_matches_built_in_city(self):
+        simulator = EmergencySimulator(seed=0)
+        np.testing.assert_array_equal(simulator.districts.travel_minutes, EmergencySimulator.avg_travel_times)
+        self.assertEqual(simulator.current_dist, 1)
+
+    def test_reroute_to_district_0(self):
+        districts = DistrictModel([1, 1, 1], [[1, 10, 30], [10, 1, 5], [30, 5, 1]], hq=0)
+        simulator = EmergencySimulator(seed=0, districts=districts)
+        with mock.patch.object(simulator.variates, "randint", side_effect=lambda name, low, high: (low, high)):
+            # Halfway from district 1 to 2, 10 minutes from district 1 and 30 from district 2 to district 0
+            self.assertEqual(simulator.get_travel_time(1, 2, 0, 0.5), (1080, 1320))
+
+    def test_pickle_keeps_only_the_model(self):
+        populations, roads = ring_city(300)
+        districts = DistrictModel.from_graph(populations, roads, hq=3, cache_dir=self.directory.name)
+        pickled = pickle.dumps(districts)
+        self.assertLess(len(pickled), 1.1 * districts.travel_minutes.nbytes)
+        unpickled = pickle.loads(pickled)
+        self.assertEqual(repr(unpickled), repr(districts))
+        np.testing.assert_array_equal(unpickled.travel_seconds, districts.travel_seconds)
+
+    def test_snapshot_refers_to_the_districts(self):
+        populations, roads = ring_city(300)
+        districts = DistrictModel.from_graph(populations, roads, hq=3, cache_dir=self.directory.name)
+        uninterrupted = EmergencySimulator(seed=2, districts=districts).simulate(100)
+        simulator = EmergencySimulator(seed=2, districts=districts)
+        simulator.simulate(40)
+        snapshot = simulator.snapshot()
+        self.assertLess(len(snapshot), districts.travel_minutes.nbytes / 10, "The district model was embedded.")
+        with self.assertRaises(ValueError):
+            EmergencySimulator.restore(snapshot)
+        restored = EmergencySimulator.restore(snapshot, districts=districts)
+        self.assertEqual(restored.simulate(100)["doc_util"], uninterrupted["doc_util"])
+        self.assertIs(simulator.fork([{}])[0].districts, districts)
+
+    def test_simulators_with_many_districts(self):
+        populations, roads = ring_city(1000)
+        districts = DistrictModel.from_graph(populations, roads, hq=3, cache_dir=self.directory.name)
+        result = EmergencySimulator(seed=1, districts=districts).simulate(200)
+        self.assertGreater(result["doc_util"], 0)
+        extended = ExtendedEmergencySimulator(num_hqs=3, num_vehicles=4, strategy="nearest", seed=1,
+                                              districts=districts)
+        self.assertGreater(extended.simulate(20)["avg_travel_time"], 0)
+        seeds = [5, 6]
+        batch = BatchEmergencySimulator(seeds, districts=districts).simulate(100)
+        for seed, batch_result in zip(seeds, batch):
+            self.assertEqual(batch_result["doc_util"],
+                             EmergencySimulator(seed=seed, districts=districts).simulate(100)["doc_util"])
+
+    def test_travel_times_are_computed_once(self):
+        populations, roads = ring_city(300)
+        dijkstra = mock.Mock(side_effect=dijkstra_all_pairs)
+        # Without scipy the matrix comes from dijkstra_all_pairs
+        with mock.patch.dict(sys.modules, {"scipy.sparse": None, "scipy.sparse.csgraph": None}), \
+                mock.patch("districts.dijkstra_all_pairs", dijkstra):
+            districts = DistrictModel.from_graph(populations, roads, cache_dir=self.directory.name)
+            DistrictModel.from_graph(populations, roads, cache_dir=self.directory.name)
+            EmergencySimulator(seed=0, districts=districts).simulate(200)
+        self.assertEqual(dijkstra.call_count, 1, "Travel times were computed again instead of read.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+
+class IndexedEmergencyQueue:
+    """
+    The waiting emergencies of all vehicles in global arrival order.
+
+    Every pushed emergency gets a handle, increasing with the arrival order. Besides the global order the
+    emergencies are kept in one bucket per (district, prio), also in arrival order, so the oldest emergency
+    of a priority or of every bucket is found by looking at the bucket heads only. Removing an emergency
+    by its handle is O(1). The number of emergencies assigned to each vehicle queue is counted as well.
+    """
+
+    def __init__(self, num_queues=1):
+        self.entries = OrderedDict()  # handle -> (emergency, queue_index)
+        self.buckets = {}  # (district, prio) -> OrderedDict of handle -> emergency
+        self.queue_counts = [0] * num_queues
+        self.next_handle = 0
+
+    def push(self, emergency, queue_index=0):
+        """Adds an emergency to the end of the queue of vehicle `queue_index` and returns its handle."""
+        handle = self.next_handle
+        self.next_handle += 1
+        self.entries[handle] = (emergency, queue_index)
+        key = (emergency.district, emergency.prio)
+        if key not in self.buckets:
+            self.buckets[key] = OrderedDict()
+        self.buckets[key][handle] = emergency
+        self.queue_counts[queue_index] += 1
+        return handle
+
+    def remove(self, handle):
+        """Removes the emergency with the given handle and returns it."""
+        emergency, queue_index = self.entries.pop(handle)
+        key = (emergency.district, emergency.prio)
+        bucket = self.buckets[key]
+        del bucket[handle]
+        if not bucket:
+            del self.buckets[key]
+        self.queue_counts[queue_index] -= 1
+        return emergency
+
+    def oldest(self, prio=None):
+        """Handle of the oldest emergency, of the given priority if one is given. None if there is none."""
+        if prio is None:
+            return next(iter(self.entries), None)
+        return min((next(iter(bucket)) for (_, bucket_prio), bucket in self.buckets.items() if bucket_prio == prio),
+                   default=None)
+
+    def bucket_heads(self):
+        """Handle of the oldest emergency of every (district, prio) with waiting emergencies, in arrival order."""
+        return sorted(next(iter(bucket)) for bucket in self.buckets.values())
+
+    def __getitem__(self, handle):
+        return self.entries[handle][0]
+
+    def __iter__(self):
+        return (emergency for emergency, _ in self.entries.values())
+
+    def __len__(self):
+        return len(self.entries)
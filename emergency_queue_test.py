@@ -0,0 +1,76 @@
+import unittest
+from main import Emergency
+from emergency_queue import IndexedEmergencyQueue
+from task4_and_5 import ExtendedEmergencySimulator
+
+
+class IndexedEmergencyQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = IndexedEmergencyQueue(num_queues=3)
+        self.emergencies = [Emergency(district=d, start_time=t, prio=p)
+                            for t, (d, p) in enumerate([(4, 0), (2, 1), (4, 1), (2, 0), (7, 0)])]
+        self.handles = [self.queue.push(em, t % 3) for t, em in enumerate(self.emergencies)]
+
+    def test_global_fifo_order(self):
+        order = []
+        while self.queue:
+            order.append(self.queue.remove(self.queue.oldest()))
+        self.assertEqual(order, self.emergencies, "Emergencies did not leave in arrival order.")
+
+    def test_oldest_of_priority(self):
+        self.assertIs(self.queue[self.queue.oldest(prio=1)], self.emergencies[1])
+        self.queue.remove(self.handles[1])
+        self.assertIs(self.queue[self.queue.oldest(prio=1)], self.emergencies[2])
+        self.queue.remove(self.handles[2])
+        self.assertIsNone(self.queue.oldest(prio=1), "No life-threatening emergency should be left.")
+
+    def test_bucket_heads(self):
+        self.assertEqual(self.queue.bucket_heads(), self.handles)
+        self.queue.remove(self.handles[0])
+        self.queue.push(Emergency(district=7, start_time=5, prio=0))
+        self.assertEqual(self.queue.bucket_heads(), self.handles[1:])
+
+    def test_remove_by_handle_and_counts(self):
+        self.assertEqual(self.queue.queue_counts, [2, 2, 1])
+        self.assertIs(self.queue.remove(self.handles[3]), self.emergencies[3])
+        self.assertEqual(self.queue.queue_counts, [1, 2, 1])
+        self.assertEqual(list(self.queue), [em for i, em in enumerate(self.emergencies) if i != 3])
+        with self.assertRaises(KeyError):
+            self.queue.remove(self.handles[3])
+
+
+class DispatchStrategyTests(unittest.TestCase):
+
+    def dispatch_order(self, strategy, emergencies):
+        simulator = ExtendedEmergencySimulator(num_vehicles=1, strategy=strategy, seed=0)
+        for em in emergencies:
+            simulator.emergency_queue.push(em)
+        order = []
+        while simulator.emergency_queue:
+            before = list(simulator.emergency_queue)
+            simulator.assign_doctor(0)
+            order.extend(em for em in before if em not in list(simulator.emergency_queue))
+            # Let the vehicle finish its job before the next dispatch
+            simulator.total_time_passed = int(simulator.free_at[0])
+            simulator.complete_jobs()
+        return order
+
+    def test_high_priority_first(self):
+        emergencies = [Emergency(district=1, start_time=0, prio=0), Emergency(district=3, start_time=1, prio=1),
+                       Emergency(district=5, start_time=2, prio=0), Emergency(district=2, start_time=3, prio=1)]
+        order = self.dispatch_order("high_priority_first", emergencies)
+        self.assertEqual(order, [emergencies[1], emergencies[3], emergencies[0], emergencies[2]])
+
+    def test_fifo_is_global(self):
+        simulator = ExtendedEmergencySimulator(num_vehicles=2, strategy="fifo", seed=0)
+        first = Emergency(district=1, start_time=0, prio=0)
+        second = Emergency(district=2, start_time=1, prio=0)
+        simulator.emergency_queue.push(first, 1)
+        simulator.emergency_queue.push(second, 0)
+        simulator.assign_doctor(0)
+        self.assertEqual(list(simulator.emergency_queue), [second], "The oldest emergency was not served first.")
+
+
+if __name__ == "__main__":
+    unittest.main()
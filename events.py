@@ -0,0 +1,73 @@
+"""
+Event records of simulate_iter and lazy stages to consume them.
+
+Stages are plain generator functions over an iterable of events, so they chain without buffering:
+
+    events = simulator.simulate_iter(1000)
+    life_threatening = where(events, kinds=[ON_SCENE], prio=1)
+    for prio, wait in waits(life_threatening):
+        ...
+
+Closing the simulate_iter generator, or breaking out of a loop over the last stage, stops the simulation.
+"""
+import enum
+from collections import Counter
+from typing import NamedTuple
+
+
+class EventKind(enum.IntEnum):
+    ARRIVAL = 0  # A new emergency
+    DISPATCH = 1  # A doctor heads for an emergency
+    ON_SCENE = 2  # A doctor reached an emergency and starts the care
+    CARE_DONE = 3  # A doctor finished the care of an emergency
+    RETURN_TO_HQ = 4  # A doctor heads back to an HQ
+    PREEMPTION = 5  # A doctor on the way to an emergency was sent to a life-threatening one instead
+
+
+ARRIVAL, DISPATCH, ON_SCENE, CARE_DONE, RETURN_TO_HQ, PREEMPTION = EventKind
+
+
+class Event(NamedTuple):
+    """
+    One thing that happened in a simulation, at second `time`. The district, prio and start_time are those
+    of the emergency the event is about (start_time is when it arrived), for RETURN_TO_HQ the district is the HQ
+    and prio and start_time are None. vehicle is the doctor, always 0 in the single doctor model.
+    """
+    kind: EventKind
+    time: int
+    district: int
+    prio: int = None
+    start_time: int = None
+    vehicle: int = 0
+
+
+def where(events, kinds=None, district=None, prio=None, vehicle=None):
+    """The events of the given kinds, district, priority and vehicle, None matches all."""
+    kinds = None if kinds is None else frozenset(kinds)
+    for event in events:
+        if ((kinds is None or event.kind in kinds) and (district is None or event.district == district)
+                and (prio is None or event.prio == prio) and (vehicle is None or event.vehicle == vehicle)):
+            yield event
+
+
+def until(events, time):
+    """The events before second `time`. Stops pulling events, and so the simulation, at the first later one."""
+    for event in events:
+        if event.time >= time:
+            return
+        yield event
+
+
+def waits(events, kind=ON_SCENE):
+    """
+    (prio, seconds waited) of every event of `kind`, by default when the care starts as EmergencySimulator
+    counts it. ExtendedEmergencySimulator counts waits until the DISPATCH.
+    """
+    for event in events:
+        if event.kind == kind:
+            yield event.prio, event.time - event.start_time
+
+
+def count_kinds(events):
+    """Number of events of every kind, consumes the events."""
+    return Counter(event.kind for event in events)
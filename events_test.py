@@ -0,0 +1,124 @@
+import itertools
+import unittest
+import numpy as np
+from main import EmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator
+from events import (Event, ARRIVAL, DISPATCH, ON_SCENE, CARE_DONE, RETURN_TO_HQ, PREEMPTION, where, until, waits,
+                    count_kinds)
+
+
+def run_to_end(events):
+    """All events of a simulate_iter generator and the metrics it returns."""
+    collected = []
+    while True:
+        try:
+            collected.append(next(events))
+        except StopIteration as stop:
+            return collected, stop.value
+
+
+class SimulateIterTests(unittest.TestCase):
+
+    def test_same_metrics_as_simulate(self):
+        expected = EmergencySimulator(seed=5).simulate(500)
+        events, result = run_to_end(EmergencySimulator(seed=5).simulate_iter(500))
+        for name in ["doc_util", "doc_center", "avg_non_live_threatening_waiting_time_min", "avg_queue_length"]:
+            self.assertEqual(result[name], expected[name])
+        self.assertTrue(events)
+
+    def test_events_in_time_order(self):
+        times = [event.time for event in EmergencySimulator(seed=2).simulate_iter(300)]
+        self.assertEqual(times, sorted(times))
+
+    def test_every_kind_happens(self):
+        counts = count_kinds(EmergencySimulator(seed=5).simulate_iter(2000))
+        self.assertEqual(set(counts), {ARRIVAL, DISPATCH, ON_SCENE, CARE_DONE, RETURN_TO_HQ, PREEMPTION})
+        # Every emergency is dispatched, and dispatched again after a preemption
+        self.assertLessEqual(counts[DISPATCH] - counts[PREEMPTION], counts[ARRIVAL])
+        self.assertLessEqual(counts[CARE_DONE], counts[ON_SCENE])
+
+    def test_waits_match_the_statistics(self):
+        simulator = EmergencySimulator(seed=3)
+        life_threatening = [wait for prio, wait in waits(simulator.simulate_iter(500)) if prio == 1]
+        stats = simulator.waiting_times_life_threatening.stats
+        self.assertEqual(len(life_threatening), stats.count)
+        self.assertAlmostEqual(sum(life_threatening) / len(life_threatening), stats.mean)
+
+    def test_closing_stops_the_run(self):
+        simulator = EmergencySimulator(seed=4)
+        events = simulator.simulate_iter(1000)
+        first = list(itertools.islice(events, 10))
+        events.close()
+        self.assertEqual(len(first), 10)
+        self.assertLess(simulator.total_time_passed, 24 * 3600)
+        self.assertIsNone(simulator.event_sink)
+
+    def test_until_stops_pulling(self):
+        simulator = EmergencySimulator(seed=4)
+        events = list(until(simulator.simulate_iter(1000), 3600))
+        self.assertTrue(all(event.time < 3600 for event in events))
+        self.assertLess(simulator.total_time_passed, 10 * 3600)
+
+    def test_chained_stages(self):
+        stages = where(EmergencySimulator(seed=6).simulate_iter(300), kinds=[ARRIVAL, ON_SCENE], prio=1, district=3)
+        events = list(stages)
+        self.assertTrue(events)
+        for event in events:
+            self.assertIsInstance(event, Event)
+            self.assertIn(event.kind, (ARRIVAL, ON_SCENE))
+            self.assertEqual((event.prio, event.district), (1, 3))
+
+    def test_trace_and_profile(self):
+        expected = EmergencySimulator(seed=7, trace="events", profile=True).simulate(200)
+        _, result = run_to_end(EmergencySimulator(seed=7, trace="events", profile=True).simulate_iter(200))
+        self.assertEqual(result["profile"]["events"], expected["profile"]["events"])
+        self.assertEqual(result["profile"]["draws"], expected["profile"]["draws"])
+        self.assertEqual(set(result["trace"]), set(expected["trace"]))
+        for name, column in expected["trace"].items():
+            np.testing.assert_array_equal(result["trace"][name], column)
+
+    def test_simulate_does_not_record(self):
+        simulator = EmergencySimulator(seed=1)
+        simulator.simulate(10)
+        self.assertIsNone(simulator.event_sink)
+
+
+class ExtendedSimulateIterTests(unittest.TestCase):
+
+    def test_same_metrics_as_simulate(self):
+        expected = ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, seed=8).simulate(200)
+        _, result = run_to_end(ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, seed=8).simulate_iter(200))
+        self.assertEqual(result["avg_travel_time"], expected["avg_travel_time"])
+        self.assertEqual(result["avg_queue_length"], expected["avg_queue_length"])
+
+    def test_engines_yield_the_same_events(self):
+        def events(engine):
+            simulator = ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, strategy="nearest", seed=9)
+            return list(simulator.simulate_iter(50, engine=engine))
+
+        self.assertEqual(events("event"), events("tick"))
+
+    def test_vehicles_and_kinds(self):
+        events = list(ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, seed=8).simulate_iter(200))
+        counts = count_kinds(events)
+        self.assertEqual(set(counts), {ARRIVAL, DISPATCH, CARE_DONE, RETURN_TO_HQ})
+        self.assertEqual({event.vehicle for event in where(events, kinds=[DISPATCH])}, {0, 1, 2})
+        self.assertEqual({event.district for event in where(events, kinds=[RETURN_TO_HQ])}, {0, 1})
+
+    def test_profile(self):
+        def profile(run):
+            return run(ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, seed=8, profile=True))["profile"]
+
+        expected = profile(lambda simulator: simulator.simulate(100))
+        result = profile(lambda simulator: run_to_end(simulator.simulate_iter(100))[1])
+        self.assertEqual(result["events"], expected["events"])
+        self.assertEqual(result["draws"], expected["draws"])
+        self.assertEqual(result["queue_high_water"], expected["queue_high_water"])
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            next(ExtendedEmergencySimulator(seed=1).simulate_iter(1, engine="other"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+from unittest import mock
+from main import Emergency
+from task4_and_5 import ExtendedEmergencySimulator
+from emergency_queue import IndexedEmergencyQueue
+
+
+def doctor_state(simulator):
+    return [(doctor["current_location"], doctor["busy"], doctor["time_remaining"])
+            for doctor in simulator.doctor_status]
+
+
+class EventEngineTests(unittest.TestCase):
+
+    def run_both_engines(self, hours, prefill=0, **kwargs):
+        simulators = []
+        results = []
+        for engine in ["tick", "event"]:
+            simulator = ExtendedEmergencySimulator(**kwargs)
+            for i in range(prefill):
+                simulator.emergency_queue.push(Emergency(district=i % 10, start_time=0, prio=i % 2),
+                                               i % simulator.num_vehicles)
+            results.append(simulator.simulate(hours, engine=engine))
+            simulators.append(simulator)
+        return simulators, results
+
+    def test_same_results_as_tick_engine(self):
+        for strategy in ["fifo", "nearest", "high_priority_first"]:
+            for num_hqs, num_vehicles in [(1, 1), (2, 2), (3, 6)]:
+                (tick, event), (tick_result, event_result) = self.run_both_engines(
+                    10, num_hqs=num_hqs, num_vehicles=num_vehicles, strategy=strategy, seed=42
+                )
+                self.assertEqual(tick_result, event_result,
+                                 f"Engines disagree for {strategy} with {num_hqs} HQs and {num_vehicles} vehicles.")
+                self.assertEqual(doctor_state(tick), doctor_state(event), "Doctor states differ between engines.")
+
+    def test_same_state_with_prefilled_queues_and_partial_hours(self):
+        (tick, event), (tick_result, event_result) = self.run_both_engines(
+            1.2345, prefill=7, num_hqs=2, num_vehicles=3, strategy="nearest", seed=3
+        )
+        self.assertEqual(tick_result, event_result, "Engines disagree with prefilled queues.")
+        self.assertEqual(tick.total_time_passed, event.total_time_passed, "Engines stopped at different times.")
+        self.assertEqual(tick.time_to_next_emergency, event.time_to_next_emergency,
+                         "Engines disagree on the next arrival.")
+        self.assertEqual(doctor_state(tick), doctor_state(event), "Doctor states differ between engines.")
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            ExtendedEmergencySimulator(strategy="random")
+
+    def test_unknown_engine(self):
+        simulator = ExtendedEmergencySimulator(seed=1)
+        with self.assertRaises(ValueError):
+            simulator.simulate(1, engine="warp")
+
+
+class NearestStrategyTests(unittest.TestCase):
+
+    def dispatch(self, emergencies, location=0, **kwargs):
+        """The emergency the nearest strategy dispatches a doctor at `location` to, at second 1000."""
+        simulator = ExtendedEmergencySimulator(strategy="nearest", seed=1, **kwargs)
+        simulator.total_time_passed = 1000
+        for emergency in emergencies:
+            simulator.emergency_queue.push(emergency)
+        simulator.location[0] = location
+        simulator.assign_doctor(0)
+        return simulator.doctor_status[0]["current_location"]
+
+    def test_picks_nearest_district(self):
+        emergencies = [Emergency(district=9, start_time=0, prio=1), Emergency(district=5, start_time=900, prio=0)]
+        # Expected travel times from district 0 are 12 minutes to district 9 and 4 minutes to district 5
+        self.assertEqual(self.dispatch(emergencies), 5)
+
+    def test_priority_and_waiting_weights(self):
+        emergencies = [Emergency(district=9, start_time=0, prio=1), Emergency(district=5, start_time=900, prio=0)]
+        self.assertEqual(self.dispatch(emergencies, priority_weight=7 * 60), 5)
+        self.assertEqual(self.dispatch(emergencies, priority_weight=9 * 60), 9)
+        # District 9 waited 900 seconds longer, worth 9 minutes of travel at a weight of 0.6
+        self.assertEqual(self.dispatch(emergencies, waiting_weight=0.6), 9)
+
+    def test_draws_one_travel_time_per_dispatch(self):
+        simulator = ExtendedEmergencySimulator(strategy="nearest", seed=1)
+        for i in range(500):
+            simulator.emergency_queue.push(Emergency(district=i % 10, start_time=i, prio=i % 2))
+        before = simulator.variates.positions["travel"]
+        simulator.assign_doctor(0)
+        self.assertEqual(simulator.variates.positions["travel"] - before, 1)
+
+    def test_same_arrivals_for_every_strategy(self):
+        arrivals = []
+        for strategy in ["fifo", "nearest", "high_priority_first"]:
+            simulator = ExtendedEmergencySimulator(num_vehicles=2, strategy=strategy, seed=5)
+            simulator.simulate(20)
+            arrivals.append(simulator.variates.positions["arrival"])
+        self.assertEqual(len(set(arrivals)), 1, "The strategy changed the arrivals.")
+
+    def test_engines_agree_with_weights(self):
+        results = [ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, strategy="nearest", seed=8,
+                                              priority_weight=300, waiting_weight=0.2).simulate(10, engine=engine)
+                   for engine in ["tick", "event"]]
+        self.assertEqual(results[0], results[1])
+
+    def test_dispatch_cost_does_not_grow_with_queue(self):
+        def emergencies_scored(queued):
+            simulator = ExtendedEmergencySimulator(strategy="nearest", seed=1, waiting_weight=0.1)
+            for i in range(queued):
+                simulator.emergency_queue.push(Emergency(district=i % 10, start_time=i, prio=(i // 10) % 2))
+            with mock.patch.object(IndexedEmergencyQueue, "__getitem__", autospec=True,
+                                   side_effect=IndexedEmergencyQueue.__getitem__) as lookups:
+                simulator.nearest(0)
+            return lookups.call_count
+
+        # One emergency per (district, prio), however many wait
+        self.assertEqual(emergencies_scored(20), 20)
+        self.assertEqual(emergencies_scored(20000), 20)
+
+
+class FleetStateTests(unittest.TestCase):
+
+    def test_idle_vehicles_and_completions_match_busy_flags(self):
+        simulator = ExtendedEmergencySimulator(num_hqs=3, num_vehicles=8, strategy="high_priority_first", seed=6)
+        simulator.variates.mean_interarrival = 5 * 60
+        for hours in range(1, 6):
+            simulator.simulate(hours)
+            busy = set(map(int, simulator.busy.nonzero()[0]))
+            self.assertEqual(set(simulator.idle), set(range(8)) - busy)
+            self.assertEqual(len(simulator.idle), 8 - len(busy))
+            self.assertTrue(all(simulator.idle_position[vehicle] == i for i, vehicle in enumerate(simulator.idle)))
+            self.assertEqual(sorted(vehicle for _, vehicle in simulator.completions), sorted(busy))
+            self.assertTrue(all(free_at == simulator.free_at[vehicle] for free_at, vehicle in simulator.completions))
+            self.assertTrue(all(simulator.job[vehicle] >= 0 for vehicle in busy))
+            self.assertFalse(simulator.emergency_queue and simulator.idle, "An emergency waits next to an idle vehicle.")
+
+    def test_work_per_tick_does_not_grow_with_fleet(self):
+        # Wall-clock scaling is measured by the vehicles=200 cases of benchmark.py
+        for num_vehicles in [6, 200]:
+            simulator = ExtendedEmergencySimulator(num_hqs=3, num_vehicles=num_vehicles, seed=1, profile=True)
+            profile = simulator.simulate(50, engine="tick")["profile"]
+            calls, arrivals = profile["phase_calls"], profile["draws"]["arrival"]
+            self.assertEqual(calls["complete_jobs"], 50 * 3600)
+            # Per emergency one dispatch with one pick of a vehicle, one travel time and at most one return to an HQ
+            self.assertLessEqual(calls["assign_doctor"], arrivals)
+            self.assertEqual(profile["draws"]["vehicle"], calls["assign_doctor"])
+            self.assertLessEqual(calls["get_travel_time"], calls["assign_doctor"] * (1 + simulator.num_hqs))
+            self.assertEqual(len(simulator.idle) + len(simulator.completions), num_vehicles)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import itertools
+import math
+
+import numpy as np
+
+from main import EmergencySimulator
+from replications import run_until_precise
+from task4_and_5 import ExtendedEmergencySimulator
+
+# Up to this many HQ sets are scored exhaustively, beyond it a local search is used
+MAX_ENUMERATED = 50_000
+
+# HQ sets scored per NumPy operation, bounds the memory of the (sets, HQs, districts) array
+SCORING_CHUNK = 2048
+
+
+def p_median_costs(districts, candidates):
+    """
+    Population-weighted mean of the expected travel time in minutes from the nearest HQ to
+    every district, for each row of HQ districts in `candidates`.
+    """
+    candidates = np.asarray(candidates, dtype=np.int64).reshape(len(candidates), -1)
+    weights = districts.populations / districts.populations.sum()
+    costs = np.empty(len(candidates))
+    for first in range(0, len(candidates), SCORING_CHUNK):
+        chunk = candidates[first:first + SCORING_CHUNK]
+        costs[first:first + SCORING_CHUNK] = districts.travel_minutes[chunk].min(axis=1) @ weights
+    return costs
+
+
+def screen(districts, num_hqs, shortlist=5, max_enumerated=MAX_ENUMERATED):
+    """
+    The `shortlist` HQ sets of `num_hqs` districts with the lowest p-median cost, as a list of
+    (hqs, cost) sorted by cost. Small cities are scored exhaustively, larger ones with a greedy
+    start improved by swapping single HQs (Teitz-Bart) until no swap lowers the cost, keeping the
+    best sets seen on the way.
+    """
+    num_districts = len(districts)
+    if not 0 < num_hqs <= num_districts:
+        raise ValueError(f"Cannot place {num_hqs} HQs in {num_districts} districts")
+    if math.comb(num_districts, num_hqs) <= max_enumerated:
+        candidates = np.array(list(itertools.combinations(range(num_districts), num_hqs)))
+        costs = p_median_costs(districts, candidates)
+        best = np.argsort(costs, kind="stable")[:shortlist]
+        return [(candidates[i].tolist(), float(costs[i])) for i in best]
+
+    seen = {}
+
+    def score(sets):
+        sets = np.sort(sets, axis=1)
+        costs = p_median_costs(districts, sets)
+        for hqs, cost in zip(map(tuple, sets.tolist()), costs.tolist()):
+            seen[hqs] = cost
+        return sets, costs
+
+    # Greedy start: add the HQ that lowers the cost most, one at a time
+    hqs = []
+    for _ in range(num_hqs):
+        others = np.setdiff1d(np.arange(num_districts), hqs)
+        sets, costs = score(np.column_stack([np.tile(hqs, (len(others), 1)), others]).astype(np.int64))
+        hqs = sets[np.argmin(costs)].tolist()
+    cost = seen[tuple(hqs)]
+
+    # Every single swap of an HQ for another district is scored in one go, the best one is taken
+    while True:
+        others = np.setdiff1d(np.arange(num_districts), hqs)
+        # Row i * len(others) + j replaces HQ i by others[j]
+        swaps = np.tile(np.array(hqs), (num_hqs * len(others), 1))
+        swaps[np.arange(len(swaps)), np.repeat(np.arange(num_hqs), len(others))] = np.tile(others, num_hqs)
+        sets, costs = score(swaps)
+        if costs.min() >= cost:
+            break
+        hqs, cost = sets[np.argmin(costs)].tolist(), float(costs.min())
+
+    best = sorted(seen.items(), key=lambda item: item[1])[:shortlist]
+    return [(list(hqs), cost) for hqs, cost in best]
+
+
+def optimize_hqs(num_hqs, num_vehicles, strategy="fifo", districts=None, shortlist=5, hours=10,
+                 metric="avg_travel_time", half_width=5 / 60, confidence=0.95, master_seed=0,
+                 min_replications=10, max_replications=200, workers=None, cache=None):
+    """
+    Searches the HQ placements of a fleet: the p-median screening picks a shortlist, which is
+    then confirmed by simulating every placement until the confidence interval of `metric` is
+    narrow enough. All placements use the same seeds, so they are compared on the same emergencies.
+
+    :param num_hqs: Number of HQs to place.
+    :param num_vehicles: Number of vehicles of the fleet.
+    :param strategy: Dispatch strategy of ExtendedEmergencySimulator.
+    :param districts: DistrictModel of the city, by default the one of EmergencySimulator.
+    :param shortlist: Number of placements that are simulated.
+    :param hours: Simulated hours per replication.
+    :param metric: Result the placements are ranked by, lower is better.
+    :param half_width: Largest acceptable half-width of the confidence interval of the metric.
+    :param confidence: Confidence level of the intervals.
+    :param master_seed: Seed from which the seeds of all replications are derived.
+    :param min_replications: Replications run before the first check.
+    :param max_replications: Cap on the replications per placement.
+    :param workers: Number of worker processes, defaults to the number of cores. 1 runs in-process.
+    :param cache: Optional ResultCache, cached replications are not run again and new ones are stored.
+    :return: One dict per placement, best first, with the "hqs", their "p_median" cost in minutes,
+             the "mean" and "half_width" of the metric, the number of "replications" and "converged".
+    """
+    simulator_kwargs = {"num_vehicles": num_vehicles, "strategy": strategy}
+    if districts is None:
+        districts = EmergencySimulator(seed=0).districts
+    else:
+        simulator_kwargs["districts"] = districts
+
+    placements = []
+    for hqs, cost in screen(districts, num_hqs, shortlist):
+        run = run_until_precise(ExtendedEmergencySimulator, hours=hours, absolute={metric: half_width},
+                                confidence=confidence, master_seed=master_seed, min_replications=min_replications,
+                                max_replications=max_replications, workers=workers, cache=cache, hqs=hqs,
+                                **simulator_kwargs)
+        placements.append({
+            "hqs": hqs,
+            "p_median": cost,
+            "mean": run["mean"][metric],
+            "half_width": run["half_width"][metric],
+            "replications": run["replications"],
+            "converged": run["converged"],
+        })
+    return sorted(placements, key=lambda placement: placement["mean"])
+
+
+if __name__ == "__main__":
+    for num_hqs in [1, 2, 3, 5]:
+        print(f"Best placements of {num_hqs} headquarters for 6 vehicles:")
+        for placement in optimize_hqs(num_hqs, num_vehicles=6, strategy="nearest")[:3]:
+            districts = ", ".join(str(hq + 1) for hq in placement["hqs"])
+            print(f"  districts {districts}: {placement['mean']:.2f} ± {placement['half_width']:.2f} minutes "
+                  f"travel time (p-median {placement['p_median']:.2f}, {placement['replications']} simulations)")
@@ -0,0 +1,78 @@
+import itertools
+import unittest
+import numpy as np
+from main import EmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator
+from districts import DistrictModel
+from hq_placement import p_median_costs, screen, optimize_hqs
+
+
+class HqPlacementTests(unittest.TestCase):
+
+    def setUp(self):
+        self.districts = EmergencySimulator(seed=0).districts
+
+    def test_p_median_cost(self):
+        districts = DistrictModel([1, 3], [[2, 10], [6, 4]])
+        np.testing.assert_allclose(p_median_costs(districts, [[0], [1]]), [(2 + 3 * 10) / 4, (6 + 3 * 4) / 4])
+        np.testing.assert_allclose(p_median_costs(districts, [[0, 1]]), [(2 + 3 * 4) / 4])
+
+    def test_screen_is_sorted_and_exhaustive_for_small_cities(self):
+        shortlist = screen(self.districts, 3, shortlist=5)
+        costs = [cost for _, cost in shortlist]
+        self.assertEqual(costs, sorted(costs))
+        every_set = list(itertools.combinations(range(10), 3))
+        self.assertAlmostEqual(costs[0], p_median_costs(self.districts, every_set).min())
+
+    def test_local_search_finds_the_optimum_of_the_built_in_city(self):
+        for num_hqs in [1, 2, 3, 5]:
+            exhaustive = screen(self.districts, num_hqs, shortlist=1)
+            searched = screen(self.districts, num_hqs, shortlist=1, max_enumerated=0)
+            self.assertAlmostEqual(exhaustive[0][1], searched[0][1], msg=f"Local search missed for {num_hqs} HQs.")
+
+    def test_screen_large_city(self):
+        rng = np.random.default_rng(0)
+        points = rng.random((300, 2)) * 30
+        travel_minutes = np.linalg.norm(points[:, None] - points[None], axis=2) + 1
+        districts = DistrictModel(rng.integers(1000, 50000, 300), travel_minutes)
+        shortlist = screen(districts, 4, shortlist=3)
+        self.assertEqual(len(shortlist), 3)
+        self.assertTrue(all(len(set(hqs)) == 4 for hqs, _ in shortlist))
+        self.assertLess(shortlist[0][1], p_median_costs(districts, [[0, 1, 2, 3]])[0])
+
+    def test_simulator_uses_given_hqs(self):
+        simulator = ExtendedEmergencySimulator(num_vehicles=4, hqs=[7, 2], seed=1)
+        self.assertEqual(simulator.num_hqs, 2)
+        self.assertEqual([doctor["current_location"] for doctor in simulator.doctor_status], [7, 2, 7, 2])
+        for hqs in [[], [1, 1], [10]]:
+            with self.assertRaises(ValueError):
+                ExtendedEmergencySimulator(hqs=hqs)
+
+    def test_invalid_fleet(self):
+        for kwargs in [{"num_hqs": 12}, {"num_hqs": 0}, {"num_vehicles": 0}, {"num_vehicles": -1}]:
+            with self.assertRaises(ValueError, msg=f"{kwargs} was accepted."):
+                ExtendedEmergencySimulator(**kwargs)
+        warm = ExtendedEmergencySimulator(num_hqs=2, num_vehicles=2, seed=1)
+        for variant in [{"num_hqs": 12}, {"num_hqs": 0}, {"hqs": [10]}, {"num_vehicles": 0}]:
+            with self.assertRaises(ValueError, msg=f"{variant} was accepted."):
+                warm.fork([variant])
+        self.assertEqual(warm.fork([{"num_hqs": 3}])[0].hqs, [0, 1, 2])
+
+    def test_default_hqs_are_unchanged(self):
+        self.assertEqual(ExtendedEmergencySimulator(num_hqs=3, num_vehicles=6, seed=42).simulate(10),
+                         ExtendedEmergencySimulator(hqs=[0, 1, 2], num_vehicles=6, seed=42).simulate(10))
+
+    def test_optimize_hqs(self):
+        placements = optimize_hqs(2, num_vehicles=4, strategy="nearest", shortlist=3, hours=5,
+                                  max_replications=30, workers=1)
+        self.assertEqual(len(placements), 3)
+        means = [placement["mean"] for placement in placements]
+        self.assertEqual(means, sorted(means))
+        for placement in placements:
+            self.assertLessEqual(placement["replications"], 30)
+            self.assertGreater(placement["half_width"], 0)
+        self.assertIn(placements[0]["hqs"], [hqs for hqs, _ in screen(self.districts, 2, shortlist=3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,75 @@
-import random
 import math
+import pickle
+import zlib
 from collections import deque
 import numpy as np
+from tracing import TraceRecorder, TRACE_OFF
+from streaming_stats import TimeWeightedAverage, WaitingTimeStats
+from profiling import Profiler
+from variates import VariateProvider
+from call_log import CallLogVariates
+from districts import DistrictModel
+from steady_state import IntervalRecorder, analyze
+from events import Event, ARRIVAL, DISPATCH, ON_SCENE, CARE_DONE, RETURN_TO_HQ, PREEMPTION
 
 
 class Emergency:
-        district = None
-        start_time = None
-        prio = None
-        def __init__(self, district, start_time, prio):
+        # No __dict__ per emergency, the queues can hold many of them
+        __slots__ = ("district", "start_time", "prio", "care_time")
+
+        def __init__(self, district, start_time, prio, care_time=None):
             self.district = district
             self.start_time = start_time
             self.prio = prio
+            self.care_time = care_time  # Recorded in a call log, None to draw one
+
+
+# States of the doctor of EmergencySimulator, every state from TO_EMERGENCY on is spent on the road or at an emergency
+IDLE = 0  # At the HQ, before the first emergency
+AT_HQ = 1  # Back at the HQ
+TO_EMERGENCY = 2
+CARE = 3
+TO_HQ = 4
+
+TRAVEL_FIELDS = ("state", "target", "start", "time_remaining", "time_total", "current_emergency")
+
+
+class TravelState:
+    """
+    What the single doctor is doing: the state code, the route and the remaining time of the current
+    travel or care, including the care work.
+    Reading it like a dict, e.g. travel["currently_traveling"], gives the flags the state codes replace.
+    """
+    __slots__ = TRAVEL_FIELDS
+
+    def __init__(self):
+        self.state = IDLE
+        self.target = None
+        self.start = None
+        self.time_remaining = None
+        self.time_total = None
+        self.current_emergency = None
+
+    @property
+    def currently_traveling(self):
+        return self.state >= TO_EMERGENCY
+
+    @property
+    def currently_giving_care(self):
+        return self.state == CARE
+
+    @property
+    def going_towards_hq_dist(self):
+        # None until the doctor left the HQ for the first time
+        return None if self.state == IDLE else self.state in (AT_HQ, TO_HQ)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in TRAVEL_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
 
 
 class EmergencySimulator:
@@ -28,120 +86,154 @@ class EmergencySimulator:
     [10, 7, 12, 10, 10, 9, 7, 14, 7, 14],
     [12, 6, 7, 11, 20, 17, 10, 20, 14, 6],
     ]
-    travel = { #including care_work
-        "currently_traveling": False,
-        "target": None,
-        "start": None,
-        "time_remaining": None,
-        "time_total": None,
-        "going_towards_hq_dist": None,
-        "current_emergency": None,
-        "currently_giving_care": False
-    }
+    # Care time in seconds, uniform between the bounds, by priority (1 is life-threatening)
+    care_time_bounds = {1: (30*60, 90*60), 0: (10*60, 20*60)}
+    travel = None
     current_dist = 1
     time_to_next_emergency = 0
     total_time_passed = 0
     total_time_doctor_used = 0
     total_time_doctor_center = 0
     waiting_times_non_life_threatening = None
+    waiting_times_life_threatening = None
+    queue_length = None
     life_threatening_emergencies = None
     non_life_threatening_emergencies = None
-    visualization_data = []
-
-    def __init__(self, seed = 123):
-        random.seed(seed)
-        self.waiting_times_non_life_threatening = list()
+    trace = None
+    profiler = None
+    intervals = None
+    # List simulate_iter collects the events of a step in, None when nobody listens
+    event_sink = None
+
+    def __init__(self, seed = 123, trace=TRACE_OFF, trace_interval=60, trace_path=None, profile=False, districts=None,
+                 call_log=None):
+        # trace: "off", "events" (record on every change) or "sampled" (record every trace_interval seconds)
+        # trace_path: stream the trace to this trace file instead of keeping it in memory
+        # profile: count events, draws and queue lengths and time every phase, reported as result["profile"]
+        # districts: a DistrictModel, by default the ten districts of populations and avg_travel_times with HQ 1
+        # call_log: replay the calls of a call_log.CallLog or the path of one instead of synthetic arrivals
+        if districts is None:
+            districts = self.default_districts()
+        self.districts = districts
+        self.current_dist = districts.hq
+        # Every simulator draws from its own streams so that several of them can share a process
+        if call_log is None:
+            self.variates = VariateProvider(seed, districts.populations)
+        else:
+            self.variates = CallLogVariates(call_log, seed, districts.populations)
+        self.travel = TravelState()
+        # Waits are summarised on the fly instead of kept, so the memory does not grow with the run length
+        self.waiting_times_non_life_threatening = WaitingTimeStats()
+        self.waiting_times_life_threatening = WaitingTimeStats()
+        self.queue_length = TimeWeightedAverage()
         self.life_threatening_emergencies = deque()
         self.non_life_threatening_emergencies = deque()
+        if trace != TRACE_OFF:
+            self.trace = TraceRecorder(trace, interval=trace_interval, path=trace_path)
+        if profile:
+            self.profiler = Profiler()
+
+    @classmethod
+    def default_districts(cls):
+        """The ten districts of populations and avg_travel_times with HQ 1."""
+        return DistrictModel(cls.populations, cls.avg_travel_times, hq=1)
 
     def get_travel_time(self, dist1, dist2, dist3=None, ratio_traveled=0.5):
         # if between two districts is needed only supply dist1 and dist2, 
         # if currently underway between districts supply dist1 and dist2 as current route, dist3 as new and travel ratio
-        if not dist3:
-            avg_travel_time_sec = round(self.avg_travel_times[dist1][dist2]*60)
+        # Single values are read as Python floats, rounding numpy scalars is several times slower
+        travel_seconds = self.districts.travel_seconds
+        if dist3 is None:
+            avg_travel_time_sec = round(float(travel_seconds[dist1, dist2]))
         else:
-            avg_travel_time_sec = round(self.avg_travel_times[dist1][dist3]*60*ratio_traveled + self.avg_travel_times[dist2][dist3]*60*(1-ratio_traveled))
+            avg_travel_time_sec = round(float(travel_seconds[dist1, dist3])*ratio_traveled + float(travel_seconds[dist2, dist3])*(1-ratio_traveled))
 
-        return random.randint(round(avg_travel_time_sec*0.9), round(avg_travel_time_sec*1.1))
+        return self.variates.randint("travel", round(avg_travel_time_sec*0.9), round(avg_travel_time_sec*1.1))
     
     def get_time_to_next_event(self):
-        mean_interval_seconds = 50 * 60
-        rate = 1.0 / mean_interval_seconds
-        return round(random.expovariate(rate))
+        # Exponential with a mean of 50 minutes, rounded to seconds
+        return self.variates.time_to_next_emergency()
 
     def wait_secs(self, secs):
 
+        travel = self.travel
         self.total_time_passed += secs
-        if self.travel["currently_traveling"]:
-            self.travel["time_remaining"] -= secs
+        self.queue_length.add(len(self.non_life_threatening_emergencies) + len(self.life_threatening_emergencies), secs)
+        if travel.state >= TO_EMERGENCY:
+            travel.time_remaining -= secs
         self.time_to_next_emergency -= secs
 
-        if not self.travel["currently_traveling"]:
+        if travel.state < TO_EMERGENCY:
             self.total_time_doctor_center += secs
             if len(self.non_life_threatening_emergencies) + len(self.life_threatening_emergencies) != 0:
                 print("Broke smth ######################################################")
-        elif not self.travel["going_towards_hq_dist"]:
+        elif travel.state != TO_HQ:
             self.total_time_doctor_used += secs
 
     def start_new_travel(self, target_dist, emergency= None):
-        if emergency:
-            pass
-        if self.travel["currently_traveling"]:
-            dist1 = self.travel["start"]
-            dist2 = self.travel["target"]
+        travel = self.travel
+        if travel.state >= TO_EMERGENCY:
+            dist1 = travel.start
+            dist2 = travel.target
             dist3 = target_dist
-            ratio_traveled = 1-(self.travel["time_remaining"]/self.travel["time_total"])
+            ratio_traveled = 1-(travel.time_remaining/travel.time_total)
 
             my_time = self.get_travel_time(dist1, dist2, dist3, ratio_traveled)
-            self.travel["time_total"] = my_time
-            self.travel["time_remaining"] = my_time
+            travel.time_total = my_time
+            travel.time_remaining = my_time
             if ratio_traveled > 0.5:
-                self.travel["start"] = dist2
+                travel.start = dist2
             else:
-                self.travel["start"] = dist1
+                travel.start = dist1
             
         else:
             my_time = self.get_travel_time(self.current_dist, target_dist)
-            self.travel["time_total"] = my_time
-            self.travel["time_remaining"] = my_time
-            self.travel["start"] = self.current_dist
+            travel.time_total = my_time
+            travel.time_remaining = my_time
+            travel.start = self.current_dist
 
-        self.travel["currently_traveling"] = True
-        self.travel["target"] = target_dist
-        
+        travel.target = target_dist
+        travel.current_emergency = emergency
 
-        if emergency != None:
-            self.travel["current_emergency"] = emergency
-            self.travel["going_towards_hq_dist"] = False
+        if emergency is not None:
+            travel.state = TO_EMERGENCY
         else:
-            self.travel["current_emergency"] = None
-            self.travel["going_towards_hq_dist"] = True ### NOTE: Change if not always going back to HQ if non emergency
+            travel.state = TO_HQ ### NOTE: Change if not always going back to HQ if non emergency
 
-        self.travel["currently_giving_care"] = False
-        self.travel["care_time_remaining"] = None
+        if self.event_sink is not None:
+            if emergency is not None:
+                self.event_sink.append(Event(DISPATCH, self.total_time_passed, target_dist, emergency.prio,
+                                             emergency.start_time))
+            else:
+                self.event_sink.append(Event(RETURN_TO_HQ, self.total_time_passed, target_dist))
 
 
     def generate_emergency(self):
         if self.time_to_next_emergency <= 0:
             self.time_to_next_emergency = self.get_time_to_next_event()
-            if (random.choices([0, 1], weights=[3, 1])[0] == 1): #life threatening
-                self.life_threatening_emergencies.append(Emergency(
-                        district = random.choices(range(10), weights=self.populations)[0],
-                        start_time = self.total_time_passed,
-                        prio=1
-                    ))
-                if self.travel["currently_traveling"] and not self.travel["currently_giving_care"] and not self.travel["going_towards_hq_dist"] and self.travel["current_emergency"].prio == 0:
-                    self.non_life_threatening_emergencies.appendleft(self.travel["current_emergency"])
+            emergency = Emergency(
+                    prio = int(self.variates.life_threatening()),
+                    district = self.variates.district(),
+                    start_time = self.total_time_passed,
+                    care_time = self.variates.recorded_care_time(),
+                )
+            if self.event_sink is not None:
+                self.event_sink.append(Event(ARRIVAL, self.total_time_passed, emergency.district, emergency.prio,
+                                             emergency.start_time))
+            if emergency.prio == 1:
+                self.life_threatening_emergencies.append(emergency)
+                if self.travel.state == TO_EMERGENCY and self.travel.current_emergency.prio == 0:
+                    preempted = self.travel.current_emergency
+                    if self.event_sink is not None:
+                        self.event_sink.append(Event(PREEMPTION, self.total_time_passed, preempted.district,
+                                                     preempted.prio, preempted.start_time))
+                    self.non_life_threatening_emergencies.appendleft(preempted)
                     em = self.life_threatening_emergencies.popleft()
                     self.start_new_travel(em.district, em)
             else:
-                self.non_life_threatening_emergencies.append(Emergency(
-                        district = random.choices(range(10), weights=self.populations)[0],
-                        start_time = self.total_time_passed,
-                        prio=0
-                    ))
+                self.non_life_threatening_emergencies.append(emergency)
             
-            if not self.travel["currently_traveling"] or self.travel["going_towards_hq_dist"]:
+            if self.travel.state < TO_EMERGENCY or self.travel.state == TO_HQ:
                 self.move_to_next_em()
 
     def move_to_next_em(self):
@@ -150,79 +242,142 @@ class EmergencySimulator:
         elif len(self.non_life_threatening_emergencies) != 0:
             my_queue =  self.non_life_threatening_emergencies
         else:
-            self.start_new_travel(1) ### NOTE: Change for multiple HQs
+            self.start_new_travel(self.districts.hq) ### NOTE: Change for multiple HQs
             return
         em = my_queue.popleft()
         self.start_new_travel(em.district, em)
 
     def get_em_care_time(self, em):
-        if em.prio == 1:
-            return random.randint(30*60, 90*60)
-        else:
-            return random.randint(10*60, 20*60)
+        if em.care_time is not None:
+            return em.care_time
+        low, high = self.care_time_bounds[em.prio]
+        return self.variates.randint("care", low, high)
 
     def check_travel(self):
-        if not self.travel["currently_traveling"]: 
+        travel = self.travel
+        if travel.state < TO_EMERGENCY: 
             return
-        if not self.travel["time_remaining"] <= 0:
+        if not travel.time_remaining <= 0:
             return
-        if self.travel["going_towards_hq_dist"] == True:
-            self.current_dist = 1
-            self.travel["currently_traveling"] = False
+        if travel.state == TO_HQ:
+            self.current_dist = self.districts.hq
+            travel.state = AT_HQ
             return
-        if self.travel["currently_giving_care"]:
-            #done with caregiving
-            self.travel["currently_giving_care"] = False
+        if travel.state == CARE:
+            #done with caregiving, still on duty until the next travel starts
+            if self.event_sink is not None:
+                em = travel.current_emergency
+                self.event_sink.append(Event(CARE_DONE, self.total_time_passed, em.district, em.prio, em.start_time))
+            travel.state = TO_EMERGENCY
             self.move_to_next_em()
         else:
             #start with caregiving
-            em = self.travel["current_emergency"]
+            em = travel.current_emergency
             if em.prio == 0:
-                self.waiting_times_non_life_threatening += [self.total_time_passed - em.start_time]
-            self.travel["time_remaining"] = self.get_em_care_time(em)
-            self.travel["currently_giving_care"] = True
-            self.current_dist = self.travel["target"]
+                self.waiting_times_non_life_threatening.add(self.total_time_passed - em.start_time)
+            else:
+                self.waiting_times_life_threatening.add(self.total_time_passed - em.start_time)
+            if self.event_sink is not None:
+                self.event_sink.append(Event(ON_SCENE, self.total_time_passed, em.district, em.prio, em.start_time))
+            travel.time_remaining = self.get_em_care_time(em)
+            travel.state = CARE
+            self.current_dist = travel.target
 
 
 
-    def simulate(self, total_time_hours=1):
+    def simulate(self, total_time_hours=1, steady_state=False):
+        # steady_state: drop the warm-up found by MSER-5 from the metrics and add batch means confidence
+        # intervals from this one run as result["steady_state"], or result["steady_state_reason"] if the
+        # run is too short for them
         max_time = total_time_hours * 3600
-        while self.total_time_passed < max_time:
-            self.generate_emergency()
-            self.check_travel()
-
-            if self.travel["time_remaining"]:
-                time_to_pass = min(self.travel["time_remaining"], self.time_to_next_emergency)
+        observer = None
+        if steady_state:
+            if self.intervals is None:
+                self.intervals = IntervalRecorder()
+            observer = self.intervals
+            if not observer.rows:
+                observer.observe(self)
+        if self.profiler is not None:
+            self.profiler.attach(self)
+        if self.trace is not None:
+            self.trace.start(self, max_time)
+        try:
+            while self.total_time_passed < max_time:
+                self.step()
+
+                # Collect data for visualization
+                if self.trace is not None:
+                    self.trace.record(self)
+                if observer is not None and self.total_time_passed >= observer.next_boundary:
+                    observer.observe(self)
+        finally:
+            # Finishes a trace file, also if the run fails
+            if self.trace is not None:
+                self.trace.close()
+
+        result = self.summary()
+        result["trace"] = self.trace.columns() if self.trace is not None else None
+        if steady_state:
+            # Only the intervals after the warm-up count, the partial interval at the end is left out as well.
+            # A run too short for the analysis keeps its plain metrics, with the reason instead.
+            try:
+                result["steady_state"] = analyze(self.intervals)
+            except ValueError as error:
+                result["steady_state_reason"] = str(error)
             else:
-                time_to_pass = self.time_to_next_emergency
-
-            self.wait_secs(time_to_pass)
-
-
-            # Collect data for visualization
-            self.visualization_data.append({
-                "total_time_passed": self.total_time_passed,
-                "current_dist": self.current_dist,
-                "currently_traveling": self.travel["currently_traveling"],
-                "currently_giving_care": self.travel["currently_giving_care"],
-                "time_remaining": self.travel["time_remaining"],
-                "target": self.travel["target"],
-                "going_towards_hq_dist": self.travel["going_towards_hq_dist"],
-                # Add detailed emergency data here
-                "life_threatening_emergencies": [
-                    {"district": em.district, "prio": em.prio}
-                    for em in self.life_threatening_emergencies
-                ],
-                "non_life_threatening_emergencies": [
-                    {"district": em.district, "prio": em.prio}
-                    for em in self.non_life_threatening_emergencies
-                ],
-                "time_to_next_emergency": self.time_to_next_emergency,
-            })
-        
+                result["steady_state_reason"] = None
+                for name in ["doc_util", "doc_center", "avg_non_live_threatening_waiting_time_min"]:
+                    result[name] = result["steady_state"][name]["mean"]
+        return result
+
+    def step(self):
+        # One event: new emergencies, the end of a travel or care, then the time until the next of them
+        self.generate_emergency()
+        self.check_travel()
+
+        if self.travel.time_remaining:
+            time_to_pass = min(self.travel.time_remaining, self.time_to_next_emergency)
+        else:
+            time_to_pass = self.time_to_next_emergency
+
+        self.wait_secs(time_to_pass)
+
+    def simulate_iter(self, total_time_hours=1):
+        """
+        Runs the simulation like simulate and yields an events.Event for everything that happens, as it
+        happens. Closing the generator stops the simulation at the current step; when it runs to the end,
+        the metrics of simulate (without steady-state analysis) are the value of StopIteration.
+        A trace and a profiler record the run as they do in simulate.
+
+        :param total_time_hours: Simulated hours.
+        """
+        max_time = total_time_hours * 3600
+        if self.profiler is not None:
+            self.profiler.attach(self)
+        if self.trace is not None:
+            self.trace.start(self, max_time)
+        events = []
+        self.event_sink = events
+        try:
+            while self.total_time_passed < max_time:
+                self.step()
+                if self.trace is not None:
+                    self.trace.record(self)
+                if events:
+                    yield from events
+                    events.clear()
+        finally:
+            self.event_sink = None
+            if self.trace is not None:
+                self.trace.close()
+        result = self.summary()
+        result["trace"] = self.trace.columns() if self.trace is not None else None
+        return result
+
+    def summary(self):
         # Handle empty waiting times list to avoid ZeroDivisionError
         avg_waiting_time = (
-            sum(self.waiting_times_non_life_threatening) / len(self.waiting_times_non_life_threatening) / 60
+            self.waiting_times_non_life_threatening.stats.mean / 60
             if self.waiting_times_non_life_threatening
             else 0
         )
@@ -232,30 +387,80 @@ class EmergencySimulator:
             "doc_util": self.total_time_doctor_used / self.total_time_passed,
             "doc_center": self.total_time_doctor_center / self.total_time_passed,
             "avg_non_live_threatening_waiting_time_min": avg_waiting_time,
-            "visualization_data": self.visualization_data,
+            "avg_queue_length": self.queue_length.average,
+            # Mergeable across replications, see streaming_stats.merge_all
+            "waiting_times": {
+                "non_life_threatening": self.waiting_times_non_life_threatening,
+                "life_threatening": self.waiting_times_life_threatening,
+            },
+            "trace": None,
+            "profile": self.profiler.report() if self.profiler is not None else None,
+            "steady_state": None,
         }
 
+    def snapshot(self):
+        """
+        The full state of the simulator as compact bytes: travel state, queues, accumulators and the
+        state of the random streams. Traces and profilers are not part of a snapshot, and the district model
+        only by reference, as it can be much larger than the rest of the state.
+        """
+        # Methods replaced on the instance, e.g. by a profiler, are left out
+        state = {name: value for name, value in vars(self).items()
+                 if name not in ("trace", "profiler", "districts") and not callable(value)}
+        return zlib.compress(pickle.dumps((type(self), repr(self.districts), state), protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def restore(snapshot, districts=None, **overrides):
+        """
+        A simulator in the state of `snapshot`, which continues exactly like the simulator it was taken from.
+        `overrides` are passed on to configure, e.g. seed=7 to continue with other random streams.
+
+        :param districts: The DistrictModel the snapshot was taken with, the default city if not given.
+        """
+        simulator_class, districts_reference, state = pickle.loads(zlib.decompress(snapshot))
+        if districts is None:
+            districts = simulator_class.default_districts()
+        if repr(districts) != districts_reference:
+            raise ValueError(f"The snapshot was taken with {districts_reference}, pass it to restore as districts")
+        simulator = simulator_class.__new__(simulator_class)
+        simulator.__dict__.update(state)
+        simulator.districts = districts
+        simulator.configure(**overrides)
+        return simulator
+
+    def fork(self, variants):
+        """One continuation of the current state per dict of overrides in `variants`."""
+        snapshot = self.snapshot()
+        return [EmergencySimulator.restore(snapshot, districts=self.districts, **variant) for variant in variants]
+
+    def configure(self, **overrides):
+        """Changes parameters of a restored simulator, seed=... replaces the random streams."""
+        if "seed" in overrides:
+            self.reseed(overrides.pop("seed"))
+        for name, value in overrides.items():
+            if not hasattr(self, name) or callable(getattr(self, name)):
+                raise ValueError(f"Unknown parameter: {name}")
+            setattr(self, name, value)
+
+    def reseed(self, seed):
+        self.variates = self.variates.reseeded(seed, self.districts.populations)
+
     def test(self):
         return self.simulate(500)
     
 
 if __name__ == "__main__":
-    doc_util_results = []
-    doc_center_results = []
-    waiting_results = []
-
-    es = EmergencySimulator(seed=40)
-    # print(es.simulate(1000))
-
-    for i in range(100):
-        # print("done:", i)
-        es = EmergencySimulator(seed=i)
-        result = es.simulate(1000)
-        doc_util_results.append(result["doc_util"])
-        doc_center_results.append(result["doc_center"])
-        waiting_results.append(result["avg_non_live_threatening_waiting_time_min"])
-
-    # print(waiting_results)
+    from replications import run_until_precise
+
+    # Replicate until the means are known to within a few percent, at most 100 times
+    run = run_until_precise(EmergencySimulator, hours=1000, master_seed=0, max_replications=100,
+                            relative={"doc_util": 0.01, "doc_center": 0.02,
+                                      "avg_non_live_threatening_waiting_time_min": 0.05})
+    print(f"Replications: {run['replications']}{'' if run['converged'] else ' (targets not reached)'}")
+    results = run["results"]
+    doc_util_results = [result["doc_util"] for result in results]
+    doc_center_results = [result["doc_center"] for result in results]
+    waiting_results = [result["avg_non_live_threatening_waiting_time_min"] for result in results]
 
     doc_util_average = np.mean(doc_util_results)
     doc_util_std_deviation = np.std(doc_util_results)
@@ -269,3 +474,16 @@ if __name__ == "__main__":
     print(f"Doc Util - Average: {doc_util_average}, Standard Deviation: {doc_util_std_deviation}")
     print(f"Doc Center - Average: {doc_center_average}, Standard Deviation: {doc_center_std_deviation}")
     print(f"Waiting Times - Average: {waiting_average}, Standard Deviation: {waiting_std_deviation}")
+
+    # The same metrics from one long run, without the warm-up and with batch means confidence intervals
+    steady_state = EmergencySimulator(seed=0).simulate(20000, steady_state=True)["steady_state"]
+    print(f"Steady state from one run of 20000 hours, warm-up {steady_state['warmup_hours']:.1f} hours:")
+    for name in ["doc_util", "doc_center", "avg_non_live_threatening_waiting_time_min"]:
+        print(f"{name}: {steady_state[name]['mean']} +- {steady_state[name]['half_width']}")
+
+    # Quantiles over the waits of all replications together
+    from streaming_stats import merge_all
+    for priority in ["non_life_threatening", "life_threatening"]:
+        waits = merge_all(result["waiting_times"][priority] for result in results).summary()
+        print(f"Waiting Times ({priority}) - p50: {waits['p50']:.1f}, p90: {waits['p90']:.1f}, "
+              f"p99: {waits['p99']:.1f} minutes")
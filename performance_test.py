@@ -18,9 +18,9 @@ class StressAndPerformanceTests(unittest.TestCase):
             )
 
 
-        start_time = time.time()
+        start_time = time.perf_counter()
         result = self.simulator.simulate(2)
-        end_time = time.time()
+        end_time = time.perf_counter()
 
 
         execution_time = end_time - start_time
@@ -39,9 +39,9 @@ class StressAndPerformanceTests(unittest.TestCase):
 
     def test_long_duration_performance(self):
         # Simulate for 24 hours
-        start_time = time.time()
+        start_time = time.perf_counter()
         result = self.simulator.simulate(24)
-        end_time = time.time()
+        end_time = time.perf_counter()
 
 
         execution_time = end_time - start_time
@@ -49,7 +49,7 @@ class StressAndPerformanceTests(unittest.TestCase):
         print(f"Simulation Execution Time: {execution_time:.2f} seconds")
         print(f"Doctor Utilization: {result['doc_util']}")
         print(f"Doctor Time at Center: {result['doc_center']}")
-        print(f"Avg Non-Life-Threatening Waiting Time (mins): {result['avg_non_live_threatening_watiing_time_min']}")
+        print(f"Avg Non-Life-Threatening Waiting Time (mins): {result['avg_non_live_threatening_waiting_time_min']}")
 
 
         self.assertLess(execution_time, 10, "Simulation execution time is too high for 24-hour simulation.")
@@ -0,0 +1,116 @@
+import time
+
+# Methods timed when they exist on the simulator. Times are inclusive, e.g. move_to_next_em is also
+# part of the time of generate_emergency and check_travel when it is called from there.
+PHASES = (
+    "generate_emergency",
+    "check_travel",
+    "move_to_next_em",
+    "start_new_travel",
+    "assign_doctor",
+    "nearest",
+    "complete_jobs",
+    "get_travel_time",
+    "get_em_care_time",
+)
+
+
+class Profiler:
+    """
+    Counts and times what a simulator does, switched on with profile=True on the simulator.
+
+    The profiler wraps the methods of the one simulator instance it is attached to, instead of
+    checking a flag in the simulator code, so a simulator without a profiler runs exactly the
+    code it would run if this module did not exist.
+    """
+
+    def __init__(self):
+        self.attached = False
+        self.phase_seconds = {}
+        self.phase_calls = {}
+        self.draws = {}
+        self.steps = 0
+        self.queue_high_water = {}
+
+    def attach(self, simulator):
+        """Wraps the methods of `simulator`, only the first call has an effect."""
+        if self.attached:
+            return
+        self.attached = True
+        for phase in PHASES:
+            if hasattr(simulator, phase):
+                setattr(simulator, phase, self.timed(phase, getattr(simulator, phase)))
+        if simulator.trace is not None:
+            simulator.trace.record = self.timed("trace", simulator.trace.record)
+
+        variates = simulator.variates
+        next_variate = variates.next
+
+        def counted_next(name):
+            self.draws[name] = self.draws.get(name, 0) + 1
+            return next_variate(name)
+        variates.next = counted_next
+
+        rng = getattr(simulator, "rng", None)
+        if rng is not None:
+            randrange = rng.randrange
+
+            def counted_randrange(*args):
+                self.draws["vehicle"] = self.draws.get("vehicle", 0) + 1
+                return randrange(*args)
+            rng.randrange = counted_randrange
+
+        # One step of the simulation loop, queue lengths are sampled after every step
+        if hasattr(simulator, "emergency_queue"):
+            step, queues = "run_tick", lambda: {"total": len(simulator.emergency_queue)}
+        else:
+            step, queues = "wait_secs", lambda: {
+                "life_threatening": len(simulator.life_threatening_emergencies),
+                "non_life_threatening": len(simulator.non_life_threatening_emergencies),
+                "total": len(simulator.life_threatening_emergencies) + len(simulator.non_life_threatening_emergencies),
+            }
+        step_method = getattr(simulator, step)
+
+        def counted_step(*args, **kwargs):
+            result = step_method(*args, **kwargs)
+            self.steps += 1
+            for name, length in queues().items():
+                if length > self.queue_high_water.get(name, 0):
+                    self.queue_high_water[name] = length
+            return result
+        setattr(simulator, step, counted_step)
+
+    def timed(self, phase, method):
+        self.phase_seconds[phase] = 0.0
+        self.phase_calls[phase] = 0
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.phase_seconds[phase] += time.perf_counter() - start
+                self.phase_calls[phase] += 1
+        return wrapper
+
+    def report(self):
+        """The counters as a dict of plain values."""
+        events = {
+            "step": self.steps,
+            "arrival": self.draws.get("arrival", 0),
+            "care": self.phase_calls.get("get_em_care_time", 0),
+        }
+        if "assign_doctor" in self.phase_calls:
+            # Every dispatch draws one care time
+            events["dispatch"] = self.phase_calls["get_em_care_time"]
+        else:
+            events["dispatch"] = self.phase_calls.get("start_new_travel", 0)
+        # Phases the simulator has but never runs, e.g. check_travel of ExtendedEmergencySimulator, are left out
+        phases = [phase for phase, calls in self.phase_calls.items() if calls > 0]
+        return {
+            "events": events,
+            "phase_seconds": {phase: self.phase_seconds[phase] for phase in phases},
+            "phase_calls": {phase: self.phase_calls[phase] for phase in phases},
+            "queue_high_water": dict(self.queue_high_water),
+            "draws": dict(self.draws),
+        }
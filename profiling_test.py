@@ -0,0 +1,49 @@
+import unittest
+from main import EmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator
+
+
+class ProfilingTests(unittest.TestCase):
+
+    def test_off_by_default_and_nothing_wrapped(self):
+        simulator = EmergencySimulator(seed=1)
+        result = simulator.simulate(10)
+        self.assertIsNone(result["profile"], "Profiling should be off by default.")
+        self.assertFalse([name for name, value in vars(simulator).items() if callable(value)],
+                         "Methods were replaced although profiling is off.")
+        self.assertNotIn("next", vars(simulator.variates))
+
+    def test_profiling_does_not_change_results(self):
+        plain = EmergencySimulator(seed=2).simulate(100)
+        profiled = EmergencySimulator(seed=2, profile=True).simulate(100)
+        for key in ["doc_util", "doc_center", "avg_non_live_threatening_waiting_time_min"]:
+            self.assertEqual(plain[key], profiled[key], f"Profiling changed {key}.")
+
+    def test_report(self):
+        simulator = EmergencySimulator(seed=3, profile=True, trace="events")
+        report = simulator.simulate(100)["profile"]
+        events = report["events"]
+        self.assertEqual(events["arrival"], report["draws"]["arrival"])
+        self.assertEqual(events["arrival"], report["draws"]["district"], "Every arrival draws one district.")
+        self.assertEqual(events["care"], len(simulator.waiting_times_non_life_threatening)
+                         + len(simulator.waiting_times_life_threatening))
+        self.assertEqual(report["phase_calls"]["generate_emergency"], events["step"])
+        self.assertEqual(report["phase_calls"]["trace"], events["step"])
+        self.assertGreater(report["phase_seconds"]["check_travel"], 0)
+        self.assertGreaterEqual(report["queue_high_water"]["total"], report["queue_high_water"]["life_threatening"])
+
+    def test_extended_simulator_report(self):
+        reports = {}
+        for engine in ["tick", "event"]:
+            simulator = ExtendedEmergencySimulator(num_vehicles=3, strategy="nearest", seed=4, profile=True)
+            reports[engine] = simulator.simulate(10, engine=engine)["profile"]
+            self.assertEqual(reports[engine]["events"]["dispatch"], simulator.travel_count)
+            self.assertNotIn("check_travel", reports[engine]["phase_calls"], "Unused phases are reported.")
+        self.assertEqual(reports["tick"]["draws"], reports["event"]["draws"], "Engines draw differently.")
+        self.assertEqual(reports["tick"]["queue_high_water"], reports["event"]["queue_high_water"])
+        self.assertLess(reports["event"]["events"]["step"], reports["tick"]["events"]["step"],
+                        "The event engine should process fewer steps.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+
+def replication_seeds(master_seed, num_replications):
+    """
+    Derive one seed per replication from a master seed.
+    The seed of replication i only depends on the master seed and i, never on how many
+    replications are run or on which worker runs them.
+    """
+    children = np.random.SeedSequence(master_seed).spawn(num_replications)
+    return [int(child.generate_state(1, dtype=np.uint64)[0]) for child in children]
+
+
+def run_replication(task):
+    """Run a single replication described by a (simulator_class, simulator_kwargs, seed, hours) tuple."""
+    simulator_class, simulator_kwargs, seed, hours = task
+    simulator = simulator_class(seed=seed, **simulator_kwargs)
+    result = simulator.simulate(hours)
+    # Traces stay in the worker, only the metrics are sent back
+    result.pop("trace", None)
+    return result
+
+
+def run_replications(simulator_class, num_replications, hours, master_seed=0, workers=None, cache=None,
+                     **simulator_kwargs):
+    """
+    Runs independent replications of a simulator and returns their results in replication order.
+
+    :param simulator_class: EmergencySimulator, ExtendedEmergencySimulator or a subclass.
+    :param num_replications: Number of replications to run.
+    :param hours: Simulated hours per replication.
+    :param master_seed: Seed from which the seeds of all replications are derived.
+    :param workers: Number of worker processes, defaults to the number of cores. 1 runs in-process.
+    :param cache: Optional ResultCache, cached replications are not run again and new ones are stored.
+    :param simulator_kwargs: Passed on to the simulator, e.g. num_hqs or strategy.
+    """
+    seeds = replication_seeds(master_seed, num_replications)
+    return run_seeds(simulator_class, seeds, hours, workers, simulator_kwargs, cache)
+
+
+def run_seeds(simulator_class, seeds, hours, workers, simulator_kwargs, cache=None):
+    """Runs one replication per seed and returns the results in the order of the seeds."""
+    results = [None] * len(seeds)
+    keys = [None] * len(seeds)
+    if cache is not None:
+        keys = [cache.key(simulator_class, simulator_kwargs, seed, hours) for seed in seeds]
+        results = [cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    tasks = [(simulator_class, simulator_kwargs, seeds[i], hours) for i in missing]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, max(len(tasks), 1))
+    if workers == 1:
+        computed = map(run_replication, tasks)
+        pool = None
+    else:
+        # A few chunks per worker keep the pool busy without paying for one round trip per replication
+        chunksize = max(1, math.ceil(len(tasks) / (workers * 4)))
+        pool = ProcessPoolExecutor(max_workers=workers)
+        computed = pool.map(run_replication, tasks, chunksize=chunksize)
+    try:
+        # Results are stored as they come in, so an interrupted run resumes from the last one
+        for i, result in zip(missing, computed):
+            results[i] = result
+            if cache is not None:
+                cache.put(keys[i], result)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if cache is not None and missing:
+        cache.evict()
+    return results
+
+
+def t_quantile(p, df):
+    """
+    Quantile of Student's t distribution, from the Cornish-Fisher expansion around the normal quantile.
+    Accurate to about 1e-3 for df >= 3, which is plenty for sizing confidence intervals.
+    """
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+def confidence_half_width(values, confidence=0.95):
+    """Half-width of the t confidence interval of the mean of `values`."""
+    n = len(values)
+    if n < 2:
+        return math.inf
+    return t_quantile(0.5 + confidence / 2, n - 1) * float(np.std(values, ddof=1)) / math.sqrt(n)
+
+
+def run_until_precise(simulator_class, hours, absolute=None, relative=None, confidence=0.95, master_seed=0,
+                      batch_size=20, min_replications=10, max_replications=1000, workers=None, cache=None,
+                      **simulator_kwargs):
+    """
+    Runs replications in batches until the confidence interval of the mean of every requested metric
+    is narrow enough, or max_replications are reached. Replication i always uses the same seed as in
+    run_replications, so a configuration that stops early ran a prefix of the full set of replications.
+
+    :param simulator_class: EmergencySimulator, ExtendedEmergencySimulator or a subclass.
+    :param hours: Simulated hours per replication.
+    :param absolute: Dict of metric -> largest acceptable half-width, e.g. {"doc_util": 0.005}.
+    :param relative: Dict of metric -> largest acceptable half-width relative to the mean,
+                     e.g. {"avg_non_live_threatening_waiting_time_min": 0.02}.
+    :param confidence: Confidence level of the intervals.
+    :param master_seed: Seed from which the seeds of all replications are derived.
+    :param batch_size: Replications run between two checks.
+    :param min_replications: Replications run before the first check.
+    :param max_replications: Cap on the number of replications.
+    :param workers: Number of worker processes, defaults to the number of cores. 1 runs in-process.
+    :param cache: Optional ResultCache, cached replications are not run again and new ones are stored.
+    :param simulator_kwargs: Passed on to the simulator, e.g. num_hqs or strategy.
+    :return: Dict with the "results" of all replications, the number of "replications" run, the "mean"
+             and "half_width" of every requested metric and whether all targets were "converged".
+    """
+    absolute = absolute or {}
+    relative = relative or {}
+    if not absolute and not relative:
+        raise ValueError("At least one absolute or relative target is needed")
+    metrics = list(dict.fromkeys(list(absolute) + list(relative)))
+    seeds = replication_seeds(master_seed, max_replications)
+
+    results = []
+    while True:
+        count = min_replications if not results else batch_size
+        batch = seeds[len(results):len(results) + count]
+        results.extend(run_seeds(simulator_class, batch, hours, workers, simulator_kwargs, cache))
+
+        mean = {metric: float(np.mean([result[metric] for result in results])) for metric in metrics}
+        half_width = {metric: confidence_half_width([result[metric] for result in results], confidence)
+                      for metric in metrics}
+        converged = (all(half_width[metric] <= target for metric, target in absolute.items())
+                     and all(half_width[metric] <= target * abs(mean[metric]) for metric, target in relative.items()))
+        if converged or len(results) >= max_replications:
+            return {
+                "results": results,
+                "replications": len(results),
+                "mean": mean,
+                "half_width": half_width,
+                "converged": converged,
+            }
+
+def run_batch_replications(num_replications, hours, master_seed=0, batch_size=1000):
+    """
+    Runs replications of EmergencySimulator with the vectorized BatchEmergencySimulator.
+    Returns the same results as run_replications(EmergencySimulator, ...) with the same master seed.
+
+    :param num_replications: Number of replications to run.
+    :param hours: Simulated hours per replication.
+    :param master_seed: Seed from which the seeds of all replications are derived.
+    :param batch_size: Replications simulated together, bounds the memory used by the batch engine,
+                       about 0.2 MB per replication and 1000 simulated hours.
+    """
+    from batch_engine import BatchEmergencySimulator
+
+    seeds = replication_seeds(master_seed, num_replications)
+    results = []
+    for first in range(0, num_replications, batch_size):
+        results.extend(BatchEmergencySimulator(seeds[first:first + batch_size]).simulate(hours))
+    return results
+
+
+def run_fork(task):
+    """Continue a snapshot with the overrides of a (snapshot, overrides, hours) tuple."""
+    from main import EmergencySimulator
+
+    snapshot, overrides, hours = task
+    result = EmergencySimulator.restore(snapshot, **overrides).simulate(hours)
+    result.pop("trace", None)
+    return result
+
+
+def run_forks(snapshot, variants, hours, workers=None):
+    """
+    Continues a simulator snapshot once per dict of overrides in `variants`, up to `hours`
+    simulated hours in total, and returns the results in the order of the variants.
+
+    :param snapshot: Bytes from EmergencySimulator.snapshot.
+    :param variants: One dict of overrides per continuation, e.g. [{"strategy": "fifo"}, {"strategy": "nearest"}].
+        Snapshots of a simulator with other than the default districts need them as {"districts": model, ...}.
+    :param hours: Total simulated hours, including the ones before the snapshot.
+    :param workers: Number of worker processes, defaults to the number of cores. 1 runs in-process.
+    """
+    tasks = [(snapshot, variant, hours) for variant in variants]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, max(len(tasks), 1))
+    if workers == 1:
+        return [run_fork(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_fork, tasks))
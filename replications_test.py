@@ -0,0 +1,63 @@
+import unittest
+from main import EmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator
+from replications import replication_seeds, run_replications, run_until_precise, t_quantile
+
+
+class ReplicationTests(unittest.TestCase):
+
+    def test_seeds_do_not_depend_on_replication_count(self):
+        self.assertEqual(replication_seeds(7, 5), replication_seeds(7, 20)[:5],
+                         "Seed of a replication changed with the number of replications.")
+        self.assertEqual(len(set(replication_seeds(7, 100))), 100, "Replications share seeds.")
+
+    def test_results_independent_of_worker_count(self):
+        in_process = run_replications(EmergencySimulator, 6, hours=20, master_seed=3, workers=1)
+        pooled = run_replications(EmergencySimulator, 6, hours=20, master_seed=3, workers=2)
+        self.assertEqual(in_process, pooled, "Results depend on the number of workers.")
+
+    def test_extended_simulator_replications(self):
+        in_process = run_replications(ExtendedEmergencySimulator, 4, hours=5, master_seed=1, workers=1,
+                                      num_hqs=2, num_vehicles=2, strategy="nearest")
+        pooled = run_replications(ExtendedEmergencySimulator, 4, hours=5, master_seed=1, workers=3,
+                                  num_hqs=2, num_vehicles=2, strategy="nearest")
+        self.assertEqual(in_process, pooled, "Results depend on the number of workers.")
+
+    def test_simulators_do_not_share_random_state(self):
+        alone = ExtendedEmergencySimulator(num_vehicles=2, seed=5).simulate(5)
+        first = ExtendedEmergencySimulator(num_vehicles=2, seed=5)
+        second = ExtendedEmergencySimulator(num_vehicles=2, seed=6)
+        second.simulate(2)
+        interleaved = first.simulate(5)
+        self.assertEqual(alone, interleaved, "Another simulator in the same process changed the results.")
+
+
+class SequentialStoppingTests(unittest.TestCase):
+
+    def test_t_quantile(self):
+        for df, expected in [(3, 3.182), (10, 2.228), (30, 2.042), (1000, 1.962)]:
+            self.assertAlmostEqual(t_quantile(0.975, df), expected, places=2)
+
+    def test_stops_when_target_is_reached(self):
+        run = run_until_precise(EmergencySimulator, hours=20, relative={"doc_util": 0.05}, master_seed=3,
+                                batch_size=5, min_replications=5, max_replications=200, workers=1)
+        self.assertTrue(run["converged"], "Target was not reached.")
+        self.assertLess(run["replications"], 200, "Did not stop early.")
+        self.assertLessEqual(run["half_width"]["doc_util"], 0.05 * run["mean"]["doc_util"])
+        self.assertEqual(run["results"], run_replications(EmergencySimulator, run["replications"], hours=20,
+                                                          master_seed=3, workers=1),
+                         "Replications differ from run_replications with the same seed.")
+
+    def test_stops_at_cap(self):
+        run = run_until_precise(EmergencySimulator, hours=5, absolute={"doc_util": 1e-9}, batch_size=4,
+                                min_replications=4, max_replications=10, workers=1)
+        self.assertFalse(run["converged"], "An unreachable target was reported as reached.")
+        self.assertEqual(run["replications"], 10, "The cap was not respected.")
+
+    def test_needs_a_target(self):
+        with self.assertRaises(ValueError):
+            run_until_precise(EmergencySimulator, hours=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import tempfile
+import time
+
+# Bump to invalidate every cached result, e.g. when the result format changes
+CACHE_FORMAT_VERSION = 1
+
+# Modules whose code decides the results of a replication. A change to any of them changes the
+# engine version, so results of older code are never read back.
+ENGINE_MODULES = ("main", "task4_and_5", "variates", "emergency_queue", "streaming_stats", "districts", "call_log")
+
+_engine_version = None
+
+
+def engine_version():
+    """Hash of the cache format and the source of the ENGINE_MODULES."""
+    global _engine_version
+    if _engine_version is None:
+        digest = hashlib.sha256(str(CACHE_FORMAT_VERSION).encode())
+        for name in ENGINE_MODULES:
+            with open(importlib.import_module(name).__file__, "rb") as file:
+                digest.update(file.read())
+        _engine_version = digest.hexdigest()
+    return _engine_version
+
+
+class ResultCache:
+    """
+    On-disk cache of replication results, content-addressed by the hash of the simulator class and
+    arguments, seed, horizon and engine version. Every result is its own file, written atomically,
+    so an interrupted sweep keeps every replication that finished.
+
+    Entries older than `max_age` seconds are evicted, and beyond `max_bytes` the least recently used ones.
+    """
+
+    def __init__(self, path, max_bytes=None, max_age=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @staticmethod
+    def key(simulator_class, simulator_kwargs, seed, hours):
+        description = {
+            "simulator": f"{simulator_class.__module__}.{simulator_class.__qualname__}",
+            "kwargs": simulator_kwargs,
+            "seed": seed,
+            "hours": hours,
+            "engine": engine_version(),
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + ".pkl")
+
+    def get(self, key):
+        """The cached result, or None."""
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                result = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        # Reading counts as a use for the eviction by size
+        os.utime(path)
+        return result
+
+    def put(self, key, result):
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written next to the entry and renamed, so a crash never leaves a half written entry behind
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as file:
+            pickle.dump(result, file)
+        os.replace(temporary, path)
+
+    def entries(self):
+        """(mtime, size, path) of every entry."""
+        found = []
+        for directory, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, stat.st_size, path))
+        return found
+
+    def evict(self):
+        """Removes the entries older than max_age, then the least recently used ones beyond max_bytes."""
+        if self.max_age is None and self.max_bytes is None:
+            return
+        entries = sorted(self.entries())
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            for mtime, _, path in entries:
+                if mtime < cutoff:
+                    os.remove(path)
+            entries = [entry for entry in entries if entry[0] >= cutoff]
+        if self.max_bytes is not None:
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                os.remove(path)
+                total -= size
+
+    def results(self, simulator_class, seeds, hours, **simulator_kwargs):
+        """
+        The cached results of the given seeds, in seed order, leaving out the seeds that are not cached.
+        Use replications.run_seeds with cache=... to get all of them, running the ones evicted again.
+        """
+        results = (self.get(self.key(simulator_class, simulator_kwargs, seed, hours)) for seed in seeds)
+        return [result for result in results if result is not None]
+
+    def __len__(self):
+        return len(self.entries())
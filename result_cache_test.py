@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+import unittest
+from main import EmergencySimulator
+from replications import replication_seeds, run_replications
+from result_cache import ResultCache
+
+
+class CountingSimulator(EmergencySimulator):
+    runs = 0
+
+    def simulate(self, total_time_hours=1):
+        CountingSimulator.runs += 1
+        return super().simulate(total_time_hours)
+
+
+class ResultCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(self.directory.name)
+        CountingSimulator.runs = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_keys(self):
+        key = ResultCache.key(EmergencySimulator, {"trace": "off"}, 1, 10)
+        self.assertEqual(key, ResultCache.key(EmergencySimulator, {"trace": "off"}, 1, 10), "Keys are not stable.")
+        for other in [ResultCache.key(EmergencySimulator, {"trace": "events"}, 1, 10),
+                      ResultCache.key(EmergencySimulator, {"trace": "off"}, 2, 10),
+                      ResultCache.key(EmergencySimulator, {"trace": "off"}, 1, 11),
+                      ResultCache.key(CountingSimulator, {"trace": "off"}, 1, 10)]:
+            self.assertNotEqual(key, other, "Different runs share a key.")
+
+    def test_cached_replications_are_not_rerun(self):
+        first = run_replications(CountingSimulator, 4, hours=5, workers=1, cache=self.cache)
+        self.assertEqual(CountingSimulator.runs, 4)
+        second = run_replications(CountingSimulator, 6, hours=5, workers=1, cache=self.cache)
+        self.assertEqual(CountingSimulator.runs, 6, "Only the two new replications should have run.")
+        self.assertEqual(second[:4], first, "Cached results differ from the computed ones.")
+        self.assertEqual(second, run_replications(EmergencySimulator, 6, hours=5, workers=1)[:6])
+
+    def test_interrupted_run_keeps_finished_replications(self):
+        class FailingSimulator(CountingSimulator):
+            def simulate(self, total_time_hours=1):
+                if CountingSimulator.runs == 3:
+                    raise RuntimeError("crash")
+                return super().simulate(total_time_hours)
+
+        with self.assertRaises(RuntimeError):
+            run_replications(FailingSimulator, 5, hours=5, workers=1, cache=self.cache)
+        self.assertEqual(len(self.cache), 3, "Finished replications were lost.")
+        seeds = replication_seeds(0, 5)
+        self.assertEqual(len(self.cache.results(FailingSimulator, seeds, 5)), 3)
+
+    def test_eviction_by_size_and_age(self):
+        for seed in range(5):
+            self.cache.put(ResultCache.key(EmergencySimulator, {}, seed, 1), {"payload": "x" * 1000})
+        paths = sorted(entry[2] for entry in self.cache.entries())
+        old = time.time() - 3600
+        os.utime(paths[0], (old, old))
+
+        self.cache.max_age = 600
+        self.cache.evict()
+        self.assertEqual(len(self.cache), 4, "The old entry was not evicted.")
+
+        self.cache.max_bytes = 2 * os.path.getsize(paths[1])
+        self.cache.evict()
+        self.assertEqual(len(self.cache), 2, "The cache is still above its size limit.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import pickle
+import unittest
+from main import EmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator
+from replications import run_forks
+
+METRICS = ["doc_util", "doc_center", "avg_non_live_threatening_waiting_time_min", "waiting_times"]
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def test_restored_simulator_continues_exactly(self):
+        uninterrupted = EmergencySimulator(seed=1).simulate(200)
+        simulator = EmergencySimulator(seed=1)
+        simulator.simulate(50)
+        snapshot = simulator.snapshot()
+        self.assertIsInstance(snapshot, bytes)
+        restored = EmergencySimulator.restore(snapshot).simulate(200)
+        for key in METRICS:
+            self.assertEqual(uninterrupted[key], restored[key], f"{key} differs after restoring.")
+        # The original is not affected by the restored copy
+        self.assertEqual(simulator.simulate(200)["doc_util"], uninterrupted["doc_util"])
+
+    def test_extended_simulator_continues_exactly(self):
+        for engine in ["tick", "event"]:
+            uninterrupted = ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, strategy="nearest", seed=2)
+            uninterrupted_result = uninterrupted.simulate(20, engine=engine)
+            simulator = ExtendedEmergencySimulator(num_hqs=2, num_vehicles=3, strategy="nearest", seed=2)
+            simulator.simulate(7.5, engine=engine)
+            restored = EmergencySimulator.restore(simulator.snapshot())
+            self.assertIsInstance(restored, ExtendedEmergencySimulator)
+            self.assertEqual(restored.simulate(20, engine=engine), uninterrupted_result,
+                             f"Restored {engine} engine diverged.")
+
+    def test_snapshot_with_profiler_and_trace(self):
+        simulator = EmergencySimulator(seed=3, trace="events", profile=True)
+        simulator.simulate(10)
+        restored = EmergencySimulator.restore(simulator.snapshot())
+        self.assertIsNone(restored.trace)
+        self.assertIsNone(restored.profiler)
+        self.assertFalse([name for name, value in vars(restored.variates).items() if callable(value)])
+        self.assertEqual(restored.simulate(30)["doc_util"], simulator.simulate(30)["doc_util"])
+
+    def test_fork_with_different_policies(self):
+        warm = ExtendedEmergencySimulator(num_hqs=2, num_vehicles=2, strategy="fifo", seed=4)
+        warm.simulate(10)
+        forks = warm.fork([{"strategy": strategy} for strategy in ["fifo", "nearest", "high_priority_first"]])
+        self.assertEqual([fork.strategy for fork in forks], ["fifo", "nearest", "high_priority_first"])
+        self.assertEqual(forks[0].simulate(30), warm.simulate(30), "The unchanged fork diverged.")
+        with self.assertRaises(ValueError):
+            warm.fork([{"strategy": "random"}])
+        with self.assertRaises(ValueError):
+            warm.fork([{"num_vehicles": 5}])
+        with self.assertRaises(ValueError):
+            EmergencySimulator(seed=1).fork([{"speed": 2}])
+
+    def test_reseeded_forks_differ(self):
+        warm = EmergencySimulator(seed=5)
+        warm.simulate(20)
+        first, second = warm.fork([{"seed": 10}, {"seed": 11}])
+        self.assertEqual(first.total_time_passed, warm.total_time_passed)
+        self.assertNotEqual(first.simulate(100)["doc_util"], second.simulate(100)["doc_util"])
+
+    def test_forks_in_worker_processes(self):
+        warm = ExtendedEmergencySimulator(num_hqs=2, num_vehicles=2, seed=6)
+        warm.simulate(5)
+        snapshot = warm.snapshot()
+        variants = [{"strategy": "nearest"}, {"strategy": "fifo", "seed": 3}]
+        self.assertEqual(run_forks(snapshot, variants, 15, workers=2), run_forks(snapshot, variants, 15, workers=1))
+        self.assertLess(len(snapshot), len(pickle.dumps(warm.variates)), "Snapshot is not compressed.")
+
+
+if __name__ == "__main__":
+    unittest.main()
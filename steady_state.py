@@ -0,0 +1,115 @@
+import numpy as np
+
+from replications import confidence_half_width
+
+# Observations per batch of MSER-5
+MSER_BATCH = 5
+
+STEADY_STATE_METRICS = ("doc_util", "doc_center", "avg_non_live_threatening_waiting_time_min")
+
+
+class IntervalRecorder:
+    """
+    Records the accumulators of an EmergencySimulator at the end of every `interval` simulated seconds,
+    so the run can be split into per-interval observations afterwards.
+    """
+
+    def __init__(self, interval=3600):
+        self.interval = interval
+        self.next_boundary = 0
+        self.rows = []
+
+    def observe(self, simulator):
+        """Called whenever the simulation passed next_boundary."""
+        waits = simulator.waiting_times_non_life_threatening.stats
+        self.rows.append((
+            simulator.total_time_passed,
+            simulator.total_time_doctor_used,
+            simulator.total_time_doctor_center,
+            waits.count,
+            waits.mean * waits.count,
+        ))
+        # A long step can cross several boundaries, it then closes one longer interval
+        self.next_boundary = (simulator.total_time_passed // self.interval + 1) * self.interval
+
+    def intervals(self):
+        """Per-interval duration, doctor time used and at the center, and count and sum of waits."""
+        rows = np.array(self.rows, dtype=np.float64).reshape(-1, 5)
+        duration, used, center, wait_count, wait_sum = np.diff(rows, axis=0).T
+        return {"duration": duration, "used": used, "center": center,
+                "wait_count": wait_count, "wait_sum": wait_sum}
+
+
+def batch_ratios(intervals, batch_size):
+    """The metrics over consecutive batches of `batch_size` intervals, dropping the incomplete batch at the end."""
+    num_batches = len(intervals["duration"]) // batch_size
+
+    def sums(name):
+        return intervals[name][:num_batches * batch_size].reshape(num_batches, batch_size).sum(axis=1)
+
+    duration, wait_count = sums("duration"), sums("wait_count")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "doc_util": sums("used") / duration,
+            "doc_center": sums("center") / duration,
+            "avg_non_live_threatening_waiting_time_min": sums("wait_sum") / wait_count / 60,
+        }
+
+
+def mser_truncation(series):
+    """
+    MSER: the number of leading observations d (at most half of them) that minimises
+    sum((y[d:] - mean(y[d:]))**2) / (n - d)**2, i.e. the standard error of the truncated mean.
+    """
+    series = np.asarray(series, dtype=np.float64)
+    series = series[np.isfinite(series)]
+    n = len(series)
+    if n < 2:
+        return 0
+    # Sums over every suffix y[d:], computed once from the end
+    suffix_sum = np.cumsum(series[::-1])[::-1]
+    suffix_squares = np.cumsum((series ** 2)[::-1])[::-1]
+    remaining = n - np.arange(n)
+    squared_deviations = suffix_squares - suffix_sum ** 2 / remaining
+    candidates = n // 2 + 1
+    return int(np.argmin(squared_deviations[:candidates] / remaining[:candidates] ** 2))
+
+
+def analyze(recorder, confidence=0.95, num_batches=20):
+    """
+    Steady-state estimates from one long run: MSER-5 picks the warm-up, which is dropped, and the
+    rest is cut into `num_batches` batches whose means give t confidence intervals.
+    Raises a ValueError if the run is too short for MSER-5 to compare two batches, or if fewer than
+    `num_batches` intervals are left after the warm-up.
+    """
+    intervals = recorder.intervals()
+    num_intervals = len(intervals["duration"])
+    if num_intervals < 2 * MSER_BATCH:
+        raise ValueError(f"The run has {num_intervals} intervals of {recorder.interval} s, "
+                         f"MSER-5 needs at least {2 * MSER_BATCH}")
+    # MSER-5 looks at means of 5 intervals, the warm-up is the longest one of all metrics. The intervals
+    # that do not fill a batch are at the end, so they are kept rather than counted as warm-up.
+    mser_batches = batch_ratios(intervals, MSER_BATCH)
+    warmup = MSER_BATCH * max(mser_truncation(values) for values in mser_batches.values())
+    kept = {name: values[warmup:] for name, values in intervals.items()}
+    if len(kept["duration"]) < num_batches:
+        raise ValueError(f"{len(kept['duration'])} intervals are left after a warm-up of {warmup}, "
+                         f"fewer than the {num_batches} batches")
+
+    batches = batch_ratios(kept, len(kept["duration"]) // num_batches)
+    duration = kept["duration"].sum()
+    wait_count = kept["wait_count"].sum()
+    means = {
+        "doc_util": kept["used"].sum() / duration,
+        "doc_center": kept["center"].sum() / duration,
+        "avg_non_live_threatening_waiting_time_min": kept["wait_sum"].sum() / wait_count / 60 if wait_count else 0,
+    }
+    summary = {
+        "warmup_hours": float(intervals["duration"][:warmup].sum() / 3600),
+        "hours_used": float(duration / 3600),
+        "num_batches": num_batches,
+    }
+    for name in STEADY_STATE_METRICS:
+        values = batches[name][np.isfinite(batches[name])]
+        summary[name] = {"mean": float(means[name]), "half_width": confidence_half_width(values, confidence)}
+    return summary
@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+from main import EmergencySimulator, Emergency
+from steady_state import IntervalRecorder, analyze, mser_truncation, STEADY_STATE_METRICS
+
+
+class SteadyStateTests(unittest.TestCase):
+
+    def test_mser_finds_initial_transient(self):
+        rng = np.random.default_rng(0)
+        series = rng.normal(10, 1, 200)
+        series[:30] += np.linspace(20, 0, 30)
+        truncation = mser_truncation(series)
+        self.assertGreaterEqual(truncation, 15, "The transient was not removed.")
+        self.assertLessEqual(truncation, 40, "Too much of the steady state was removed.")
+        self.assertLess(mser_truncation(rng.normal(10, 1, 200)), 20, "A stationary series was truncated.")
+
+    def test_intervals_add_up_to_the_run(self):
+        simulator = EmergencySimulator(seed=1)
+        simulator.simulate(50, steady_state=True)
+        intervals = simulator.intervals.intervals()
+        self.assertEqual(len(intervals["duration"]) + 1, len(simulator.intervals.rows))
+        self.assertEqual(intervals["used"].sum(), simulator.intervals.rows[-1][1])
+        self.assertEqual(intervals["wait_count"].sum(), simulator.intervals.rows[-1][3])
+
+    def test_steady_state_mode(self):
+        result = EmergencySimulator(seed=2).simulate(3000, steady_state=True)
+        steady_state = result["steady_state"]
+        self.assertEqual(result["doc_util"], steady_state["doc_util"]["mean"])
+        for name in ["doc_util", "doc_center", "avg_non_live_threatening_waiting_time_min"]:
+            self.assertGreater(steady_state[name]["half_width"], 0)
+            self.assertLess(steady_state[name]["half_width"], 0.5 * steady_state[name]["mean"])
+        self.assertIsNone(EmergencySimulator(seed=2).simulate(10)["steady_state"], "Off by default.")
+
+    def test_warmup_of_overloaded_start_is_dropped(self):
+        simulator = EmergencySimulator(seed=3)
+        for _ in range(60):
+            simulator.non_life_threatening_emergencies.append(Emergency(district=9, start_time=0, prio=0))
+        result = simulator.simulate(2000, steady_state=True)
+        self.assertGreater(result["steady_state"]["warmup_hours"], 5, "The backlog at the start was not dropped.")
+        plain = EmergencySimulator(seed=3)
+        for _ in range(60):
+            plain.non_life_threatening_emergencies.append(Emergency(district=9, start_time=0, prio=0))
+        self.assertLess(result["doc_util"], plain.simulate(2000)["doc_util"], "Warm-up still biases doc_util.")
+
+    def test_too_short_run(self):
+        recorder = IntervalRecorder()
+        simulator = EmergencySimulator(seed=4)
+        recorder.observe(simulator)
+        with self.assertRaises(ValueError):
+            analyze(recorder)
+
+    def test_short_horizons_keep_the_plain_metrics(self):
+        for hours in [0.5, 3, 7, 15]:
+            plain = EmergencySimulator(seed=5).simulate(hours)
+            result = EmergencySimulator(seed=5).simulate(hours, steady_state=True)
+            self.assertIsNone(result["steady_state"], f"{hours} hours were analysed.")
+            self.assertIsInstance(result["steady_state_reason"], str)
+            for name in STEADY_STATE_METRICS:
+                self.assertEqual(result[name], plain[name], f"{name} of {hours} hours was overwritten.")
+        result = EmergencySimulator(seed=5).simulate(100, steady_state=True)
+        self.assertIsNone(result["steady_state_reason"])
+        self.assertEqual(result["steady_state"]["num_batches"], 20)
+
+    def test_leftover_intervals_are_not_warmup(self):
+        recorder = IntervalRecorder()
+        # 24 identical hours, 4 more than fill the MSER-5 batches
+        recorder.rows = [(3600 * i, 1800 * i, 1800 * i, i, 600 * i) for i in range(25)]
+        summary = analyze(recorder)
+        self.assertEqual(summary["warmup_hours"], 0)
+        self.assertEqual(summary["hours_used"], 24)
+        self.assertEqual(summary["doc_util"], {"mean": 0.5, "half_width": 0.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import copy
+import math
+
+
+class RunningStats:
+    """Count, mean and variance of a stream of values (Welford), mergeable with the update of Chan et al."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self):
+        """Sample variance, NaN for fewer than two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def __eq__(self, other):
+        return isinstance(other, RunningStats) and vars(self) == vars(other)
+
+
+class QuantileSketch:
+    """
+    Quantiles of a stream of non-negative values with a bounded relative error (DDSketch).
+    Values are counted in logarithmic bins, so the memory only grows with the log of the value range,
+    and two sketches with the same accuracy merge exactly by adding their counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q):
+        """The q-quantile, within relative_accuracy of the exact one. NaN if nothing was added."""
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def __eq__(self, other):
+        return isinstance(other, QuantileSketch) and vars(self) == vars(other)
+
+
+class WaitingTimeStats:
+    """Mean, variance and quantiles of waiting times in seconds, in constant memory."""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, wait):
+        self.stats.add(wait)
+        self.sketch.add(wait)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+
+    def summary(self):
+        """Count, mean, standard deviation and p50/p90/p99 in minutes."""
+        return {
+            "count": self.stats.count,
+            "mean": self.stats.mean / 60 if self.stats.count else math.nan,
+            "std": self.stats.std / 60 if self.stats.count > 1 else math.nan,
+            "p50": self.sketch.quantile(0.5) / 60,
+            "p90": self.sketch.quantile(0.9) / 60,
+            "p99": self.sketch.quantile(0.99) / 60,
+        }
+
+    def __len__(self):
+        return self.stats.count
+
+    def __eq__(self, other):
+        return isinstance(other, WaitingTimeStats) and vars(self) == vars(other)
+
+
+class TimeWeightedAverage:
+    """Average of a piecewise constant quantity, e.g. a queue length, over the time it was observed."""
+
+    def __init__(self):
+        self.area = 0.0
+        self.duration = 0.0
+
+    def add(self, value, duration):
+        """`value` held for `duration` seconds."""
+        self.area += value * duration
+        self.duration += duration
+
+    def merge(self, other):
+        self.area += other.area
+        self.duration += other.duration
+
+    @property
+    def average(self):
+        return self.area / self.duration if self.duration else math.nan
+
+    def __eq__(self, other):
+        return isinstance(other, TimeWeightedAverage) and vars(self) == vars(other)
+
+
+def merge_all(stats):
+    """Merges the stats of parallel replications, e.g. [result["waiting_times"]["life_threatening"], ...]."""
+    stats = list(stats)
+    merged = copy.deepcopy(stats[0])
+    for other in stats[1:]:
+        merged.merge(other)
+    return merged
@@ -0,0 +1,77 @@
+import math
+import unittest
+import numpy as np
+from main import EmergencySimulator
+from streaming_stats import QuantileSketch, RunningStats, TimeWeightedAverage, WaitingTimeStats, merge_all
+
+
+class StreamingStatsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.random.default_rng(0).exponential(600, 5000).round()
+
+    def test_running_stats(self):
+        stats = RunningStats()
+        for value in self.values:
+            stats.add(value)
+        self.assertEqual(stats.count, len(self.values))
+        self.assertAlmostEqual(stats.mean, np.mean(self.values), places=6)
+        self.assertAlmostEqual(stats.variance, np.var(self.values, ddof=1), delta=1e-6 * stats.variance)
+
+    def test_merged_running_stats_match_single_stream(self):
+        parts = []
+        for chunk in np.array_split(self.values, 7):
+            stats = RunningStats()
+            for value in chunk:
+                stats.add(value)
+            parts.append(stats)
+        merged = merge_all(parts)
+        self.assertEqual(merged.count, len(self.values))
+        self.assertAlmostEqual(merged.mean, np.mean(self.values), places=6)
+        self.assertAlmostEqual(merged.variance, np.var(self.values, ddof=1), delta=1e-6 * merged.variance)
+
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in self.values:
+            sketch.add(value)
+        for q in [0.5, 0.9, 0.99]:
+            exact = np.quantile(self.values, q, method="lower")
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), 0.01 * exact + 1e-9, f"p{q * 100:g} is off.")
+        self.assertTrue(math.isnan(QuantileSketch().quantile(0.5)), "Empty sketch should have no quantiles.")
+
+    def test_sketches_merge_exactly(self):
+        whole = QuantileSketch()
+        parts = [QuantileSketch() for _ in range(3)]
+        for i, value in enumerate(self.values):
+            whole.add(value)
+            parts[i % 3].add(value)
+        self.assertEqual(merge_all(parts), whole, "Merged sketch differs from the sketch of all values.")
+
+    def test_time_weighted_average(self):
+        queue = TimeWeightedAverage()
+        queue.add(0, 30)
+        queue.add(3, 10)
+        self.assertEqual(queue.average, 30 / 40)
+
+    def test_simulator_records_both_priorities(self):
+        result = EmergencySimulator(seed=2).simulate(200)
+        waits = result["waiting_times"]
+        self.assertGreater(len(waits["life_threatening"]), 0, "No life-threatening waits recorded.")
+        self.assertAlmostEqual(result["avg_non_live_threatening_waiting_time_min"],
+                               waits["non_life_threatening"].summary()["mean"])
+        summary = waits["life_threatening"].summary()
+        self.assertLessEqual(summary["p50"], summary["p90"])
+        self.assertLessEqual(summary["p90"], summary["p99"])
+        self.assertGreaterEqual(result["avg_queue_length"], 0)
+
+    def test_memory_does_not_grow_with_run_length(self):
+        simulator = EmergencySimulator(seed=3)
+        simulator.simulate(2000)
+        waits = simulator.waiting_times_non_life_threatening
+        self.assertIsInstance(waits, WaitingTimeStats)
+        # One bin per 2% of value range: waits between 1 second and a year fit in under 900 bins
+        self.assertLess(len(waits.sketch.bins), math.log(365 * 24 * 3600) / waits.sketch.log_gamma)
+        self.assertLess(len(waits.sketch.bins), len(waits) / 4, "The sketch grows like the number of waits.")
+
+if __name__ == "__main__":
+    unittest.main()
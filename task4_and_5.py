@@ -1,109 +1,324 @@
+import heapq
+import math
 import random
+import numpy as np
 from main import EmergencySimulator, Emergency
-from collections import deque
+from events import Event, ARRIVAL, DISPATCH, CARE_DONE, RETURN_TO_HQ
+from emergency_queue import IndexedEmergencyQueue
+
+STRATEGIES = ("fifo", "nearest", "high_priority_first")
 
 class ExtendedEmergencySimulator(EmergencySimulator):
-    def __init__(self, num_hqs=1, num_vehicles=1, strategy="fifo", seed=123):
-        super().__init__(seed=seed) 
-        self.num_hqs = num_hqs
+    def __init__(self, num_hqs=1, num_vehicles=1, strategy="fifo", seed=123, profile=False, districts=None, hqs=None,
+                 priority_weight=0, waiting_weight=0, call_log=None):
+        """
+        `hqs` are the districts of the HQs, by default the first `num_hqs` districts.
+        The nearest strategy scores every waiting emergency with its expected travel time in seconds, minus
+        `priority_weight` seconds if it is life-threatening and minus `waiting_weight` times the seconds it has
+        waited, and picks the lowest score.
+        `call_log` replays recorded calls instead of synthetic arrivals, see call_log.CallLog.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        if num_vehicles < 1:
+            raise ValueError(f"At least one vehicle is needed, got {num_vehicles}")
+        super().__init__(seed=seed, profile=profile, districts=districts, call_log=call_log)
+        # Only used to pick which of the idle vehicles is dispatched
+        self.rng = random.Random(seed)
+        self.hqs = self.check_hqs(hqs if hqs is not None else list(range(num_hqs)))
+        self.num_hqs = len(self.hqs)
         self.num_vehicles = num_vehicles
         self.strategy = strategy
-        self.hqs = list(range(num_hqs))  
+        self.priority_weight = priority_weight
+        self.waiting_weight = waiting_weight
 
-        # Initialize emergency queues for each vehicle
-        self.emergency_queues = [deque() for _ in range(self.num_vehicles)]
+        # Waiting emergencies of all vehicles, each one assigned to the queue of one vehicle
+        self.emergency_queue = IndexedEmergencyQueue(self.num_vehicles)
 
-        # Initialize doctor/vehicle statuses
-        self.doctor_status = [{"current_location": self.hqs[i % len(self.hqs)], "busy": False, "time_remaining": 0}
-                              for i in range(self.num_vehicles)]
+        # Fleet state, one entry per vehicle. Instead of a remaining time that would have to be counted
+        # down for every vehicle on every second, a busy vehicle keeps the second its job is done on.
+        self.location = np.array([self.hqs[i % len(self.hqs)] for i in range(num_vehicles)], dtype=np.int64)
+        self.busy = np.zeros(num_vehicles, dtype=bool)
+        self.free_at = np.zeros(num_vehicles, dtype=np.int64)
+        self.job = np.full(num_vehicles, -1, dtype=np.int64)  # Handle of the emergency being served, -1 if idle
+        self.serving = [None] * num_vehicles  # The emergency being served, it has left the queue with its handle
+        # Idle vehicles in no particular order, with the position of every idle vehicle in it for O(1) removal
+        self.idle = list(range(num_vehicles))
+        self.idle_position = list(range(num_vehicles))
+        # (free_at, vehicle) of every busy vehicle, the next completion is always on top
+        self.completions = []
 
         self.travel_time_sum = 0
         self.travel_count = 0
 
+    @property
+    def doctor_status(self):
+        """The state of every vehicle as a dict, time_remaining counts from the current second."""
+        return [{"current_location": int(location), "busy": bool(busy),
+                 "time_remaining": int(free_at) - self.total_time_passed if busy else 0}
+                for location, busy, free_at in zip(self.location, self.busy, self.free_at)]
+
     def generate_emergency(self):
         """Generate a new emergency and add it to a queue."""
         if self.time_to_next_emergency <= 0:
             self.time_to_next_emergency = self.get_time_to_next_event()
-            district = random.choices(range(10), weights=self.populations)[0]
+            district = self.variates.district()
             # 0 is for non-life-threatening and 1 for life-threatening
-            prio = random.choices([0, 1], weights=[3, 1])[0]  
-            emergency = Emergency(district=district, start_time=self.total_time_passed, prio=prio)
+            prio = int(self.variates.life_threatening())
+            emergency = Emergency(district=district, start_time=self.total_time_passed, prio=prio,
+                                  care_time=self.variates.recorded_care_time())
+            if self.event_sink is not None:
+                self.event_sink.append(Event(ARRIVAL, self.total_time_passed, district, prio, emergency.start_time))
 
             # Assign emergency to a random queue
-            chosen_queue = random.randint(0, self.num_vehicles - 1)
-            self.emergency_queues[chosen_queue].append(emergency)
+            chosen_queue = self.variates.randint("queue", 0, self.num_vehicles - 1)
+            self.emergency_queue.push(emergency, chosen_queue)
 
-    def assign_doctor(self, doctor_idx):
-        """Assigns the doctor to an emergency."""
+    def assign_doctor(self, vehicle):
+        """Assigns an idle vehicle to an emergency."""
         # Doctors should be able to pick from any queue, not just their own
-        available_emergencies = [em for queue in self.emergency_queues for em in queue]
-        if not available_emergencies:
+        if not self.emergency_queue:
             return 
 
         # Select emergency based on strategy
-        doctor = self.doctor_status[doctor_idx]
+        location = int(self.location[vehicle])
 
         if self.strategy == "fifo":
-            emergency = available_emergencies.pop(0)  
+            handle = self.emergency_queue.oldest()
+        elif self.strategy == "high_priority_first":
+            handle = self.emergency_queue.oldest(prio=1)
+            if handle is None:
+                handle = self.emergency_queue.oldest()
         elif self.strategy == "nearest":
-            emergency = min(available_emergencies,
-                            key=lambda em: self.get_travel_time(doctor["current_location"], em.district))
+            handle = self.nearest(location)
 
         # Remove the assigned emergency from its respective queue
-        for queue in self.emergency_queues:
-            if emergency in queue:
-                queue.remove(emergency)
-                break
+        emergency = self.emergency_queue.remove(handle)
+        if emergency.prio == 1:
+            self.waiting_times_life_threatening.add(self.total_time_passed - emergency.start_time)
+        else:
+            self.waiting_times_non_life_threatening.add(self.total_time_passed - emergency.start_time)
 
-        # Update doctor's status
-        travel_time = self.get_travel_time(doctor["current_location"], emergency.district)
+        # Update the vehicle's status
+        travel_time = self.get_travel_time(location, emergency.district)
         care_time = self.get_em_care_time(emergency)  
 
-        doctor["busy"] = True
-        doctor["time_remaining"] = travel_time + care_time
+        self.remove_idle(vehicle)
+        free_at = self.total_time_passed + travel_time + care_time
+        self.busy[vehicle] = True
+        self.free_at[vehicle] = free_at
+        self.job[vehicle] = handle
+        self.serving[vehicle] = emergency
+        heapq.heappush(self.completions, (free_at, vehicle))
         self.travel_time_sum += travel_time
         self.travel_count += 1
-        doctor["current_location"] = emergency.district
-
-    def update_doctors(self, time_step):
-        """Update the status of all doctors and manage their tasks."""
-        random.shuffle(self.doctor_status)  
-        for doctor in self.doctor_status:
-            if doctor["busy"]:
-                doctor["time_remaining"] -= time_step
-                if doctor["time_remaining"] <= 0:
-                    doctor["busy"] = False  
-                    
-                    # If no emergencies exist, send the doctor back to the nearest HQ
-                    available_emergencies = any(len(queue) > 0 for queue in self.emergency_queues)
-                    if not available_emergencies:
-                        nearest_hq = min(self.hqs, key=lambda hq: self.get_travel_time(doctor["current_location"], hq))
-                        doctor["current_location"] = nearest_hq
-
-    def simulate(self, total_time_hours=10):
-        max_time = total_time_hours * 3600  
+        self.location[vehicle] = emergency.district
+        if self.event_sink is not None:
+            self.event_sink.append(Event(DISPATCH, self.total_time_passed, emergency.district, emergency.prio,
+                                         emergency.start_time, vehicle))
+
+    def remove_idle(self, vehicle):
+        """Takes a vehicle out of the idle vehicles by moving the last idle vehicle into its place."""
+        position = self.idle_position[vehicle]
+        last = self.idle.pop()
+        if last != vehicle:
+            self.idle[position] = last
+            self.idle_position[last] = position
+
+    def nearest(self, location):
+        """
+        Handle of the emergency with the lowest score from `location`, scored on expected travel times so
+        that no random variates are drawn. Within a (district, prio) the oldest emergency scores lowest, so
+        only those are compared and the cost does not grow with the queue. Ties go to the oldest emergency.
+        """
+        heads = self.emergency_queue.bucket_heads()
+        emergencies = [self.emergency_queue[handle] for handle in heads]
+        districts = np.fromiter((emergency.district for emergency in emergencies), np.int64, len(heads))
+        scores = self.districts.travel_seconds[location, districts]
+        if self.priority_weight:
+            scores = scores - self.priority_weight * np.fromiter((emergency.prio for emergency in emergencies),
+                                                                 np.float64, len(heads))
+        if self.waiting_weight:
+            start_times = np.fromiter((emergency.start_time for emergency in emergencies), np.float64, len(heads))
+            scores = scores - self.waiting_weight * (self.total_time_passed - start_times)
+        return heads[int(np.argmin(scores))]
+
+    def complete_jobs(self):
+        """Frees the vehicles whose job is done by the current second, in the order they got done."""
+        while self.completions and self.completions[0][0] <= self.total_time_passed:
+            _, vehicle = heapq.heappop(self.completions)
+            self.busy[vehicle] = False
+            self.job[vehicle] = -1
+            emergency = self.serving[vehicle]
+            self.serving[vehicle] = None
+            self.idle_position[vehicle] = len(self.idle)
+            self.idle.append(vehicle)
+            if self.event_sink is not None:
+                self.event_sink.append(Event(CARE_DONE, self.total_time_passed, emergency.district, emergency.prio,
+                                             emergency.start_time, vehicle))
+
+            # If no emergencies exist, send the doctor back to the nearest HQ
+            if not self.emergency_queue:
+                location = int(self.location[vehicle])
+                self.location[vehicle] = min(self.hqs, key=lambda hq: self.get_travel_time(location, hq))
+                if self.event_sink is not None:
+                    self.event_sink.append(Event(RETURN_TO_HQ, self.total_time_passed, int(self.location[vehicle]),
+                                                 vehicle=vehicle))
+
+    def run_tick(self):
+        """
+        Process the current second: a new emergency, the vehicles that got done and the dispatches.
+        Only looks at the vehicles that change, so its cost does not grow with the fleet.
+        """
+        if self.time_to_next_emergency <= 0:
+            self.generate_emergency()
+        self.complete_jobs()
+
+        # Every emergency that can be served is, by an idle vehicle picked at random
+        while self.emergency_queue and self.idle:
+            self.assign_doctor(self.idle[self.rng.randrange(len(self.idle))])
+
+    def simulate_ticks(self, max_time):
+        """Reference engine: advances the model one second at a time."""
+        while self.total_time_passed < max_time:
+            self.tick_step()
+
+    def tick_step(self, max_time=None):
+        """One second of simulate_ticks."""
+        self.run_tick()
+        self.queue_length.add(len(self.emergency_queue), 1)
+
+        # Advance time
+        self.time_to_next_emergency -= 1
+        self.total_time_passed += 1
+
+    def simulate_events(self, max_time):
+        """
+        Next-event engine: only processes the seconds on which an emergency arrives or a vehicle
+        completes a job, and skips over everything in between.
+        Produces exactly the same state as simulate_ticks for the same seed.
+        """
         while self.total_time_passed < max_time:
-            if self.time_to_next_emergency <= 0:
-                self.generate_emergency()
+            self.event_step(max_time)
+
+    def event_step(self, max_time):
+        """One event of simulate_events and the seconds until the next one, at most until max_time."""
+        self.run_tick()
+        self.time_to_next_emergency -= 1
+        self.total_time_passed += 1
+
+        # Skip the seconds in which nothing happens
+        next_event = self.total_time_passed + max(self.time_to_next_emergency, 0)
+        if self.completions:
+            next_event = min(next_event, self.completions[0][0])
+        skipped = max(min(next_event, math.ceil(max_time)) - self.total_time_passed, 0)
+        self.time_to_next_emergency -= skipped
+        self.total_time_passed += skipped
+        self.queue_length.add(len(self.emergency_queue), skipped + 1)
+
+    def configure(self, **overrides):
+        if "strategy" in overrides and overrides["strategy"] not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {overrides['strategy']}")
+        if "num_vehicles" in overrides:
+            raise ValueError("The number of vehicles of a running simulation cannot be changed")
+        # Doctors keep their position, they only return to the new HQs once they are free
+        if "hqs" in overrides or "num_hqs" in overrides:
+            overrides["hqs"] = self.check_hqs(overrides["hqs"] if "hqs" in overrides
+                                              else list(range(overrides["num_hqs"])))
+            overrides["num_hqs"] = len(overrides["hqs"])
+        super().configure(**overrides)
 
-            self.update_doctors(1)
+    def check_hqs(self, hqs):
+        hqs = [int(hq) for hq in hqs]
+        if not hqs or len(set(hqs)) != len(hqs) or not all(0 <= hq < len(self.districts) for hq in hqs):
+            raise ValueError(f"Invalid HQ districts: {hqs}")
+        return hqs
 
-            # Assign doctors to emergencies
-            for i, doctor in enumerate(self.doctor_status):
-                if not doctor["busy"]:
-                    self.assign_doctor(i)
+    def reseed(self, seed):
+        super().reseed(seed)
+        self.rng = random.Random(seed)
 
-            # Advance time
-            self.time_to_next_emergency -= 1
-            self.total_time_passed += 1
+    def simulate(self, total_time_hours=10, engine="event"):
+        max_time = total_time_hours * 3600  
+        if self.profiler is not None:
+            self.profiler.attach(self)
+        if engine == "event":
+            self.simulate_events(max_time)
+        elif engine == "tick":
+            self.simulate_ticks(max_time)
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+        return self.summary()
+
+    def simulate_iter(self, total_time_hours=10, engine="event"):
+        """
+        Runs the simulation like simulate and yields an events.Event for everything that happens, as it
+        happens. Vehicles go straight from the dispatch to the end of the care, so there are no ON_SCENE
+        events, and a dispatch is never preempted. Closing the generator stops the simulation at the current
+        step; when it runs to the end, the metrics of simulate are the value of StopIteration, with the
+        report of the profiler if there is one.
+
+        :param total_time_hours: Simulated hours.
+        :param engine: "event" or "tick", which yield the same events.
+        """
+        max_time = total_time_hours * 3600
+        if self.profiler is not None:
+            self.profiler.attach(self)
+        if engine == "event":
+            step = self.event_step
+        elif engine == "tick":
+            step = self.tick_step
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+        events = []
+        self.event_sink = events
+        try:
+            while self.total_time_passed < max_time:
+                step(max_time)
+                if events:
+                    yield from events
+                    events.clear()
+        finally:
+            self.event_sink = None
+        return self.summary()
 
+    def summary(self):
         # Calculate average travel time
         avg_travel_time = self.travel_time_sum / self.travel_count if self.travel_count > 0 else 0
         return {
             "avg_travel_time": avg_travel_time / 60,  
-            "emergency_queues": [len(queue) for queue in self.emergency_queues],
+            "emergency_queues": list(self.emergency_queue.queue_counts),
+            "profile": self.profiler.report() if self.profiler is not None else None,
+            "avg_queue_length": self.queue_length.average,
+            # Waits until a doctor is dispatched, mergeable across replications, see streaming_stats.merge_all
+            "waiting_times": {
+                "non_life_threatening": self.waiting_times_non_life_threatening,
+                "life_threatening": self.waiting_times_life_threatening,
+            },
         }
 
+def run_hq_sweep(hq_configs, strategies, num_vehicles, simulation_hours, max_simulations=1000, cache=None,
+                 master_seed=0, workers=None):
+    """
+    Replicates every combination of a number of HQs and a strategy until the mean travel time is known to
+    within 5 seconds. Every configuration uses the same seeds, so they are compared on the same emergencies.
+    Returns the number of replications run per configuration, as {num_hqs: {strategy: count}}.
+    """
+    from replications import run_until_precise
+
+    replications = {}
+    for num_hqs in hq_configs:
+        replications[num_hqs] = {}
+        for strategy in strategies:
+            print(f"Running simulation with {num_hqs} headquarters and strategy: {strategy}", end="\r")
+            run = run_until_precise(ExtendedEmergencySimulator, hours=simulation_hours,
+                                    absolute={"avg_travel_time": 5 / 60}, master_seed=master_seed,
+                                    max_replications=max_simulations, workers=workers, cache=cache,
+                                    num_hqs=num_hqs, num_vehicles=num_vehicles, strategy=strategy)
+            print(f"{num_hqs} headquarters, {strategy}: {run['replications']} simulations"
+                  f"{'' if run['converged'] else ' (target not reached)'}")
+            replications[num_hqs][strategy] = run["replications"]
+    return replications
 
 if __name__ == "__main__":
     # Number of headquarters
@@ -0,0 +1,295 @@
+import json
+import math
+import os
+import queue
+import threading
+
+import numpy as np
+
+# Recording modes
+TRACE_OFF = "off"
+TRACE_EVENTS = "events"
+TRACE_SAMPLED = "sampled"
+
+# Fixed columns of a trace, missing values are stored as -1 (or NaN for time_remaining)
+TRACE_COLUMNS = {
+    "total_time_passed": np.float64,
+    "current_dist": np.int32,
+    "currently_traveling": np.bool_,
+    "currently_giving_care": np.bool_,
+    "going_towards_hq_dist": np.bool_,
+    "target": np.int32,
+    "time_remaining": np.float64,
+    "time_to_next_emergency": np.float64,
+    "life_threatening_emergencies": np.int32,
+    "non_life_threatening_emergencies": np.int32,
+}
+
+# Layout of trace files: a directory with one raw binary file per column and a json header
+TRACE_FORMAT_VERSION = 1
+TRACE_HEADER = "trace.json"
+
+
+class TraceRecorder:
+    """
+    Records the state of an EmergencySimulator into preallocated column arrays.
+
+    Modes:
+        "off"      nothing is recorded
+        "events"   a row is recorded whenever the doctor or the queue lengths change
+        "sampled"  a row is recorded every `interval` simulated seconds
+    At most `max_rows` rows are kept in memory, further rows are counted in `dropped`.
+    With a `path` the rows are streamed to a trace file in chunks of `chunk_rows` instead,
+    without a limit on the number of rows. The file is finished when the columns are read or the recorder
+    is closed, also by leaving it as a context manager; a later run appends to it.
+    """
+
+    def __init__(self, mode=TRACE_OFF, interval=60, max_rows=1_000_000, path=None, chunk_rows=65536):
+        if mode not in (TRACE_OFF, TRACE_EVENTS, TRACE_SAMPLED):
+            raise ValueError(f"Unknown trace mode: {mode}")
+        if mode == TRACE_SAMPLED and interval <= 0:
+            raise ValueError("The sampling interval has to be positive")
+        self.mode = mode
+        self.interval = interval
+        self.max_rows = max_rows
+        self.size = 0
+        self.dropped = 0
+        self.next_sample_time = 0
+        self.last_state = None
+        self.data = {name: np.empty(0, dtype=dtype) for name, dtype in TRACE_COLUMNS.items()}
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.writer = None
+        if path is not None and mode != TRACE_OFF:
+            self.writer = TraceFileWriter(path)
+
+    def reserve(self, num_rows):
+        """Grow the column arrays to hold at least `num_rows` rows."""
+        num_rows = min(num_rows, self.max_rows)
+        if num_rows <= len(self.data["total_time_passed"]):
+            return
+        for name, column in self.data.items():
+            grown = np.empty(num_rows, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.data[name] = grown
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self, simulator, max_time):
+        """Preallocate for a run of `simulator` up to `max_time` seconds."""
+        if self.path is not None and self.writer is None and self.mode != TRACE_OFF:
+            # Continues a trace file finished by a previous run
+            self.writer = TraceFileWriter(self.path, append=True)
+        if self.writer is not None:
+            self.reserve(self.chunk_rows)
+        elif self.mode == TRACE_SAMPLED:
+            remaining = max(max_time - max(simulator.total_time_passed, self.next_sample_time), 0)
+            self.reserve(self.size + math.ceil(remaining / self.interval) + 1)
+        elif self.mode == TRACE_EVENTS:
+            self.reserve(self.size + 1024)
+
+    def record(self, simulator):
+        """Called by the simulator after every step, with the state held since the previous step."""
+        if self.mode == TRACE_EVENTS:
+            travel = simulator.travel
+            state = (
+                simulator.current_dist,
+                travel.state,
+                travel.target,
+                len(simulator.life_threatening_emergencies),
+                len(simulator.non_life_threatening_emergencies),
+            )
+            if state != self.last_state:
+                self.last_state = state
+                self.append(simulator, simulator.total_time_passed)
+        elif self.mode == TRACE_SAMPLED:
+            while self.next_sample_time <= simulator.total_time_passed:
+                self.append(simulator, self.next_sample_time)
+                self.next_sample_time += self.interval
+
+    def append(self, simulator, time):
+        if self.size == len(self.data["total_time_passed"]):
+            if self.writer is not None:
+                self.flush_chunk()
+            elif self.size >= self.max_rows:
+                self.dropped += 1
+                return
+            else:
+                self.reserve(max(2 * self.size, 1024))
+
+        # time_remaining and time_to_next_emergency are given as they were at `time`
+        elapsed = simulator.total_time_passed - time
+        travel = simulator.travel
+        row = self.size
+        data = self.data
+        data["total_time_passed"][row] = time
+        data["current_dist"][row] = simulator.current_dist
+        data["currently_traveling"][row] = travel.currently_traveling
+        data["currently_giving_care"][row] = travel.currently_giving_care
+        data["going_towards_hq_dist"][row] = bool(travel.going_towards_hq_dist)
+        data["target"][row] = -1 if travel.target is None else travel.target
+        if travel.time_remaining is None:
+            data["time_remaining"][row] = np.nan
+        elif travel.currently_traveling:
+            data["time_remaining"][row] = travel.time_remaining + elapsed
+        else:
+            data["time_remaining"][row] = travel.time_remaining
+        data["time_to_next_emergency"][row] = simulator.time_to_next_emergency + elapsed
+        data["life_threatening_emergencies"][row] = len(simulator.life_threatening_emergencies)
+        data["non_life_threatening_emergencies"][row] = len(simulator.non_life_threatening_emergencies)
+        self.size += 1
+
+    def flush_chunk(self):
+        """Hand the buffered rows to the background writer and continue in fresh buffers."""
+        if self.size > 0:
+            self.writer.write({name: column[:self.size] for name, column in self.data.items()})
+        self.data = {name: np.empty(self.chunk_rows, dtype=dtype) for name, dtype in TRACE_COLUMNS.items()}
+        self.size = 0
+
+    def columns(self):
+        """
+        Returns the recorded rows as a dict of column arrays, or None if nothing is recorded.
+        Traces streamed to a file are finished and returned as a memory-mapped TraceFile.
+        """
+        if self.mode == TRACE_OFF:
+            return None
+        if self.path is not None:
+            self.close()
+            return TraceFile(self.path)
+        return {name: column[:self.size] for name, column in self.data.items()}
+
+    def close(self):
+        """Writes the remaining rows and stops the writer thread, if the trace is streamed to a file."""
+        if self.writer is not None:
+            self.flush_chunk()
+            self.writer.close()
+            self.writer = None
+
+
+class TraceFileWriter:
+    """Appends chunks of trace columns to a trace file from a background thread."""
+
+    def __init__(self, path, max_pending_chunks=4, append=False):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.rows = len(TraceFile(path)) if append else 0
+        self.error = None
+        self.write_header()
+        mode = "ab" if append else "wb"
+        self.files = {name: open(os.path.join(path, name + ".bin"), mode) for name in TRACE_COLUMNS}
+        # Bounded, so a simulation that outruns the disk waits instead of piling up chunks in memory
+        self.chunks = queue.Queue(maxsize=max_pending_chunks)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write_header(self):
+        header = {
+            "version": TRACE_FORMAT_VERSION,
+            "columns": {name: np.dtype(dtype).str for name, dtype in TRACE_COLUMNS.items()},
+            "rows": self.rows,
+        }
+        with open(os.path.join(self.path, TRACE_HEADER), "w") as file:
+            json.dump(header, file)
+
+    def run(self):
+        while True:
+            chunk = self.chunks.get()
+            try:
+                if chunk is None:
+                    return
+                if self.error is None:
+                    for name, column in chunk.items():
+                        column.tofile(self.files[name])
+                    self.rows += len(column)
+            except OSError as error:
+                self.error = error
+            finally:
+                self.chunks.task_done()
+
+    def write(self, chunk):
+        if self.error is not None:
+            raise self.error
+        self.chunks.put(chunk)
+
+    def flush(self):
+        """Wait until every submitted chunk is on disk."""
+        self.chunks.join()
+        if self.error is not None:
+            raise self.error
+        for file in self.files.values():
+            file.flush()
+        self.write_header()
+
+    def close(self):
+        self.flush()
+        self.chunks.put(None)
+        self.thread.join()
+        for file in self.files.values():
+            file.close()
+
+
+class TraceFile:
+    """
+    Read-only access to a trace file. Every column is memory-mapped on first use,
+    so only the pages of the columns and rows that are actually read are loaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, TRACE_HEADER)) as file:
+            header = json.load(file)
+        if header["version"] != TRACE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported trace file version: {header['version']}")
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in header["columns"].items()}
+        # Rows are derived from the column files, so the rows of an unfinished trace can be read as well
+        self.rows = min(os.path.getsize(self.column_path(name)) // dtype.itemsize
+                        for name, dtype in self.dtypes.items())
+        self.mapped = {}
+
+    def column_path(self, name):
+        return os.path.join(self.path, name + ".bin")
+
+    def __getitem__(self, name):
+        if name not in self.mapped:
+            if self.rows == 0:
+                self.mapped[name] = np.empty(0, dtype=self.dtypes[name])
+            else:
+                self.mapped[name] = np.memmap(self.column_path(name), dtype=self.dtypes[name],
+                                              mode="r", shape=(self.rows,))
+        return self.mapped[name]
+
+    def __contains__(self, name):
+        return name in self.dtypes
+
+    def __len__(self):
+        return self.rows
+
+    def keys(self):
+        return self.dtypes.keys()
+
+
+def open_trace(trace):
+    """Accepts a trace file path, a TraceFile or the in-memory columns returned by simulate."""
+    if isinstance(trace, (str, os.PathLike)):
+        return TraceFile(trace)
+    return trace
+
+
+def trace_window(trace, columns, start=None, end=None, max_points=None):
+    """
+    Returns the requested columns of the rows with start <= total_time_passed <= end.
+    The rows are found by binary search on the time column, and with `max_points`
+    only every k-th row is kept, so large trace files are never read completely.
+    """
+    trace = open_trace(trace)
+    times = trace["total_time_passed"]
+    first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+    last = len(times) if end is None else int(np.searchsorted(times, end, side="right"))
+    step = 1
+    if max_points is not None and last - first > max_points:
+        step = math.ceil((last - first) / max_points)
+    return {name: trace[name][first:last:step] for name in columns}
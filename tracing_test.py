@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from main import EmergencySimulator
+from tracing import TraceRecorder, TraceFile, trace_window
+
+
+class TraceRecorderTests(unittest.TestCase):
+
+    def test_off_by_default(self):
+        result = EmergencySimulator(seed=1).simulate(10)
+        self.assertIsNone(result["trace"], "Trace should be off by default.")
+
+    def test_tracing_does_not_change_results(self):
+        plain = EmergencySimulator(seed=1).simulate(50)
+        traced = EmergencySimulator(seed=1, trace="events").simulate(50)
+        for key in ["doc_util", "doc_center", "avg_non_live_threatening_waiting_time_min"]:
+            self.assertEqual(plain[key], traced[key], f"Tracing changed {key}.")
+
+    def test_events_mode_only_records_changes(self):
+        trace = EmergencySimulator(seed=2, trace="events").simulate(50)["trace"]
+        self.assertGreater(len(trace["total_time_passed"]), 0, "No rows recorded.")
+        self.assertTrue(np.all(np.diff(trace["total_time_passed"]) >= 0), "Rows are not in time order.")
+        state = np.stack([trace["current_dist"], trace["currently_traveling"], trace["currently_giving_care"],
+                          trace["going_towards_hq_dist"], trace["target"],
+                          trace["life_threatening_emergencies"], trace["non_life_threatening_emergencies"]], axis=1)
+        self.assertTrue(np.all(np.any(state[1:] != state[:-1], axis=1)), "Consecutive rows with the same state.")
+
+    def test_sampled_mode_records_fixed_grid(self):
+        trace = EmergencySimulator(seed=3, trace="sampled", trace_interval=300).simulate(10)["trace"]
+        times = trace["total_time_passed"]
+        np.testing.assert_array_equal(times, np.arange(len(times)) * 300, "Samples are not on the grid.")
+        self.assertGreaterEqual(len(times), 10 * 12, "Samples are missing.")
+
+    def test_rows_are_bounded(self):
+        simulator = EmergencySimulator(seed=4)
+        simulator.trace = TraceRecorder("sampled", interval=1, max_rows=100)
+        trace = simulator.simulate(1)["trace"]
+        self.assertEqual(len(trace["total_time_passed"]), 100, "Trace grew beyond max_rows.")
+        self.assertEqual(simulator.trace.dropped, simulator.total_time_passed + 1 - 100,
+                         "Dropped rows were not counted.")
+
+    def test_trace_file_matches_in_memory_trace(self):
+        in_memory = EmergencySimulator(seed=5, trace="events").simulate(200)["trace"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run")
+            simulator = EmergencySimulator(seed=5, trace="events", trace_path=path)
+            simulator.trace.chunk_rows = 100
+            on_disk = simulator.simulate(200)["trace"]
+            self.assertIsInstance(on_disk, TraceFile)
+            for name, column in in_memory.items():
+                np.testing.assert_array_equal(on_disk[name], column, f"Column {name} differs on disk.")
+            self.assertIsInstance(TraceFile(path)["current_dist"], np.memmap, "Columns are not memory-mapped.")
+            simulator.trace.close()
+
+    def test_simulate_finishes_the_trace_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run")
+            simulator = EmergencySimulator(seed=5, trace="events", trace_path=path)
+            writer = simulator.trace.writer
+            first = len(simulator.simulate(100)["trace"])
+            self.assertIsNone(simulator.trace.writer)
+            self.assertFalse(writer.thread.is_alive(), "The writer thread outlived the run.")
+            self.assertTrue(all(file.closed for file in writer.files.values()))
+            # A continued run appends to the finished file
+            continued = simulator.simulate(200)["trace"]
+            self.assertGreater(len(continued), first)
+            expected = EmergencySimulator(seed=5, trace="events")
+            expected.simulate(100)
+            np.testing.assert_array_equal(continued["total_time_passed"],
+                                          expected.simulate(200)["trace"]["total_time_passed"])
+
+    def test_recorder_as_context_manager(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with TraceRecorder("events", path=os.path.join(directory, "run")) as recorder:
+                writer = recorder.writer
+            self.assertFalse(writer.thread.is_alive())
+            self.assertIsNone(recorder.writer)
+
+    def test_trace_window(self):
+        trace = EmergencySimulator(seed=6, trace="sampled", trace_interval=60).simulate(10)["trace"]
+        window = trace_window(trace, ["total_time_passed"], start=600, end=1200)
+        np.testing.assert_array_equal(window["total_time_passed"], np.arange(600, 1201, 60))
+        thinned = trace_window(trace, ["total_time_passed"], max_points=50)
+        self.assertLessEqual(len(thinned["total_time_passed"]), 50, "Window was not thinned out.")
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            TraceRecorder("everything")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import pickle
+import tracemalloc
+import unittest
+from main import EmergencySimulator, Emergency, TravelState, IDLE, TO_EMERGENCY, CARE, TO_HQ, AT_HQ
+
+
+class CompactStateTests(unittest.TestCase):
+
+    def test_emergency_has_no_dict(self):
+        emergency = Emergency(district=3, start_time=10, prio=1)
+        self.assertFalse(hasattr(emergency, "__dict__"))
+        with self.assertRaises(AttributeError):
+            emergency.other = 1
+        copy = pickle.loads(pickle.dumps(emergency))
+        self.assertEqual((copy.district, copy.start_time, copy.prio), (3, 10, 1))
+
+    def test_memory_per_queued_emergency(self):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        emergencies = [Emergency(district=i % 10, start_time=i, prio=0) for i in range(10000)]
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        self.assertEqual(len(emergencies), 10000)
+        # Including the list entry and the start time, about 96 bytes with slots against 136 with a __dict__
+        self.assertLess(used / 10000, 110)
+
+    def test_travel_state_per_instance(self):
+        first, second = EmergencySimulator(seed=1), EmergencySimulator(seed=1)
+        self.assertIsNot(first.travel, second.travel)
+        first.start_new_travel(2)
+        self.assertEqual(second.travel.state, IDLE)
+
+    def test_state_codes_and_flags(self):
+        simulator = EmergencySimulator(seed=1)
+        travel = simulator.travel
+        self.assertEqual((travel["currently_traveling"], travel["going_towards_hq_dist"]), (False, None))
+
+        simulator.start_new_travel(4, Emergency(district=4, start_time=0, prio=0))
+        self.assertEqual(travel.state, TO_EMERGENCY)
+        travel["time_remaining"] = 0
+        simulator.check_travel()
+        self.assertEqual(travel.state, CARE)
+        self.assertTrue(travel["currently_giving_care"])
+        self.assertEqual(simulator.current_dist, 4)
+
+        travel.time_remaining = 0
+        simulator.check_travel()
+        self.assertEqual(travel.state, TO_HQ, "With empty queues the doctor should head back to the HQ.")
+        travel.time_remaining = 0
+        simulator.check_travel()
+        self.assertEqual(travel.state, AT_HQ)
+        self.assertEqual((travel["currently_traveling"], travel["going_towards_hq_dist"]), (False, True))
+
+    def test_derived_flags_cannot_be_set(self):
+        with self.assertRaises(KeyError):
+            TravelState()["currently_traveling"] = True
+
+    def test_snapshot_round_trip(self):
+        simulator = EmergencySimulator(seed=3)
+        simulator.simulate(50)
+        restored = EmergencySimulator.restore(simulator.snapshot())
+        self.assertEqual(restored.simulate(100), simulator.simulate(100))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import numpy as np
+
+# One independent stream per kind of variate, so that drawing more of one kind
+# (e.g. travel times to the nearest HQ) never shifts the others
+STREAMS = ("arrival", "priority", "district", "travel", "care", "queue")
+
+
+class AliasTable:
+    """Walker's alias table for drawing indices with the given weights in O(1) per draw."""
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        size = len(weights)
+        scaled = weights * size / weights.sum()
+        self.prob = np.ones(size)
+        self.alias = np.arange(size)
+        small = [i for i in range(size) if scaled[i] < 1]
+        large = [i for i in range(size) if scaled[i] >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+    def sample(self, uniforms):
+        """Maps uniforms from [0, 1) to indices, using the integer part for the column and the rest for the coin."""
+        scaled = uniforms * len(self.prob)
+        columns = scaled.astype(np.int64)
+        return np.where(scaled - columns < self.prob[columns], columns, self.alias[columns])
+
+
+class VariateProvider:
+    """
+    Draws the random variates of a simulation in blocks of `block_size` per stream.
+    Each stream is its own generator spawned from `seed`, and every block continues where the previous
+    one ended, so the variates only depend on the seed and never on the block size.
+    """
+
+    BLOCK_SIZE = 1024
+
+    def __init__(self, seed, weights, mean_interarrival=50 * 60, life_threatening_probability=0.25,
+                 block_size=BLOCK_SIZE):
+        children = np.random.SeedSequence(seed).spawn(len(STREAMS))
+        self.generators = {name: np.random.Generator(np.random.PCG64(child)) for name, child in zip(STREAMS, children)}
+        self.alias = AliasTable(weights)
+        self.mean_interarrival = mean_interarrival
+        self.life_threatening_probability = life_threatening_probability
+        self.block_size = block_size
+        self.buffers = {name: [] for name in STREAMS}
+        self.positions = {name: 0 for name in STREAMS}
+
+    def block(self, name, size=None):
+        """Draws the next `size` variates of a stream as a numpy array."""
+        generator = self.generators[name]
+        size = self.block_size if size is None else size
+        if name == "arrival":
+            return np.rint(generator.exponential(self.mean_interarrival, size)).astype(np.int64)
+        if name == "priority":
+            return generator.random(size) < self.life_threatening_probability
+        if name == "district":
+            return self.alias.sample(generator.random(size))
+        # travel, care and queue are uniforms, turned into integers in the bounds given on use
+        return generator.random(size)
+
+    def next(self, name):
+        position = self.positions[name]
+        buffer = self.buffers[name]
+        if position == len(buffer):
+            # Python lists are much faster to read single values from than numpy arrays
+            buffer = self.buffers[name] = self.block(name).tolist()
+            position = 0
+        self.positions[name] = position + 1
+        return buffer[position]
+
+    def __getstate__(self):
+        # Methods replaced on the instance, e.g. by a profiler, are not part of the state
+        return {name: value for name, value in vars(self).items() if not callable(value)}
+
+    def time_to_next_emergency(self):
+        return self.next("arrival")
+
+    def life_threatening(self):
+        return self.next("priority")
+
+    def district(self):
+        return self.next("district")
+
+    def recorded_care_time(self):
+        # Synthetic emergencies have no recorded care time, it is drawn when the care starts
+        return None
+
+    def reseeded(self, seed, weights):
+        """A provider with the parameters of this one whose streams start over from `seed`."""
+        return VariateProvider(seed, weights, mean_interarrival=self.mean_interarrival,
+                               life_threatening_probability=self.life_threatening_probability,
+                               block_size=self.block_size)
+
+    def randint(self, name, low, high):
+        """A uniform integer in [low, high] from the uniforms of stream `name`."""
+        return min(low + int(self.next(name) * (high - low + 1)), high)
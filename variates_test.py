@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+from main import EmergencySimulator
+from variates import AliasTable, VariateProvider
+
+
+class VariateProviderTests(unittest.TestCase):
+
+    def test_reproducible_per_seed(self):
+        first = VariateProvider(3, EmergencySimulator.populations)
+        second = VariateProvider(3, EmergencySimulator.populations)
+        other = VariateProvider(4, EmergencySimulator.populations)
+        draws = [first.time_to_next_emergency() for _ in range(3000)]
+        self.assertEqual(draws, [second.time_to_next_emergency() for _ in range(3000)], "Same seed, different draws.")
+        self.assertNotEqual(draws, [other.time_to_next_emergency() for _ in range(3000)], "Seeds share draws.")
+
+    def test_independent_of_block_size(self):
+        small = VariateProvider(5, EmergencySimulator.populations, block_size=7)
+        large = VariateProvider(5, EmergencySimulator.populations)
+        for name in ["arrival", "priority", "district", "travel"]:
+            self.assertEqual([small.next(name) for _ in range(100)], [large.next(name) for _ in range(100)],
+                             f"Stream {name} depends on the block size.")
+
+    def test_streams_are_independent(self):
+        plain = VariateProvider(6, EmergencySimulator.populations)
+        busy = VariateProvider(6, EmergencySimulator.populations)
+        for _ in range(500):
+            busy.randint("travel", 0, 100)
+        self.assertEqual([plain.district() for _ in range(100)], [busy.district() for _ in range(100)],
+                         "Travel draws shifted the district stream.")
+
+    def test_alias_table_follows_weights(self):
+        weights = np.array(EmergencySimulator.populations, dtype=float)
+        districts = AliasTable(weights).sample(np.random.default_rng(0).random(200_000))
+        frequencies = np.bincount(districts, minlength=len(weights)) / len(districts)
+        np.testing.assert_allclose(frequencies, weights / weights.sum(), atol=0.005)
+
+    def test_variate_ranges(self):
+        provider = VariateProvider(7, EmergencySimulator.populations)
+        care_times = [provider.randint("care", 600, 1200) for _ in range(5000)]
+        self.assertEqual((min(care_times), max(care_times)), (600, 1200), "Care times do not cover the range.")
+        life_threatening = np.mean([provider.life_threatening() for _ in range(20000)])
+        self.assertAlmostEqual(life_threatening, 0.25, delta=0.02)
+        arrivals = [provider.time_to_next_emergency() for _ in range(20000)]
+        self.assertAlmostEqual(np.mean(arrivals), 50 * 60, delta=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,22 @@
 import matplotlib.pyplot as plt
-import seaborn as sns
-import networkx as nx
-import pandas as pd
 import numpy as np
-import random
 from matplotlib.animation import FuncAnimation
+import os
+import shutil
+import subprocess
+import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 from main import EmergencySimulator  # Importing the classes from main.py
-from task4_and_5 import ExtendedEmergencySimulator
+from task4_and_5 import ExtendedEmergencySimulator, run_hq_sweep
+from replications import replication_seeds, run_seeds
+from result_cache import ResultCache
+from tracing import trace_window
+
+# File names of exported frames, numbered from 0
+FRAME_NAME = "frame_%06d.png"
+VIDEO_EXTENSIONS = (".mp4", ".gif", ".webm", ".mkv", ".avi", ".mov")
 
 
 def visualize_time_series(
@@ -19,6 +27,8 @@ def visualize_time_series(
     """
     Visualize doctor utilization, time at center, and waiting times.
     """
+    # seaborn is only imported by the plots that use it, it takes long to import
+    import seaborn as sns
 
     print(doc_center_results)
     print(doc_util_results)
@@ -54,17 +64,21 @@ def visualize_time_series(
     # ########################################################
 
 
-def visualize_emergency_counts(visualization_data):
+def visualize_emergency_counts(trace, start=None, end=None, max_points=100_000):
     """
     Plots the number of life-threatening and non-life-threatening emergencies with respect to time
-    """
-    times = [data["total_time_passed"] for data in visualization_data]
 
-    non_life_emergency_data = [data["non_life_threatening_emergencies"] for data in visualization_data]
-    life_emergency_data = [data["life_threatening_emergencies"] for data in visualization_data]
+    :param trace: Trace returned by simulate or the path of a trace file.
+    :param start: First simulated second to plot, defaults to the start of the trace.
+    :param end: Last simulated second to plot, defaults to the end of the trace.
+    :param max_points: Longer time ranges are thinned out to this many points.
+    """
+    window = trace_window(trace, ["total_time_passed", "life_threatening_emergencies",
+                                  "non_life_threatening_emergencies"], start, end, max_points)
+    times = window["total_time_passed"]
 
-    non_life_emergencies = [len(entry) for entry in non_life_emergency_data]
-    life_emergencies = [len(entry) for entry in life_emergency_data]
+    non_life_emergencies = window["non_life_threatening_emergencies"]
+    life_emergencies = window["life_threatening_emergencies"]
 
     # filter out empty points
     """ empty_points = []
@@ -77,7 +91,7 @@ def visualize_emergency_counts(visualization_data):
         non_life_emergencies.pop(i)
         life_emergencies.pop(i) """
 
-    print([[times[i], life_emergencies[i], non_life_emergencies[i]] for i in range(10)])
+    print([[times[i], life_emergencies[i], non_life_emergencies[i]] for i in range(min(10, len(times)))])
 
     plt.figure(figsize=(12, 6))
 
@@ -90,34 +104,17 @@ def visualize_emergency_counts(visualization_data):
     plt.show()
 
 
-def dynamic_time_series(visualization_data):
-    """
-    Dynamic visualization of emergency counts over time.
-    """
-
-    # Extract data for visualization
-    times = [
-        data["total_time_passed"]
-        for data in visualization_data
-        ]
-    life_emergencies = [
-        len(data["life_threatening_emergencies"])
-        for data in visualization_data
-        ]
-    non_life_emergencies = [
-        len(data["non_life_threatening_emergencies"])
-        for data in visualization_data
-        ]
-
+def emergency_counts_figure(times, life_emergencies, non_life_emergencies):
+    """Axes for the emergency counts over time with empty lines, as (fig, line_life, line_non_life)."""
     # Create the figure and axes, arranging them horizontally
     fig, ax = plt.subplots(1, 2, figsize=(18, 6), sharex=False)
 
     # Plot 1: Life-Threatening Emergency counts over time
     ax[0].set_title("Emergency Counts Over Time")
     ax[0].set_ylabel("Number of Emergencies")
-    ax[0].set_xlim(0, max(times))
-    ax[0].set_ylim(0, max(max(life_emergencies),
-                          max(non_life_emergencies)
+    ax[0].set_xlim(0, times.max())
+    ax[0].set_ylim(0, max(life_emergencies.max(),
+                          non_life_emergencies.max()
                           ) + 1)
     line_life, = ax[0].plot([],
                             [],
@@ -130,9 +127,9 @@ def dynamic_time_series(visualization_data):
     # Plot 2: Non-Life-Threatening Emergency counts over time
     ax[1].set_title("Emergency Counts Over Time")
     ax[1].set_ylabel("Number of Emergencies")
-    ax[1].set_xlim(0, max(times))
-    ax[1].set_ylim(0, max(max(life_emergencies),
-                          max(non_life_emergencies)
+    ax[1].set_xlim(0, times.max())
+    ax[1].set_ylim(0, max(life_emergencies.max(),
+                          non_life_emergencies.max()
                           ) + 1)
     line_non_life, = ax[1].plot([],
                                 [],
@@ -141,6 +138,25 @@ def dynamic_time_series(visualization_data):
                                 lw=1,
                                 )
     ax[1].legend()
+    fig.tight_layout()
+    return fig, line_life, line_non_life
+
+
+def dynamic_time_series(trace, start=None, end=None):
+    """
+    Dynamic visualization of emergency counts over time.
+    Accepts the trace returned by simulate or the path of a trace file, optionally limited to [start, end].
+    See export_animation to render it to files instead.
+    """
+
+    # Extract data for visualization
+    window = trace_window(trace, ["total_time_passed", "life_threatening_emergencies",
+                                  "non_life_threatening_emergencies"], start, end)
+    times = window["total_time_passed"]
+    life_emergencies = window["life_threatening_emergencies"]
+    non_life_emergencies = window["non_life_threatening_emergencies"]
+
+    fig, line_life, line_non_life = emergency_counts_figure(times, life_emergencies, non_life_emergencies)
 
     def init():
         """Initialize the lines and scatter."""
@@ -154,7 +170,7 @@ def dynamic_time_series(visualization_data):
 
     def update(frame):
         """Update the lines and scatter with new data."""
-        if frame >= len(visualization_data):
+        if frame >= len(times):
             print("Error: Frame index out of range")
             return  # Prevent index errors
 
@@ -170,35 +186,70 @@ def dynamic_time_series(visualization_data):
 
     anim = FuncAnimation(fig,
                          update,
-                         frames=len(visualization_data),
+                         frames=len(times),
                          init_func=init, blit=False,
                          interval=50,
                          )
 
-    plt.tight_layout()
     plt.show()
 
 
-def dynamic_visualization(visualization_data):
-    # Populations and average travel times between districts
-    populations = [10000, 35000, 25000, 25000, 15000,
-                   20000, 45000, 40000, 15000, 35000]
-    avg_travel_times = [
-        [3, 6, 5, 8, 8, 4, 6, 8, 10, 12],
-        [6, 4, 5, 8, 14, 6, 4, 10, 7, 6],
-        [5, 5, 3, 6, 10, 8, 8, 12, 12, 7],
-        [8, 8, 6, 5, 6, 10, 13, 9, 10, 11],
-        [8, 14, 10, 6, 5, 7, 9, 7, 10, 20],
-        [4, 6, 8, 10, 7, 3, 5, 5, 9, 17],
-        [6, 4, 8, 13, 9, 5, 3, 10, 7, 10],
-        [8, 10, 12, 9, 7, 5, 10, 5, 14, 20],
-        [10, 7, 12, 10, 10, 9, 7, 14, 7, 14],
-        [12, 6, 7, 11, 20, 17, 10, 20, 14, 6]
-    ]
+class DoctorPlayback:
+    """
+    The doctor's positions of a trace, prepared for playback: the node position of every step is
+    gathered into arrays once, and the step of a playback time is found by a cursor that only moves
+    forward while time does, falling back to binary search on jumps, so a frame costs O(1) as playback
+    runs and O(log n) at worst, however long the trace is.
+    """
 
-    # Extract data for visualization
-    times = [data["total_time_passed"] for data in visualization_data]
-    current_districts = [data["current_dist"] for data in visualization_data]
+    # Steps the cursor walks before it switches to binary search
+    MAX_WALK = 8
+
+    def __init__(self, times, current_districts, node_positions):
+        self.times = np.asarray(times, dtype=np.float64)
+        positions = np.asarray(node_positions, dtype=np.float64)[np.asarray(current_districts, dtype=np.int64)]
+        self.x = positions[:, 0]
+        self.y = positions[:, 1]
+        self.cursor = 0
+        self.searches = 0  # Binary searches done instead of walking the cursor
+
+    def step(self, time):
+        """Index i of the step with times[i] <= time < times[i + 1], None outside the trace."""
+        times = self.times
+        if len(times) < 2 or not times[0] <= time <= times[-1]:
+            return None
+        i = self.cursor
+        last = len(times) - 2
+        if times[i] <= time:
+            for _ in range(self.MAX_WALK):
+                if i >= last or time < times[i + 1]:
+                    self.cursor = i
+                    return i
+                i += 1
+        self.searches += 1
+        i = min(int(np.searchsorted(times, time, side="right")) - 1, last)
+        self.cursor = i
+        return i
+
+    def position(self, time):
+        """Position of the doctor at `time`, interpolated between the districts of two steps, None outside the trace."""
+        i = self.step(time)
+        if i is None:
+            return None
+        span = self.times[i + 1] - self.times[i]
+        alpha = (time - self.times[i]) / span if span > 0 else 1.0
+        return (self.x[i] + alpha * (self.x[i + 1] - self.x[i]),
+                self.y[i] + alpha * (self.y[i + 1] - self.y[i]))
+
+
+def districts_figure(districts):
+    """
+    Circular graph of the districts with an empty doctor marker and time label.
+    Returns (fig, node_positions, doctor_marker, frame_number_text), node_positions as one (x, y) per district.
+    """
+    # Populations and average travel times between districts
+    populations = districts.populations
+    avg_travel_times = districts.travel_minutes
 
     # Create circular graph layout
     num_districts = len(populations)
@@ -206,10 +257,10 @@ def dynamic_visualization(visualization_data):
     node_positions = {i: (np.cos(angle), np.sin(angle)) for i, angle in enumerate(angles)}
 
     # Normalize population and travel duration for visualization
-    max_pop = max(populations)
-    max_travel = max(max(row) for row in avg_travel_times)
-    node_sizes = [300 + 1000 * (pop / max_pop) for pop in populations]  # Scaled sizes
-    edge_widths = np.array(avg_travel_times) / max_travel * 3  # Scaled widths for edges
+    max_pop = populations.max()
+    max_travel = avg_travel_times.max()
+    node_sizes = 300 + 1000 * (populations / max_pop)  # Scaled sizes
+    edge_widths = avg_travel_times / max_travel * 3  # Scaled widths for edges
 
     # Create the figure and axes, arranging them horizontally
     fig, ax = plt.subplots(1, 1, figsize=(8, 8), sharex=False)
@@ -238,11 +289,11 @@ def dynamic_visualization(visualization_data):
         zorder=2  # Ensure nodes are on top of edges but below doctor
     )
 
-    # Add district labels (1-10)
+    # Add district labels
     for i, (x, y) in node_positions.items():
         ax.text(x * 1.1,
                 y * 1.1,
-                str(i + 1),
+                districts.names[i],
                 color="black",
                 ha="center",
                 va="center",
@@ -255,6 +306,38 @@ def dynamic_visualization(visualization_data):
     frame_number_text = ax.text(
         0.05, 0.95, "", transform=ax.transAxes, fontsize=12, color="black", ha="left", va="top"
     )
+    fig.tight_layout()
+    return fig, [node_positions[i] for i in range(num_districts)], doctor_marker, frame_number_text
+
+
+def show_doctor(playback, doctor_marker, current_time):
+    """Moves the doctor marker to its position at `current_time`."""
+    # Interpolate between the districts of the current step
+    doctor_pos = playback.position(current_time)
+    if doctor_pos is not None:
+        doctor_marker.set_data([doctor_pos[0]], [doctor_pos[1]])
+    else:
+        # Outside the trace there is no doctor to show
+        doctor_marker.set_data([], [])
+
+
+def dynamic_visualization(trace, start=None, end=None, districts=None):
+    """
+    Plays back the doctor's movement between the districts.
+    Accepts the trace returned by simulate or the path of a trace file, optionally limited to [start, end].
+    `districts` is the DistrictModel of the simulation, by default the one of EmergencySimulator.
+    See export_animation to render it to files instead.
+    """
+    if districts is None:
+        districts = EmergencySimulator(seed=0).districts
+
+    # Extract data for visualization
+    window = trace_window(trace, ["total_time_passed", "current_dist"], start, end)
+    times = window["total_time_passed"]
+    current_districts = window["current_dist"]
+
+    fig, node_positions, doctor_marker, frame_number_text = districts_figure(districts)
+    playback = DoctorPlayback(times, current_districts, node_positions)
     t0 = round(time.time() * 1000)
 
     def init():
@@ -266,76 +349,183 @@ def dynamic_visualization(visualization_data):
     def update(frame):
         """Update the lines and scatter with new data."""
         current_time = round(time.time() * 1000) - t0
-
-        # Find the two districts to interpolate between
-        for i in range(len(times) - 1):
-            if times[i] <= current_time <= times[i + 1]:
-                # Calculate interpolation factor
-                alpha = (current_time - times[i]) / (times[i + 1] - times[i])
-
-                # Interpolate position
-                prev_pos = node_positions[current_districts[i]]
-                next_pos = node_positions[current_districts[i + 1]]
-                doctor_pos = (
-                    prev_pos[0] + alpha * (next_pos[0] - prev_pos[0]),
-                    prev_pos[1] + alpha * (next_pos[1] - prev_pos[1])
-                )
-                doctor_marker.set_data([doctor_pos[0]], [doctor_pos[1]])
-
-                # Update frame number text
-                frame_number_text.set_text(f"Time: {current_time}")
-                return doctor_marker, frame_number_text
-
-        # If no match, keep the doctor stationary
-        doctor_marker.set_data([], [])
+        show_doctor(playback, doctor_marker, current_time)
         frame_number_text.set_text(f"Time: {current_time}")
         return doctor_marker, frame_number_text
 
-    # Create the FuncAnimation
+    # Create the FuncAnimation, only the doctor and the time are redrawn on every frame
     anim = FuncAnimation(
-        fig, update, frames=len(visualization_data), init_func=init, blit=False, interval=1
+        fig, update, frames=len(times), init_func=init, blit=True, interval=1
     )
 
     # Display the plot
-    plt.tight_layout()
     plt.show()
 
 
-def advanced_simulation_results(strategies, hq_configs, num_simulations, results):
+def render_frames(task):
     """
-    Creates scatter plots for simulation results, with the number of HQs on the x-axis and
-    multiple data series corresponding to strategies.
+    Renders the frames of one chunk of export_animation into PNG files with the Agg backend.
+    Runs in a worker process, which draws the static part of the figure once and then, like blitting,
+    only draws the animated artists on top of a copy of it for every frame.
+    """
+    kind, data, frame_times, first_frame, directory, dpi = task
+    plt.switch_backend("Agg")
+    if kind == "districts":
+        fig, node_positions, doctor_marker, frame_number_text = districts_figure(data["districts"])
+        playback = DoctorPlayback(data["total_time_passed"], data["current_dist"], node_positions)
+        animated = [doctor_marker, frame_number_text]
+
+        def draw(current_time):
+            show_doctor(playback, doctor_marker, current_time)
+            frame_number_text.set_text(f"Time: {current_time / 3600:.2f} h")
+    else:
+        times = data["total_time_passed"]
+        life_emergencies = data["life_threatening_emergencies"]
+        non_life_emergencies = data["non_life_threatening_emergencies"]
+        fig, line_life, line_non_life = emergency_counts_figure(times, life_emergencies, non_life_emergencies)
+        animated = [line_life, line_non_life]
+
+        def draw(current_time):
+            shown = int(np.searchsorted(times, current_time, side="right"))
+            line_life.set_data(times[:shown], life_emergencies[:shown])
+            line_non_life.set_data(times[:shown], non_life_emergencies[:shown])
+
+    fig.set_dpi(dpi)
+    for artist in animated:
+        artist.set_animated(True)
+    canvas = fig.canvas
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+
+    paths = []
+    for offset, current_time in enumerate(frame_times):
+        draw(current_time)
+        canvas.restore_region(background)
+        for artist in animated:
+            artist.axes.draw_artist(artist)
+        path = os.path.join(directory, FRAME_NAME % (first_frame + offset))
+        plt.imsave(path, np.asarray(canvas.buffer_rgba()))
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def export_animation(trace, output, kind="districts", seconds_per_frame=60, start=None, end=None, districts=None,
+                     workers=None, chunk_size=50, fps=30, dpi=100):
+    """
+    Renders the animation of dynamic_visualization or dynamic_time_series headless, one frame per
+    `seconds_per_frame` simulated seconds, split in chunks of frames across a process pool.
+
+    :param trace: Trace returned by simulate or the path of a trace file.
+    :param output: Directory for a PNG sequence, or a video file (.mp4, .gif, ...) written with ffmpeg.
+    :param kind: "districts" for the doctor's movement, "time_series" for the emergency counts.
+    :param seconds_per_frame: Simulated seconds between two frames.
+    :param start: First simulated second to render, by default the start of the trace.
+    :param end: Last simulated second to render, by default the end of the trace.
+    :param districts: DistrictModel of the simulation, by default the one of EmergencySimulator.
+    :param workers: Number of worker processes, defaults to the number of cores. 1 renders in-process.
+    :param chunk_size: Frames rendered per task.
+    :param fps: Frames per second of a video.
+    :param dpi: Resolution of the frames.
+    :return: The paths of the frames, or of the video.
+    """
+    if kind == "districts":
+        data = trace_window(trace, ["total_time_passed", "current_dist"], start, end)
+        data["districts"] = districts if districts is not None else EmergencySimulator(seed=0).districts
+    elif kind == "time_series":
+        data = trace_window(trace, ["total_time_passed", "life_threatening_emergencies",
+                                    "non_life_threatening_emergencies"], start, end)
+    else:
+        raise ValueError(f"Unknown animation: {kind}")
+    # Plain arrays are sent to the workers, not memory maps of a trace file
+    data = {name: np.asarray(values) if name != "districts" else values for name, values in data.items()}
+    times = data["total_time_passed"]
+    if len(times) == 0:
+        raise ValueError("The trace has no rows in the requested window")
+    frame_times = np.arange(times[0] if start is None else start, (times[-1] if end is None else end) + 1,
+                            seconds_per_frame)
+
+    video = os.path.splitext(output)[1].lower() in VIDEO_EXTENSIONS
+    if video and shutil.which("ffmpeg") is None:
+        raise RuntimeError("Writing a video needs ffmpeg, export to a directory for a PNG sequence instead")
+    directory = tempfile.mkdtemp() if video else output
+    os.makedirs(directory, exist_ok=True)
+
+    tasks = [(kind, data, frame_times[first:first + chunk_size], first, directory, dpi)
+             for first in range(0, len(frame_times), chunk_size)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, max(len(tasks), 1))
+    if workers == 1:
+        chunks = [render_frames(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(render_frames, tasks))
+    paths = [path for chunk in chunks for path in chunk]
+    if not video:
+        return paths
+
+    try:
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps),
+                        "-i", os.path.join(directory, FRAME_NAME), "-pix_fmt", "yuv420p", output], check=True)
+    finally:
+        shutil.rmtree(directory)
+    return output
+
+
+def sweep_means(strategies, hq_configs, cache, replications, simulation_hours, num_vehicles, master_seed=0,
+                workers=None):
+    """
+    The mean travel time and remaining emergencies of every configuration of a sweep. The results are read
+    from the result cache the sweep filled; replications evicted from it since are run again, so every mean
+    is over all replications of its configuration. Configurations without replications are left out.
 
-    :param strategies: List of strategies used in the simulation.
-    :param hq_configs: List of HQ configurations used in the simulation.
-    :param num_simulations: Number of simulations to average per configuration.
-    :param results: Dictionary with the structure:
-                    {
-                        hq_config_1: {
-                            strategy_1: [{"avg_travel_time": ..., "remaining_queues": [...]}, ...],
-                            strategy_2: [...],
-                        },
-                        hq_config_2: {...},
-                        ...
-                    }
+    :param workers: Worker processes for the replications that are run again.
+    :return: One dict per configuration, with the columns of the plots of advanced_simulation_results.
     """
-    # Prepare data for plotting
-    plot_data = []
+    means = []
     for hq in hq_configs:
         for strategy in strategies:
-            # Average across multiple simulations
-            avg_travel_time = sum(run["avg_travel_time"] for run in results[hq][strategy]) / num_simulations
-            avg_remaining_queues = sum(sum(run["remaining_queues"]) for run in results[hq][strategy]) / num_simulations
-
-            plot_data.append({
+            # Average across multiple simulations, configurations may have used different numbers of them
+            seeds = replication_seeds(master_seed, replications[hq][strategy])
+            if not seeds:
+                continue
+            runs = run_seeds(ExtendedEmergencySimulator, seeds, simulation_hours, workers,
+                             {"num_hqs": hq, "num_vehicles": num_vehicles, "strategy": strategy}, cache=cache)
+            avg_travel_time = sum(run["avg_travel_time"] for run in runs) / len(runs)
+            avg_remaining_queues = sum(sum(run["emergency_queues"]) for run in runs) / len(runs)
+
+            means.append({
                 "HQs": hq,
                 "Strategy": strategy,
                 "Average Travel Time (minutes)": avg_travel_time,
                 "Average Remaining Emergencies": avg_remaining_queues,
             })
+    return means
+
+
+def advanced_simulation_results(strategies, hq_configs, cache, replications, simulation_hours, num_vehicles,
+                                master_seed=0, workers=None):
+    """
+    Creates scatter plots for simulation results, with the number of HQs on the x-axis and
+    multiple data series corresponding to strategies. The results are read from the result cache
+    the sweep filled, so the plots can be redone without running the simulations again.
+
+    :param strategies: List of strategies used in the simulation.
+    :param hq_configs: List of HQ configurations used in the simulation.
+    :param cache: ResultCache holding the replications of the sweep.
+    :param replications: Number of replications per configuration, as {num_hqs: {strategy: count}}.
+    :param simulation_hours: Simulated hours per replication.
+    :param num_vehicles: Number of vehicles used in the simulation.
+    :param master_seed: Master seed of the sweep.
+    :param workers: Worker processes for replications evicted from the cache, see sweep_means.
+    """
+    import pandas as pd
+    import seaborn as sns
 
     # Convert to DataFrame for Seaborn
-    df = pd.DataFrame(plot_data)
+    df = pd.DataFrame(sweep_means(strategies, hq_configs, cache, replications, simulation_hours, num_vehicles,
+                                  master_seed=master_seed, workers=workers))
 
     # Scatter plot for Average Travel Time
     plt.figure(figsize=(12, 6))
@@ -376,31 +566,33 @@ if __name__ == "__main__":
         waiting_results.append(result["avg_non_live_threatening_waiting_time_min"])
     
     print(len(waiting_results))
-    # print([result["visualization_data"][i]["total_time_passed"] for i in range(10)])
+    trace = None
 
     while False:
 
         selected_visualisation = int(input("Select visualisation (1: Time Series, 2: Dynamic, 3: Emergencies, 4: Playback): "))
+        if trace is None and selected_visualisation not in (0, 1, 4):
+            # Batch runs record no trace, the plots of a single run use a traced one, run once when first needed
+            trace = EmergencySimulator(seed=0, trace="events").simulate(1000)["trace"]
 
         if selected_visualisation == 1:
             visualize_time_series(doc_util_results, doc_center_results, waiting_results)
         elif selected_visualisation == 2:
-            dynamic_time_series(result["visualization_data"])
+            dynamic_time_series(trace)
         elif selected_visualisation == 3:
-            visualize_emergency_counts(result["visualization_data"])
+            visualize_emergency_counts(trace)
         elif selected_visualisation == 4:
-            simulator = EmergencySimulator(seed=123)
+            simulator = EmergencySimulator(seed=123, trace="events")
             result = simulator.simulate(100)
-            dynamic_visualization(result["visualization_data"])
+            dynamic_visualization(result["trace"])
             break
         elif selected_visualisation == 0:
             break
 
         else:
-            print(len([ entry["total_time_passed"] for entry in result["visualization_data"] ]))
-            print(len([ entry["non_life_threatening_emergencies"] for entry in result["visualization_data"] ]))
-            print([result["visualization_data"][i]["life_threatening_emergencies"] for i in range(10)])
-            print([result["visualization_data"][i]["non_life_threatening_emergencies"] for i in range(10)])
+            print(len(trace["total_time_passed"]))
+            print(trace["life_threatening_emergencies"][:10])
+            print(trace["non_life_threatening_emergencies"][:10])
 
 
     # Advanced simulation results
@@ -408,22 +600,13 @@ if __name__ == "__main__":
     num_vehicles = 2
     strategies = ["fifo", "nearest", "high_priority_first"]
     simulation_hours = 10
-    num_simulations = 1000  # Number of simulations per configuration
+    max_simulations = 1000  # Cap on the simulations per configuration
 
-    results = {}
-    for num_hqs in hq_configs:
-        results[num_hqs] = {}
-        for strategy in strategies:
-            results[num_hqs][strategy] = []
-            for _ in range(num_simulations):
-                print(f"Running simulation with {num_hqs} headquarters and strategy: {strategy}", end="\r")
-                sim = ExtendedEmergencySimulator(num_hqs=num_hqs, num_vehicles=num_vehicles, strategy=strategy, seed=random.randint(0, 1000))
-                simulation_result = sim.simulate(simulation_hours)
-                results[num_hqs][strategy].append({
-                    "avg_travel_time": simulation_result["avg_travel_time"],
-                    "remaining_queues": simulation_result["emergency_queues"]
-                })
+    # Finished replications are kept on disk, an interrupted sweep resumes and unchanged ones are not rerun
+    cache = ResultCache(".result_cache", max_bytes=500 * 2 ** 20)
+
+    replications = run_hq_sweep(hq_configs, strategies, num_vehicles, simulation_hours, max_simulations, cache)
 
     # Generate scatter plots
-    advanced_simulation_results(strategies, hq_configs, num_simulations, results)
+    advanced_simulation_results(strategies, hq_configs, cache, replications, simulation_hours, num_vehicles)
 
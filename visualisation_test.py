@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import unittest
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from main import EmergencySimulator
+from visualisation import DoctorPlayback, export_animation, sweep_means
+from task4_and_5 import run_hq_sweep
+from result_cache import ResultCache
+
+
+def linear_scan_position(times, districts, positions, current_time):
+    """The search dynamic_visualization used to run on every frame."""
+    for i in range(len(times) - 1):
+        if times[i] <= current_time <= times[i + 1]:
+            alpha = (current_time - times[i]) / (times[i + 1] - times[i])
+            prev_pos, next_pos = positions[districts[i]], positions[districts[i + 1]]
+            return (prev_pos[0] + alpha * (next_pos[0] - prev_pos[0]),
+                    prev_pos[1] + alpha * (next_pos[1] - prev_pos[1]))
+    return None
+
+
+class DoctorPlaybackTests(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.times = np.cumsum(rng.integers(1, 100, 300))
+        self.districts = rng.integers(0, 10, 300)
+        angles = np.linspace(0, 2 * np.pi, 10, endpoint=False)
+        self.positions = np.column_stack([np.cos(angles), np.sin(angles)])
+
+    def test_same_positions_as_linear_scan(self):
+        playback = DoctorPlayback(self.times, self.districts, self.positions)
+        queries = np.concatenate([np.arange(0, self.times[-1] + 50, 7.5), [5000, 20, self.times[-1], 100000]])
+        for current_time in queries:
+            expected = linear_scan_position(self.times, self.districts, self.positions, current_time)
+            actual = playback.position(current_time)
+            if expected is None:
+                self.assertIsNone(actual, f"Doctor shown outside the trace at {current_time}.")
+            else:
+                np.testing.assert_allclose(actual, expected, atol=1e-12, err_msg=f"Positions differ at {current_time}.")
+
+    def long_playback(self, steps=1_000_000):
+        times = np.arange(steps) * 10.0
+        return times, DoctorPlayback(times, np.arange(steps) % 10, self.positions)
+
+    def test_cursor_walks_through_the_whole_trace(self):
+        times, playback = self.long_playback()
+        # A few steps per frame, from the start to the end of the trace
+        frames = times[::5] + 3
+        steps = [playback.step(current_time) for current_time in frames]
+        self.assertEqual(playback.searches, 0, "Playback fell back to binary search.")
+        np.testing.assert_array_equal(steps, np.arange(0, len(times), 5))
+        self.assertEqual(playback.cursor, len(times) - 5)
+
+    def test_jumps_search_once(self):
+        times, playback = self.long_playback()
+        frames = np.random.default_rng(1).uniform(0, times[-1], 1000)
+        steps = [playback.step(current_time) for current_time in frames]
+        self.assertLessEqual(playback.searches, len(frames))
+        np.testing.assert_array_equal(steps, np.searchsorted(times, frames, side="right") - 1)
+
+    def test_frame_work_does_not_grow_with_trace(self):
+        # Plays the first frames, jumps to the end of the trace and back, then plays them again
+        frames = np.arange(0, 5000, 25.0)
+        for steps in [1000, 1_000_000]:
+            times, playback = self.long_playback(steps)
+            played = np.concatenate([frames, [times[-2]], frames])
+            self.assertEqual([playback.step(current_time) for current_time in played],
+                             list(np.searchsorted(times, played, side="right") - 1))
+            self.assertEqual(playback.searches, 2, f"Playback of {steps} steps searched for more than the jumps.")
+
+
+class ExportAnimationTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.trace = EmergencySimulator(seed=1, trace="events").simulate(10)["trace"]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_frames_in_parallel(self):
+        paths = export_animation(self.trace, self.directory.name, seconds_per_frame=1800, workers=2, chunk_size=4)
+        self.assertEqual(len(paths), len(np.arange(self.trace["total_time_passed"][0],
+                                                   self.trace["total_time_passed"][-1] + 1, 1800)))
+        self.assertEqual(sorted(os.listdir(self.directory.name)), [os.path.basename(path) for path in paths])
+        frames = [plt.imread(path) for path in paths]
+        self.assertEqual({frame.shape for frame in frames}, {frames[0].shape})
+        self.assertFalse(all(np.array_equal(frames[0], frame) for frame in frames[1:]), "All frames are the same.")
+
+    def test_same_frames_in_process_and_in_pool(self):
+        serial = export_animation(self.trace, os.path.join(self.directory.name, "serial"), kind="time_series",
+                                  seconds_per_frame=7200, end=20000, workers=1)
+        parallel = export_animation(self.trace, os.path.join(self.directory.name, "parallel"), kind="time_series",
+                                    seconds_per_frame=7200, end=20000, workers=2, chunk_size=1)
+        self.assertEqual(len(serial), 3)
+        for first, second in zip(serial, parallel):
+            np.testing.assert_array_equal(plt.imread(first), plt.imread(second))
+
+    def test_unknown_animation(self):
+        with self.assertRaises(ValueError):
+            export_animation(self.trace, self.directory.name, kind="heatmap")
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_video(self):
+        path = os.path.join(self.directory.name, "run.mp4")
+        self.assertEqual(export_animation(self.trace, path, seconds_per_frame=3600, workers=1), path)
+        self.assertGreater(os.path.getsize(path), 0)
+
+    @unittest.skipIf(shutil.which("ffmpeg"), "ffmpeg is installed")
+    def test_video_without_ffmpeg(self):
+        with self.assertRaises(RuntimeError):
+            export_animation(self.trace, os.path.join(self.directory.name, "run.mp4"))
+
+
+class SweepMeansTests(unittest.TestCase):
+
+    def test_evicted_replications_are_run_again(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory)
+            replications = run_hq_sweep([1, 2], ["fifo"], 2, 2, 10, cache, workers=1)
+            means = sweep_means(["fifo"], [1, 2], cache, replications, 2, 2, workers=1)
+            for mtime, size, path in cache.entries()[::2]:
+                os.remove(path)
+            self.assertEqual(sweep_means(["fifo"], [1, 2], cache, replications, 2, 2, workers=1), means)
+            self.assertEqual(len(cache), sum(replications[hq]["fifo"] for hq in [1, 2]))
+
+    def test_configuration_without_replications(self):
+        with tempfile.TemporaryDirectory() as directory:
+            replications = {1: {"fifo": 0}, 2: {"fifo": 3}}
+            means = sweep_means(["fifo"], [1, 2], ResultCache(directory), replications, 2, 2, workers=1)
+            self.assertEqual([row["HQs"] for row in means], [2])
+
+
+if __name__ == "__main__":
+    unittest.main()